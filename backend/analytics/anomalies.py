@@ -0,0 +1,168 @@
+"""Streaming anomaly detection for station readings.
+
+Each station keeps a fixed set of running statistics, updated once per new
+reading and never recomputed from history:
+
+- EWMA mean and variance
+- a streaming median and MAD (stochastic approximation) for a robust z-score
+- 24 hour-of-day EWMA baselines for the daily cycle
+- a run length of identical readings, for stuck sensors (flatlines)
+"""
+import math
+from array import array
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+class StationStats:
+    """O(1)-memory running statistics for one station"""
+
+    __slots__ = ("count", "mean", "var", "median", "mad", "hour_mean", "hour_count",
+                 "last_value", "last_observed", "repeats", "flags")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.median = 0.0
+        self.mad = 0.0
+        self.hour_mean = array("d", [0.0] * 24)
+        self.hour_count = array("L", [0] * 24)
+        self.last_value: Optional[float] = None
+        self.last_observed: Optional[datetime] = None
+        self.repeats = 0
+        # Kinds flagged on the latest reading
+        self.flags: Tuple[str, ...] = ()
+
+    def robust_z(self, value: float) -> Optional[float]:
+        if self.mad <= 0:
+            return None
+        # 0.6745 makes the MAD-based score comparable to a normal z-score
+        return 0.6745 * (value - self.median) / self.mad
+
+    def seasonal_z(self, value: float, hour: int) -> Optional[float]:
+        std = math.sqrt(self.var)
+        if std <= 0:
+            return None
+        return (value - self.hour_mean[hour]) / std
+
+    def update(self, value: float, hour: int, alpha: float, seasonal_alpha: float):
+        if self.count == 0:
+            self.mean = self.median = value
+        else:
+            delta = value - self.mean
+            self.mean += alpha * delta
+            self.var = (1 - alpha) * (self.var + alpha * delta * delta)
+
+            # Step the median towards the value, scaled by the current spread
+            step = alpha * max(self.mad, 1.0)
+            self.median += step if value > self.median else -step if value < self.median else 0.0
+            self.mad += alpha * (abs(value - self.median) - self.mad)
+
+        if self.hour_count[hour] == 0:
+            self.hour_mean[hour] = value
+        else:
+            self.hour_mean[hour] += seasonal_alpha * (value - self.hour_mean[hour])
+        self.hour_count[hour] += 1
+
+        self.repeats = self.repeats + 1 if value == self.last_value else 0
+        self.last_value = value
+        self.count += 1
+
+    def to_dict(self) -> Dict:
+        return {
+            "readings": self.count,
+            "ewma": round(self.mean, 2),
+            "std": round(math.sqrt(self.var), 2),
+            "median": round(self.median, 2),
+            "mad": round(self.mad, 2),
+            "last_value": self.last_value,
+            "last_observed": self.last_observed.isoformat() if self.last_observed else None,
+            "identical_readings": self.repeats + 1 if self.count else 0,
+            "flags": list(self.flags)
+        }
+
+
+class AnomalyDetector:
+    """Flags spikes, dips, off-cycle readings and flatlines as readings arrive"""
+
+    def __init__(self, alpha: float = 0.1, seasonal_alpha: float = 0.2, z_threshold: float = 3.5,
+                 warmup: int = 8, seasonal_warmup: int = 3, flatline_readings: int = 6, max_events: int = 500):
+        self.alpha = alpha
+        self.seasonal_alpha = seasonal_alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.seasonal_warmup = seasonal_warmup
+        self.flatline_readings = flatline_readings
+
+        self.stations: Dict[str, StationStats] = {}
+        self.events: "deque[Dict]" = deque(maxlen=max_events)
+        self.last_event_id = 0
+
+    def observe(self, station: str, value: float, observed_at: datetime, **context) -> List[Dict]:
+        """Score one reading against the station's history, then fold it in; returns new anomaly events"""
+        stats = self.stations.get(station)
+        if stats is None:
+            stats = self.stations[station] = StationStats()
+
+        # Upstream readings are hourly while refreshes are more frequent; only new readings count
+        if stats.last_observed is not None and observed_at <= stats.last_observed:
+            return []
+
+        hour = observed_at.hour
+        found = []
+
+        if stats.count >= self.warmup:
+            robust = stats.robust_z(value)
+            robust_hit = robust is not None and abs(robust) > self.z_threshold
+
+            # Once the hour's baseline is known, the daily cycle (rush-hour peaks) is not anomalous
+            seasonal = stats.seasonal_z(value, hour) if stats.hour_count[hour] >= self.seasonal_warmup else None
+            seasonal_hit = seasonal is not None and abs(seasonal) > self.z_threshold
+
+            if robust_hit and (seasonal is None or seasonal_hit):
+                found.append(("spike" if robust > 0 else "dip", robust, stats.median))
+            elif seasonal_hit:
+                found.append(("off_daily_pattern", seasonal, stats.hour_mean[hour]))
+
+        stats.update(value, hour, self.alpha, self.seasonal_alpha)
+        stats.last_observed = observed_at
+
+        kinds = [kind for kind, _, _ in found]
+        if stats.repeats + 1 >= self.flatline_readings:
+            kinds.append("flatline")
+            # The feed reports a stuck sensor once, when the run reaches the threshold
+            if stats.repeats + 1 == self.flatline_readings:
+                found.append(("flatline", None, value))
+        stats.flags = tuple(kinds)
+
+        events = []
+        for kind, score, expected in found:
+            self.last_event_id += 1
+            event = {
+                "id": self.last_event_id,
+                "station": station,
+                "kind": kind,
+                "value": value,
+                "expected": round(expected, 1),
+                "score": round(score, 2) if score is not None else None,
+                "observed_at": observed_at.isoformat(),
+                "detected_at": datetime.now().isoformat(),
+                **context
+            }
+            self.events.append(event)
+            events.append(event)
+        return events
+
+    def flags(self, station: str) -> Tuple[str, ...]:
+        stats = self.stations.get(station)
+        return stats.flags if stats is not None else ()
+
+    def since(self, event_id: int = 0, station: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Events after `event_id`, oldest first"""
+        events = [e for e in self.events if e["id"] > event_id and (station is None or e["station"] == station)]
+        return events[:limit]
+
+    def summary(self) -> Dict[str, Dict]:
+        return {station: stats.to_dict() for station, stats in self.stations.items()}
@@ -0,0 +1,168 @@
+"""Vectorized AQI computation (CPCB National AQI and US EPA AQI).
+
+Concentrations are passed as arrays of any shape (stations, stations x hours,
+...) in CPCB units: µg/m³ for every pollutant except CO in mg/m³. Missing
+readings are NaN. Sub-indices come from piecewise-linear interpolation
+between breakpoints, so months of hourly history for every station is a
+handful of np.interp calls.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+
+import numpy as np
+
+POLLUTANTS = ("pm25", "pm10", "no2", "o3", "co", "so2", "nh3")
+
+# ppb -> µg/m³ at 25 °C (molecular weight / 24.45); CO is ppm -> mg/m³ with the same factor
+_PPB_TO_UGM3 = {"no2": 46.01 / 24.45, "o3": 48.00 / 24.45, "so2": 64.07 / 24.45, "co": 28.01 / 24.45}
+
+
+@dataclass(frozen=True)
+class Scale:
+    name: str
+    # pollutant -> (concentration breakpoints, index breakpoints), both increasing
+    breakpoints: Mapping[str, Tuple[np.ndarray, np.ndarray]]
+    # Upper index bound of each category but the last
+    category_bounds: Tuple[int, ...]
+    categories: Tuple[str, ...]
+
+    def sub_index(self, pollutant: str, concentration) -> np.ndarray:
+        """Sub-index of one pollutant; NaN where the concentration is missing or negative"""
+        concentration = np.asarray(concentration, dtype=float)
+        xp, fp = self.breakpoints[pollutant]
+        return np.where(concentration >= 0, np.interp(concentration, xp, fp), np.nan)
+
+    def concentration(self, pollutant: str, sub_index) -> np.ndarray:
+        """Inverse of sub_index (within the breakpoint range)"""
+        sub_index = np.asarray(sub_index, dtype=float)
+        xp, fp = self.breakpoints[pollutant]
+        return np.where(sub_index >= 0, np.interp(sub_index, fp, xp), np.nan)
+
+    def category(self, index) -> np.ndarray:
+        """Category name for each (rounded) index value; "" where the index is NaN"""
+        index = np.asarray(index, dtype=float)
+        names = np.array(self.categories + ("",), dtype=object)
+        positions = np.where(np.isnan(index), len(self.categories), np.digitize(index, self.category_bounds, right=True))
+        return names[positions]
+
+
+def _bands(upper_bounds: Iterable[float], indices: Iterable[float], step: float = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """np.interp breakpoints for published bands
+
+    Bands are given by their upper concentration bounds; each band after the
+    first starts one reporting `step` above the previous bound and one index
+    point above the previous index bound (e.g. US PM2.5 35.5 -> 101).
+    """
+    upper_bounds, indices = list(upper_bounds), list(indices)
+    concentrations, points = [0.0], [float(indices[0])]
+    for band, upper in enumerate(upper_bounds):
+        if band:
+            concentrations.append(upper_bounds[band - 1] + step)
+            points.append(indices[band] + 1)
+        concentrations.append(upper)
+        points.append(indices[band + 1])
+    return np.asarray(concentrations, dtype=float), np.asarray(points, dtype=float)
+
+
+# CPCB National Air Quality Index. The Severe band (401-500) continues at
+# the Very Poor band's slope, as in CPCB's published calculator.
+_NAQI_INDEX = (0, 50, 100, 200, 300, 400, 500)
+NAQI = Scale(
+    name="CPCB NAQI",
+    breakpoints={
+        "pm25": _bands((30, 60, 90, 120, 250, 380), _NAQI_INDEX),
+        "pm10": _bands((50, 100, 250, 350, 430, 510), _NAQI_INDEX),
+        "no2": _bands((40, 80, 180, 280, 400, 520), _NAQI_INDEX),
+        "o3": _bands((50, 100, 168, 208, 748, 1288), _NAQI_INDEX),
+        "co": _bands((1.0, 2.0, 10, 17, 34, 51), _NAQI_INDEX, step=0.1),
+        "so2": _bands((40, 80, 380, 800, 1600, 2400), _NAQI_INDEX),
+        "nh3": _bands((200, 400, 800, 1200, 1800, 2400), _NAQI_INDEX)
+    },
+    category_bounds=(50, 100, 200, 300, 400),
+    categories=("Good", "Satisfactory", "Moderate", "Poor", "Very Poor", "Severe")
+)
+
+_US_INDEX = (0, 50, 100, 150, 200, 300, 500)
+
+
+def _us_gas(pollutant: str, ppb: Iterable[float], indices: Iterable[float] = _US_INDEX,
+            step: float = 1) -> Tuple[np.ndarray, np.ndarray]:
+    ppb, indices = _bands(ppb, indices, step)
+    return ppb * _PPB_TO_UGM3[pollutant], indices
+
+
+# US EPA AQI (PM2.5 breakpoints as revised in 2024). Gas breakpoints are
+# published in ppb/ppm and converted to CPCB units so both scales share inputs.
+US_AQI = Scale(
+    name="US EPA AQI",
+    breakpoints={
+        "pm25": _bands((9.0, 35.4, 55.4, 125.4, 225.4, 325.4), _US_INDEX, step=0.1),
+        "pm10": _bands((54, 154, 254, 354, 424, 604), _US_INDEX),
+        "no2": _us_gas("no2", (53, 100, 360, 649, 1249, 2049)),
+        # 8-hour ozone has no breakpoints above Very Unhealthy
+        "o3": _us_gas("o3", (54, 70, 85, 105, 200), _US_INDEX[:-1]),
+        "co": _us_gas("co", (4.4, 9.4, 12.4, 15.4, 30.4, 50.4), step=0.1),
+        "so2": _us_gas("so2", (35, 75, 185, 304, 604, 1004))
+    },
+    category_bounds=(50, 100, 150, 200, 300),
+    categories=("Good", "Moderate", "Unhealthy for Sensitive", "Unhealthy", "Very Unhealthy", "Hazardous")
+)
+
+
+@dataclass
+class AQIResult:
+    index: np.ndarray
+    category: np.ndarray
+    dominant: np.ndarray
+    sub_indices: Dict[str, np.ndarray]
+
+
+def compute_aqi(concentrations: Mapping[str, np.ndarray], scale: Scale = NAQI,
+                min_pollutants: Optional[int] = None) -> AQIResult:
+    """Overall index, category and dominant pollutant for every point
+
+    The index is the highest sub-index. For NAQI it is only reported where at
+    least `min_pollutants` (default 3) pollutants are present, one of them
+    PM2.5 or PM10, as CPCB requires; elsewhere it is NaN.
+    """
+    pollutants = [p for p in POLLUTANTS if p in concentrations and p in scale.breakpoints]
+    if not pollutants:
+        raise ValueError(f"No pollutants supported by {scale.name} in {list(concentrations)}")
+
+    sub_indices = {p: scale.sub_index(p, concentrations[p]) for p in pollutants}
+    stacked = np.stack(np.broadcast_arrays(*sub_indices.values()))
+
+    present = ~np.isnan(stacked)
+    if min_pollutants is None:
+        min_pollutants = 3 if scale is NAQI else 1
+    valid = present.any(axis=0) & (present.sum(axis=0) >= min_pollutants)
+    if scale is NAQI:
+        particulate = [pollutants.index(p) for p in ("pm25", "pm10") if p in pollutants]
+        valid = valid & (present[particulate].any(axis=0) if particulate else False)
+
+    filled = np.where(present, stacked, -np.inf)
+    dominant_position = filled.argmax(axis=0)
+    index = np.where(valid, np.rint(filled.max(axis=0)), np.nan)
+
+    names = np.array(pollutants + [""], dtype=object)
+    dominant = names[np.where(np.isnan(index), len(pollutants), dominant_position)]
+
+    return AQIResult(index=index, category=scale.category(index), dominant=dominant, sub_indices=sub_indices)
+
+
+def concentrations_from_iaqi(readings: Iterable[Mapping]) -> Dict[str, np.ndarray]:
+    """Concentration arrays from WAQI `iaqi` maps (one per station or time step)
+
+    WAQI reports each pollutant as a US EPA sub-index rather than a
+    concentration, so values are mapped back through the US breakpoints.
+    """
+    readings = list(readings)
+    values = {
+        pollutant: np.array([
+            float(reading[pollutant]["v"]) if isinstance(reading.get(pollutant), Mapping) and "v" in reading[pollutant]
+            else np.nan
+            for reading in readings
+        ])
+        for pollutant in US_AQI.breakpoints
+    }
+    return {pollutant: US_AQI.concentration(pollutant, sub_index) for pollutant, sub_index in values.items()}
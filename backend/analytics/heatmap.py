@@ -0,0 +1,103 @@
+"""Hour-of-day x day-of-week aggregates per area.
+
+Each area owns a fixed 7 x 24 cell of counts and sums in two NumPy arrays,
+updated in place as readings or incidents arrive. Reading an area's heatmap
+copies 168 cells, however much history went into them.
+"""
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+HOURS = 24
+CELLS = len(WEEKDAYS) * HOURS
+
+
+class HourlyHeatmap:
+    """Per-area weekday x hour counts and value sums
+
+    Cells are addressed as one flat index, area * 168 + weekday * 24 + hour,
+    so callers can remember where a record was counted and move it later.
+    """
+
+    def __init__(self, areas: Iterable[str]):
+        self.areas: List[str] = list(areas)
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.areas)}
+        self.counts = np.zeros(len(self.areas) * CELLS, dtype=np.int64)
+        self.sums = np.zeros(len(self.areas) * CELLS, dtype=np.float64)
+        # Latest timestamp per area, for sources that re-deliver the same reading
+        self.latest: Dict[int, datetime] = {}
+        self.total = 0
+
+    def cell(self, area: str, when: datetime) -> Optional[int]:
+        i = self.index.get(area)
+        if i is None:
+            return None
+        return i * CELLS + when.weekday() * HOURS + when.hour
+
+    def add(self, cell: int, value: float = 1.0, count: int = 1):
+        self.counts[cell] += count
+        self.sums[cell] += value
+        self.total += count
+
+    def remove(self, cell: int, value: float = 1.0):
+        self.add(cell, -value, -1)
+
+    def observe(self, area: str, when: datetime, value: float = 1.0, only_newer: bool = False) -> Optional[int]:
+        """Count one record; returns its cell, or None for unknown areas and (only_newer) repeated readings"""
+        cell = self.cell(area, when)
+        if cell is None:
+            return None
+        if only_newer:
+            i = cell // CELLS
+            latest = self.latest.get(i)
+            if latest is not None and when <= latest:
+                return None
+            self.latest[i] = when
+        self.add(cell, value)
+        return cell
+
+    def grid(self, area: Optional[str] = None) -> Optional[Dict]:
+        """7 x 24 counts and means for one area (every area summed when None); None for unknown areas"""
+        if area is None:
+            counts = self.counts.reshape(-1, len(WEEKDAYS), HOURS).sum(axis=0)
+            sums = self.sums.reshape(-1, len(WEEKDAYS), HOURS).sum(axis=0)
+        else:
+            i = self.index.get(area)
+            if i is None:
+                return None
+            counts = self.counts[i * CELLS:(i + 1) * CELLS].reshape(len(WEEKDAYS), HOURS)
+            sums = self.sums[i * CELLS:(i + 1) * CELLS].reshape(len(WEEKDAYS), HOURS)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts > 0, sums / counts, np.nan)
+        return {"counts": counts, "means": means}
+
+
+def heatmap_document(grid: Dict, value: str) -> Dict:
+    """JSON shape of a grid: rows per weekday, and the peak cell by `value` ("count" or "mean")"""
+    counts, means = grid["counts"], grid["means"]
+    ranked = counts if value == "count" else np.nan_to_num(means, nan=-np.inf)
+
+    peak = None
+    if counts.any():
+        weekday, hour = np.unravel_index(int(np.argmax(ranked)), ranked.shape)
+        peak = {
+            "weekday": WEEKDAYS[weekday],
+            "hour": int(hour),
+            "count": int(counts[weekday, hour])
+        }
+        if value == "mean":
+            peak["mean"] = round(float(means[weekday, hour]), 1)
+
+    document = {
+        "weekdays": list(WEEKDAYS),
+        "hours": list(range(HOURS)),
+        "counts": counts.tolist(),
+        "samples": int(counts.sum()),
+        "peak": peak
+    }
+    if value == "mean":
+        document["means"] = [[None if np.isnan(m) else round(float(m), 1) for m in row] for row in means]
+    return document
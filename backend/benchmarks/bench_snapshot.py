@@ -0,0 +1,151 @@
+import asyncio
+
+import numpy as np
+import orjson
+
+import main
+from analytics.aqi import NAQI, POLLUTANTS, compute_aqi
+from analytics.heatmap import HourlyHeatmap, heatmap_document
+from benchmarks.synthetic_city import generate_registry
+from models.snapshot import Snapshot
+from scrapers.registry import AreaRegistry, load_registry
+from services.alerts import AlertIndex, Subscription
+from services.changes import diff_snapshots
+from services.cities import CityRuntime
+from services.compression import PrecompressedBody
+from services.incidents import IncidentIngestor, IncidentStore
+from services.responses import dumps
+
+
+def test_snapshot_assembly(benchmark, fake_upstream, apis):
+    snapshot = benchmark.pedantic(lambda: asyncio.run(apis.fetch_real_bangalore_data()), rounds=20, warmup_rounds=2)
+    assert snapshot["air_quality"]["total_stations_active"] > 0
+
+
+def test_build_typed_snapshot(benchmark, raw_snapshot):
+    snapshot = benchmark(Snapshot.from_dict, raw_snapshot)
+    assert snapshot.to_dict() == raw_snapshot
+
+
+def test_build_map_features(benchmark, snapshot):
+    features = benchmark(main.build_map_features, snapshot)
+    assert len(features) == sum(len(layer) for layer in snapshot.area_layers())
+
+
+def test_render_all_data_csv(benchmark, snapshot):
+    content = benchmark(main.render_all_data_csv, snapshot)
+    assert content.startswith("data_type,area,")
+
+
+def test_build_map_features_at_scale(benchmark, scaled_snapshot):
+    features = benchmark(main.build_map_features, scaled_snapshot)
+    assert len(features) == sum(len(layer) for layer in scaled_snapshot.area_layers())
+
+
+def test_render_all_data_csv_at_scale(benchmark, scaled_snapshot):
+    content = benchmark(main.render_all_data_csv, scaled_snapshot)
+    assert content.count("\n") > len(scaled_snapshot.area_index())
+
+
+def test_render_incidents_csv(benchmark, snapshot):
+    content = benchmark(main.render_incidents_csv, snapshot)
+    assert content.startswith("fir_number,")
+
+
+def test_render_incidents_csv_filtered(benchmark, snapshot):
+    content = benchmark(main.render_incidents_csv, snapshot, "Koramangala", "Mobile theft")
+    assert content.count("\n") == 2
+
+
+def test_serialize_real_data(benchmark, snapshot):
+    body = benchmark(dumps, {"city": "Bangalore, India", "data": snapshot.to_dict()})
+    assert body.startswith(b"{")
+
+
+def test_serialize_map_data(benchmark, snapshot):
+    features = main.build_map_features(snapshot)
+    body = benchmark(dumps, {"type": "FeatureCollection", "features": features})
+    assert body.startswith(b"{")
+
+
+def test_project_areas(benchmark, snapshot):
+    areas = list(snapshot.area_index())
+    result = benchmark(main.project_areas, snapshot, areas, None, ["coordinates", "air_quality.aqi", "crime_stats.safety_score"])
+    assert not result["missing"] and result["areas"][areas[0]]["air_quality"].keys() == {"aqi", "coordinates"}
+
+
+def test_precompress_real_data(benchmark, snapshot):
+    body = benchmark(PrecompressedBody, dumps({"city": "Bangalore, India", "data": snapshot.to_dict()}))
+    assert set(body.variants) == {"br", "gzip"}
+
+
+def test_load_shared_real_data(benchmark, scaled_snapshot):
+    # What a replica does instead of rendering and compressing: decode another replica's cached body
+    blob = PrecompressedBody(dumps({"city": "Synthetic", "data": scaled_snapshot.to_dict()})).to_bytes()
+    body = benchmark(PrecompressedBody.from_bytes, blob)
+    assert set(body.variants) == {"br", "gzip"}
+
+
+def test_load_shared_snapshot(benchmark, scaled_snapshot):
+    # Adopting a shared snapshot: parse the cached document and build the typed snapshot
+    blob = dumps(scaled_snapshot.to_dict())
+    snapshot = benchmark(lambda: Snapshot.from_dict(orjson.loads(blob)))
+    assert snapshot.to_dict() == scaled_snapshot.to_dict()
+
+
+def test_naqi_batch_history(benchmark):
+    # 50 stations x 90 days of hourly readings
+    rng = np.random.default_rng(1)
+    concentrations = {pollutant: rng.uniform(0, 250, (50, 24 * 90)) for pollutant in POLLUTANTS}
+    result = benchmark(compute_aqi, concentrations, NAQI)
+    assert result.index.shape == (50, 24 * 90) and not np.isnan(result.index).any()
+
+
+def test_match_alerts(benchmark, snapshot):
+    # 10k radius subscriptions against a refresh where every area changed
+    rng = np.random.default_rng(1)
+    index = AlertIndex(load_registry(), max_subscriptions=10000)
+    for lat, lng, threshold in zip(rng.uniform(12.85, 13.1, 10000), rng.uniform(77.5, 77.75, 10000), rng.uniform(0, 300, 10000)):
+        index.add(Subscription("bangalore", "air_quality", "aqi", "above", float(threshold), "http://127.0.0.1/",
+                               center=[float(lat), float(lng)], radius_km=5), Snapshot.from_dict({}))
+    changes = diff_snapshots(Snapshot.from_dict({}), snapshot)
+
+    def match():
+        index._values.clear()
+        return index.match(changes)
+
+    alerts = benchmark(match)
+    assert alerts and all(alert["value"] > alert["threshold"] for alert in alerts)
+
+
+def test_normalize_incidents(benchmark, tmp_path):
+    # 10k FIRs in mixed timestamp formats, validated and normalized as ingestion does
+    ingestor = IncidentIngestor(IncidentStore(str(tmp_path / "incidents.sqlite3")), load_registry())
+    whens = ("2026-10-01 14:30", "01/10/2026 2:30 PM", "2026-10-01T09:00:00Z")
+    records = [
+        {"fir_number": f"FIR {i}/2026", "area": "Koramangala", "type": "Theft", "what": "Phone stolen",
+         "when": whens[i % 3], "officer": "SI A", "status": "Open"}
+        for i in range(10000)
+    ]
+    rows = benchmark(lambda: [ingestor.normalize(record) for record in records])
+    assert {row[4] for row in rows} == {"2026-10-01 14:30"}
+
+
+def test_heatmap_read(benchmark):
+    # 6000 areas with a year of hourly readings each; one area's grid is read per request
+    rng = np.random.default_rng(1)
+    heatmap = HourlyHeatmap(f"Ward {i}" for i in range(6000))
+    cells = rng.integers(0, len(heatmap.counts), 6000 * 24 * 365)
+    np.add.at(heatmap.counts, cells, 1)
+    np.add.at(heatmap.sums, cells, rng.uniform(20, 300, len(cells)))
+
+    document = benchmark(lambda: heatmap_document(heatmap.grid("Ward 42"), "mean"))
+    assert document["samples"] > 0 and len(document["means"]) == 7
+
+
+def test_city_runtime_startup(benchmark, tmp_path, monkeypatch):
+    # Built at import for every city served; collectors must register without fetching or loading numpy
+    monkeypatch.setenv("INCIDENT_DB_DIR", str(tmp_path))
+    registry = AreaRegistry.from_dict(generate_registry(100))
+    runtime = benchmark(CityRuntime, registry)
+    assert not runtime.ready and runtime.apis._aqi_heatmap is None and runtime.incidents.heatmap is None
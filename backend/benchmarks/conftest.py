@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from models.snapshot import Snapshot
+from scrapers import upstreams
+from scrapers.real_bangalore_apis import RealBangaloreAPIs
+from scrapers.registry import AreaRegistry
+
+from .fake_upstream import FakeUpstreamConfig, FakeUpstreamServer
+from .synthetic_city import generate_registry
+
+
+@pytest.fixture(scope="session")
+def fake_upstream():
+    """WAQI and portal stand-in with no added latency, so benchmarks measure our code"""
+    with FakeUpstreamServer(FakeUpstreamConfig(seed=1)) as server:
+        waqi_base_url, portal_base_url = upstreams.WAQI_BASE_URL, upstreams.PORTAL_BASE_URL
+        upstreams.WAQI_BASE_URL = upstreams.PORTAL_BASE_URL = server.url
+        yield server
+        upstreams.WAQI_BASE_URL, upstreams.PORTAL_BASE_URL = waqi_base_url, portal_base_url
+
+
+@pytest.fixture(scope="session")
+def api(fake_upstream):
+    """The app with its lifespan running (outbox included), collecting from the fake upstream
+
+    Session-scoped: shutting the lifespan down closes the render pool for the rest of the process.
+    """
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("ADMIN_TOKEN", "secret")
+        with TestClient(main.app) as client:
+            yield client
+
+
+@pytest.fixture(scope="session")
+def apis():
+    return RealBangaloreAPIs()
+
+
+@pytest.fixture(scope="session")
+def raw_snapshot(fake_upstream, apis):
+    """The collector's nested-dict output"""
+    return asyncio.run(apis.fetch_real_bangalore_data())
+
+
+@pytest.fixture(scope="session")
+def snapshot(raw_snapshot):
+    return Snapshot.from_dict(raw_snapshot)
+
+
+@pytest.fixture(scope="session", params=[10, 100], ids=lambda scale: f"{scale}x")
+def scaled_snapshot(request, fake_upstream):
+    """Snapshot of a synthetic city with 10x / 100x the bundled areas, collected through the fake upstream"""
+    apis = RealBangaloreAPIs(AreaRegistry.from_dict(generate_registry(request.param)))
+    return Snapshot.from_dict(asyncio.run(apis.fetch_real_bangalore_data()))
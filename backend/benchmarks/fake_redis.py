@@ -0,0 +1,191 @@
+"""Local stand-in for a Redis server, enough for services.cache.RedisCache.
+
+Speaks RESP2 and keeps keys in memory with per-key expiry. Run it and
+point one or more backends at it to try a shared cache tier:
+
+    python -m benchmarks.fake_redis --port 6390
+    CACHE_BACKEND=redis CACHE_URL=redis://127.0.0.1:6390/0 uvicorn main:app --port 8000
+    CACHE_BACKEND=redis CACHE_URL=redis://127.0.0.1:6390/0 uvicorn main:app --port 8001
+
+Supported: PING, AUTH, SELECT, GET, SET (EX/PX/NX/XX), DEL, EXISTS, DBSIZE,
+FLUSHALL, FLUSHDB and QUIT. Every database number shares one keyspace.
+"""
+import argparse
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .fake_upstream import free_port
+
+
+class FakeRedis:
+    """Keyspace and command handlers; one instance per server"""
+
+    def __init__(self, password: Optional[str] = None, username: str = "default"):
+        self.username = username
+        self.password = password
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.commands = 0
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry[0]
+
+    def execute(self, args: List[bytes], session: Dict):
+        """Reply for one command: bytes, int, None (nil), str (status) or an Exception (error reply)"""
+        self.commands += 1
+        name = args[0].upper().decode()
+
+        if name == "AUTH":
+            # AUTH password is for the default user; AUTH username password for an ACL user
+            username = args[1].decode() if len(args) > 2 else "default"
+            if self.password is not None and (username, args[-1].decode()) != (self.username, self.password):
+                return Exception("WRONGPASS invalid username-password pair or user is disabled.")
+            session["authenticated"] = True
+            return "OK"
+        if self.password is not None and not session.get("authenticated") and name not in ("PING", "QUIT"):
+            return Exception("NOAUTH Authentication required.")
+
+        if name == "PING":
+            return args[1] if len(args) > 1 else "PONG"
+        if name in ("SELECT", "QUIT"):
+            return "OK"
+        if name == "GET":
+            return self._get(args[1])
+        if name == "SET":
+            key, value = args[1], args[2]
+            expires = None
+            options = [arg.upper() for arg in args[3:]]
+            for i, option in enumerate(options):
+                if option == b"EX":
+                    expires = time.monotonic() + int(options[i + 1])
+                elif option == b"PX":
+                    expires = time.monotonic() + int(options[i + 1]) / 1000
+            exists = self._get(key) is not None
+            if (b"NX" in options and exists) or (b"XX" in options and not exists):
+                return None
+            self.data[key] = (value, expires)
+            return "OK"
+        if name == "DEL":
+            return sum(self.data.pop(key, None) is not None for key in args[1:])
+        if name == "EXISTS":
+            return sum(self._get(key) is not None for key in args[1:])
+        if name == "DBSIZE":
+            return len(self.data)
+        if name in ("FLUSHALL", "FLUSHDB"):
+            self.data.clear()
+            return "OK"
+        return Exception(f"ERR unknown command '{name}'")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        session: Dict = {}
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                reply = self.execute(args, session)
+                writer.write(self._encode(reply))
+                await writer.drain()
+                if args[0].upper() == b"QUIT":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # CancelledError: the server is stopping
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            # Inline command, as typed into telnet or redis-cli --no-raw
+            return line.strip().split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int((await reader.readline())[1:-2])
+            args.append((await reader.readexactly(length + 2))[:-2])
+        return args
+
+    @staticmethod
+    def _encode(reply) -> bytes:
+        if reply is None:
+            return b"$-1\r\n"
+        if isinstance(reply, Exception):
+            return b"-%s\r\n" % str(reply).encode()
+        if isinstance(reply, str):
+            return b"+%s\r\n" % reply.encode()
+        if isinstance(reply, int):
+            return b":%d\r\n" % reply
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+
+
+class FakeRedisServer:
+    """Runs the stand-in on a background thread; use as a context manager"""
+
+    def __init__(self, port: Optional[int] = None, password: Optional[str] = None, username: str = "default"):
+        self.port = port or free_port()
+        user = "" if username == "default" else username
+        self.url = f"redis://{user + ':' + password + '@' if password else ''}127.0.0.1:{self.port}/0"
+        self.redis = FakeRedis(password, username)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._started = threading.Event()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        self._server = self._loop.run_until_complete(asyncio.start_server(self.redis.handle, "127.0.0.1", self.port))
+        self._started.set()
+        self._loop.run_forever()
+        self._loop.close()
+
+    async def _stop(self):
+        self._server.close()
+        # Client connections are still being served; cancel them before the loop goes away
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        asyncio.get_running_loop().stop()
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name="fake-redis", daemon=True)
+        self._thread.start()
+        if not self._started.wait(10):
+            raise RuntimeError("Fake redis server did not start")
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop)
+        self._thread.join(timeout=5)
+
+
+async def serve(host: str, port: int, password: Optional[str], username: str):
+    server = await asyncio.start_server(FakeRedis(password, username).handle, host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Redis stand-in for the shared cache tier")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--password", default=None)
+    parser.add_argument("--username", default="default", help="ACL user the password belongs to")
+    args = parser.parse_args()
+
+    print(f"✅ Fake redis listening on {args.host}:{args.port}")
+    asyncio.run(serve(args.host, args.port, args.password, args.username))
+
+
+if __name__ == "__main__":
+    main()
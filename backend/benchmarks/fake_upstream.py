@@ -0,0 +1,225 @@
+"""Local stand-in for the WAQI feed API and the government portals.
+
+Run it standalone and point the backend at it:
+
+    python -m benchmarks.fake_upstream --port 9100 --latency-ms 50 --error-rate 0.05
+    WAQI_BASE_URL=http://127.0.0.1:9100 PORTAL_BASE_URL=http://127.0.0.1:9100 uvicorn main:app
+
+Latency, errors and payload size can also be changed at runtime with
+POST /_config (JSON body with any of the FakeUpstreamConfig fields).
+
+It also stands in for alert webhook receivers: point a subscription's
+webhook_url at POST /_webhooks and read what arrived from GET /_webhooks.
+"""
+import argparse
+import asyncio
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse
+
+# Same stations the collector queries, so responses look like the real feed
+WAQI_STATIONS = {
+    11293: ("Silk Board, Bengaluru, India", [12.917348, 77.622813]),
+    11312: ("Bapuji Nagar, Bengaluru, India", [12.951913, 77.539784]),
+    8190: ("BTM, Bangalore, India", [12.9135218, 77.5950804]),
+    11276: ("Jayanagar 5th Block, Bengaluru, India", [12.920984, 77.584908]),
+    11428: ("Hebbal, Bengaluru, India", [13.029152, 77.585901]),
+    8686: ("City Railway Station, Bangalore, India", [12.9756843, 77.5660749])
+}
+
+
+class FakeUpstreamConfig:
+    """Knobs for the stand-in; all of them can be changed while it is running"""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+                 payload_kb: float = 0, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.payload_kb = payload_kb
+        self.random = random.Random(seed)
+
+    def update(self, values: Dict):
+        for key in ("latency_ms", "jitter_ms", "error_rate", "payload_kb"):
+            if key in values:
+                setattr(self, key, float(values[key]))
+
+    def to_dict(self) -> Dict:
+        return {
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "error_rate": self.error_rate,
+            "payload_kb": self.payload_kb
+        }
+
+
+def waqi_feed_payload(uid: int, config: FakeUpstreamConfig) -> Dict:
+    """A WAQI /feed/@uid/ response body; payload_kb pads it with forecast days"""
+    name, geo = WAQI_STATIONS.get(uid, (f"Station {uid}", [12.9716, 77.5946]))
+    rng = config.random
+    aqi = rng.randint(40, 180)
+    now = datetime.now()
+
+    # Each forecast day is roughly 200 bytes of JSON
+    days = int(config.payload_kb * 1024 / 200)
+    forecast = {
+        pollutant: [
+            {
+                "avg": rng.randint(20, 150),
+                "day": (now + timedelta(days=i)).strftime("%Y-%m-%d"),
+                "max": rng.randint(60, 200),
+                "min": rng.randint(5, 60)
+            }
+            for i in range(days)
+        ]
+        for pollutant in ("pm25", "pm10", "o3")
+    } if days else {}
+
+    return {
+        "status": "ok",
+        "data": {
+            "aqi": aqi,
+            "idx": uid,
+            "attributions": [
+                {"url": "https://kspcb.karnataka.gov.in/", "name": "Karnataka State Pollution Control Board"},
+                {"url": "https://waqi.info/", "name": "World Air Quality Index Project"}
+            ],
+            "city": {"geo": geo, "name": name, "url": f"https://aqicn.org/city/@{uid}"},
+            "dominentpol": "pm25",
+            "iaqi": {
+                "pm25": {"v": aqi},
+                "pm10": {"v": rng.randint(20, 140)},
+                "no2": {"v": round(rng.uniform(5, 60), 1)},
+                "o3": {"v": round(rng.uniform(2, 50), 1)},
+                "so2": {"v": round(rng.uniform(1, 15), 1)},
+                "co": {"v": round(rng.uniform(1, 20), 1)},
+                "t": {"v": round(rng.uniform(18, 34), 1)},
+                "h": {"v": rng.randint(40, 95)}
+            },
+            "time": {
+                "s": now.strftime("%Y-%m-%d %H:00:00"),
+                "tz": "+05:30",
+                "v": int(now.timestamp()),
+                "iso": now.replace(minute=0, second=0, microsecond=0).isoformat() + "+05:30"
+            },
+            "forecast": {"daily": forecast}
+        }
+    }
+
+
+def create_app(config: Optional[FakeUpstreamConfig] = None) -> FastAPI:
+    config = config or FakeUpstreamConfig()
+    app = FastAPI()
+    app.state.config = config
+    app.state.request_count = 0
+    app.state.webhooks = []
+    # Host header of each webhook, to check which name a delivery addressed
+    app.state.webhook_hosts = []
+
+    async def simulate(request: Request):
+        app.state.request_count += 1
+        delay = config.latency_ms + config.random.uniform(0, config.jitter_ms)
+        if delay:
+            await asyncio.sleep(delay / 1000)
+        return config.random.random() < config.error_rate
+
+    @app.get("/feed/@{uid}/")
+    async def waqi_feed(uid: int, request: Request):
+        if await simulate(request):
+            # WAQI fails both ways: HTTP errors and 200s with an error status
+            if config.random.random() < 0.5:
+                return JSONResponse({"status": "error", "data": "Over quota"})
+            return JSONResponse({"status": "error", "data": "Internal error"}, status_code=503)
+
+        return JSONResponse(waqi_feed_payload(uid, config))
+
+    @app.get("/portal/{host}/{path:path}")
+    async def government_portal(host: str, path: str, request: Request):
+        if await simulate(request):
+            return HTMLResponse("<html><body>Service Unavailable</body></html>", status_code=503)
+
+        filler = "<p>Lorem ipsum civic data</p>" * int(config.payload_kb * 1024 / 30)
+        return HTMLResponse(f"<html><head><title>{host}</title></head><body><h1>/{path}</h1>{filler}</body></html>")
+
+    @app.post("/_webhooks")
+    async def receive_webhook(request: Request):
+        if await simulate(request):
+            return JSONResponse({"error": "Service Unavailable"}, status_code=503)
+        app.state.webhooks.append(await request.json())
+        app.state.webhook_hosts.append(request.headers.get("host"))
+        return {"received": len(app.state.webhooks)}
+
+    @app.get("/_webhooks")
+    async def list_webhooks():
+        return {"webhooks": app.state.webhooks, "hosts": app.state.webhook_hosts}
+
+    @app.get("/_config")
+    async def get_config():
+        return {**config.to_dict(), "request_count": app.state.request_count}
+
+    @app.post("/_config")
+    async def set_config(request: Request):
+        config.update(await request.json())
+        return config.to_dict()
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeUpstreamServer:
+    """Runs the stand-in on a background thread; use as a context manager"""
+
+    def __init__(self, config: Optional[FakeUpstreamConfig] = None, port: Optional[int] = None):
+        self.config = config or FakeUpstreamConfig()
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(uvicorn.Config(
+            create_app(self.config), host="127.0.0.1", port=self.port, log_level="warning"
+        ))
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.run, name="fake-upstream", daemon=True)
+        self._thread.start()
+
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Fake upstream server did not start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local WAQI / government portal stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--payload-kb", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeUpstreamConfig(args.latency_ms, args.jitter_ms, args.error_rate, args.payload_kb, args.seed)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
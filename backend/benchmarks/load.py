@@ -0,0 +1,174 @@
+"""Async load driver for the API endpoints.
+
+With no --target it starts the fake upstream and the backend (uvicorn, in a
+subprocess wired to the fake upstream) and drives that:
+
+    python -m benchmarks.load --duration 10 --concurrency 32
+    python -m benchmarks.load --target http://localhost:8000 --endpoint /api/bangalore/map-data
+    python -m benchmarks.load --scale 100    # against a generated city with 100x the areas
+
+Prints throughput and p50/p99 per endpoint. --max-p99-ms makes the run exit
+non-zero when any endpoint is slower, so it can gate regressions in CI.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from .fake_upstream import FakeUpstreamConfig, FakeUpstreamServer, free_port
+from .synthetic_city import city_slug, write_city
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Formatted with the city served and one of its areas
+DEFAULT_ENDPOINTS = [
+    "/api/{city}/real-data",
+    "/api/{city}/map-data",
+    "/api/{city}/area/{area}",
+    "/api/{city}/incidents/csv",
+    "/api/{city}/all-data/csv"
+]
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_load(target: str, endpoints: List[str], duration: float, concurrency: int) -> Dict:
+    """Round-robin the endpoints from `concurrency` workers for `duration` seconds"""
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    payload_bytes = defaultdict(int)
+    deadline = time.perf_counter() + duration
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=target, timeout=30, limits=limits) as client:
+        async def worker(offset: int):
+            i = offset
+            while time.perf_counter() < deadline:
+                endpoint = endpoints[i % len(endpoints)]
+                i += 1
+                start = time.perf_counter()
+                try:
+                    response = await client.get(endpoint)
+                    elapsed = time.perf_counter() - start
+                    if response.status_code >= 400:
+                        errors[endpoint] += 1
+                    latencies[endpoint].append(elapsed)
+                    payload_bytes[endpoint] += len(response.content)
+                except httpx.HTTPError:
+                    errors[endpoint] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    report = {}
+    for endpoint in endpoints:
+        values = sorted(latencies[endpoint])
+        report[endpoint] = {
+            "requests": len(values),
+            "errors": errors[endpoint],
+            "rps": round(len(values) / wall, 1),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+            "avg_bytes": payload_bytes[endpoint] // len(values) if values else 0
+        }
+    return report
+
+
+def start_backend(port: int, upstream_url: str, city: str = "bangalore", extra_env: Optional[Dict] = None,
+                  timeout: float = 30) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "WAQI_BASE_URL": upstream_url,
+        "PORTAL_BASE_URL": upstream_url,
+        "PYTHONUNBUFFERED": "1",
+        **(extra_env or {})
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            # Wait for the first snapshot so the run measures steady state
+            if httpx.get(f"http://127.0.0.1:{port}/api/{city}/real-data", timeout=timeout).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+
+    process.terminate()
+    raise RuntimeError("Backend did not become ready")
+
+
+def print_report(report: Dict):
+    print(f"{'endpoint':<40} {'reqs':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'bytes':>8}")
+    for endpoint, row in report.items():
+        print(f"{endpoint:<40} {row['requests']:>7} {row['errors']:>5} {row['rps']:>8} "
+              f"{row['p50_ms']:>8} {row['p99_ms']:>8} {row['avg_bytes']:>8}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the civic-pulse API")
+    parser.add_argument("--target", help="Base URL of a running backend (default: start one locally)")
+    parser.add_argument("--endpoint", action="append", dest="endpoints", help="Endpoint path, repeatable")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--upstream-latency-ms", type=float, default=20)
+    parser.add_argument("--upstream-error-rate", type=float, default=0)
+    parser.add_argument("--max-p99-ms", type=float, help="Fail if any endpoint's p99 exceeds this")
+    parser.add_argument("--scale", type=int, help="Serve a synthetic city with this many times the bundled areas")
+    args = parser.parse_args(argv)
+
+    city, area, extra_env = "bangalore", "Koramangala", {}
+    if args.scale:
+        registry_dir = tempfile.mkdtemp(prefix="civic-pulse-cities-")
+        registry_path, _ = write_city(registry_dir, args.scale)
+        with open(registry_path, encoding="utf-8") as f:
+            area = json.load(f)["areas"][0]["name"]
+        city = city_slug(args.scale)
+        extra_env = {"REGISTRY_DIR": registry_dir, "CITIES": city}
+
+    endpoints = args.endpoints or [endpoint.format(city=city, area=area) for endpoint in DEFAULT_ENDPOINTS]
+
+    if args.target:
+        report = asyncio.run(run_load(args.target, endpoints, args.duration, args.concurrency))
+    else:
+        config = FakeUpstreamConfig(latency_ms=args.upstream_latency_ms, error_rate=args.upstream_error_rate, seed=1)
+        with FakeUpstreamServer(config) as upstream:
+            port = free_port()
+            # The first refresh fetches every station, so allow for the city's size
+            backend = start_backend(port, upstream.url, city, extra_env, timeout=30 * max(1, args.scale or 1))
+            try:
+                report = asyncio.run(run_load(f"http://127.0.0.1:{port}", endpoints, args.duration, args.concurrency))
+            finally:
+                backend.terminate()
+                backend.wait(timeout=10)
+
+    print_report(report)
+
+    if args.max_p99_ms is not None:
+        slow = [endpoint for endpoint, row in report.items() if row["p99_ms"] > args.max_p99_ms]
+        if slow:
+            print(f"❌ p99 above {args.max_p99_ms}ms: {', '.join(slow)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
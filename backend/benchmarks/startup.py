@@ -0,0 +1,127 @@
+"""Startup-time benchmark: how long until a fresh backend process is live and ready.
+
+Starts the fake upstream, then launches uvicorn `--runs` times and polls
+the liveness and readiness endpoints every few milliseconds:
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --scale 100 --max-live-ms 800
+    python -m benchmarks.startup --scale 100 --shared-cache   # replicas restarting against a warm shared tier
+
+Reports, per run and as medians, the time to import main (in a separate
+process), to the first 200 from /healthz and to the first 200 from /readyz
+(the first snapshot published). With --shared-cache every run uses one
+fake Redis (CACHE_BACKEND=redis), so runs after the first adopt the
+snapshot the first one shared instead of fetching. --max-live-ms exits
+non-zero when the median time to live is slower, so it can gate
+regressions in CI.
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from .fake_redis import FakeRedisServer
+from .fake_upstream import FakeUpstreamConfig, FakeUpstreamServer, free_port
+from .load import BACKEND_DIR
+from .synthetic_city import city_slug, write_city
+
+IMPORT_PROBE = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+
+def measure_import(env: Dict) -> float:
+    """Seconds to import main (and so build every city's runtime) in a new interpreter"""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE], cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_start(env: Dict, live_path: str, ready_path: str, timeout: float, poll_interval: float = 0.005) -> Dict:
+    """Seconds from spawning uvicorn to the first 200 from `live_path` and from `ready_path`"""
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        # Same server options as the Dockerfile
+        [sys.executable, "-m", "uvicorn", "boot:app", "--host", "127.0.0.1", "--port", str(port), "--ws", "none",
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+
+    result = {"live": None, "ready": None}
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1) as client:
+            deadline = started + timeout
+            while time.perf_counter() < deadline and result["ready"] is None:
+                for name, path in (("live", live_path), ("ready", ready_path)):
+                    if result[name] is not None:
+                        continue
+                    try:
+                        if client.get(path).status_code == 200:
+                            result[name] = time.perf_counter() - started
+                    except httpx.HTTPError:
+                        break
+                time.sleep(poll_interval)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+    if result["ready"] is None:
+        raise RuntimeError(f"Backend did not become ready within {timeout}s")
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Measure backend startup time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scale", type=int, help="Serve a synthetic city with this many times the bundled areas")
+    parser.add_argument("--live-path", default="/healthz")
+    parser.add_argument("--ready-path", default="/readyz")
+    parser.add_argument("--upstream-latency-ms", type=float, default=20)
+    parser.add_argument("--shared-cache", action="store_true", help="Share snapshots between runs through a fake Redis")
+    parser.add_argument("--max-live-ms", type=float, help="Fail if the median time to live exceeds this")
+    args = parser.parse_args(argv)
+
+    extra_env = {}
+    if args.scale:
+        registry_dir = tempfile.mkdtemp(prefix="civic-pulse-cities-")
+        write_city(registry_dir, args.scale)
+        extra_env = {"REGISTRY_DIR": registry_dir, "CITIES": city_slug(args.scale)}
+
+    rows = []
+    config = FakeUpstreamConfig(latency_ms=args.upstream_latency_ms, seed=1)
+    with FakeUpstreamServer(config) as upstream, \
+            (FakeRedisServer() if args.shared_cache else contextlib.nullcontext()) as redis:
+        if redis is not None:
+            extra_env.update({"CACHE_BACKEND": "redis", "CACHE_URL": redis.url})
+        env = {
+            **os.environ,
+            "WAQI_BASE_URL": upstream.url,
+            "PORTAL_BASE_URL": upstream.url,
+            "INCIDENT_DB_DIR": tempfile.mkdtemp(prefix="civic-pulse-incidents-"),
+            **extra_env
+        }
+        for run in range(args.runs):
+            row = {"import": measure_import(env)}
+            row.update(measure_start(env, args.live_path, args.ready_path, timeout=30 * max(1, args.scale or 1)))
+            rows.append(row)
+            print(f"run {run + 1}: import {row['import'] * 1000:.0f}ms, "
+                  f"live {row['live'] * 1000:.0f}ms, ready {row['ready'] * 1000:.0f}ms")
+
+    medians = {name: statistics.median(row[name] for row in rows) * 1000 for name in ("import", "live", "ready")}
+    print(f"median: import {medians['import']:.0f}ms, live {medians['live']:.0f}ms, ready {medians['ready']:.0f}ms")
+
+    if args.max_live_ms is not None and medians["live"] > args.max_live_ms:
+        print(f"❌ median time to live above {args.max_live_ms}ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""Synthetic city registries (and FIR files) for profiling at scale.
+
+Generates a registry in the same schema as data/bangalore.json with
+`scale` times as many areas, stations shared by neighbouring areas, and
+per-area attributes shaped like the bundled ones. Bus routes, water quality
+and safety scores are left to the layer provider, as for areas without
+registry values. Serve it through the normal pipeline:
+
+    python -m benchmarks.synthetic_city --scale 100 --out /tmp/cities --incidents 100000
+    REGISTRY_DIR=/tmp/cities CITIES=synthetic-100x WAQI_BASE_URL=http://127.0.0.1:9100 uvicorn main:app
+    REGISTRY_DIR=/tmp/cities python -m services.incidents synthetic-100x /tmp/cities/synthetic-100x-incidents.ndjson
+
+The fake upstream answers for any station uid, so every generated station
+returns readings. The same scale and seed always produce the same city.
+"""
+import argparse
+import json
+import math
+import os
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from scrapers.registry import load_registry
+
+LOCALITIES = (
+    "Koramangala", "Indiranagar", "Jayanagar", "Malleshwaram", "Basavanagudi", "Rajajinagar", "Yelahanka",
+    "Hebbal", "Banashankari", "Vijayanagar", "Marathahalli", "Bellandur", "Whitefield", "Hennur", "Kengeri",
+    "Yeshwanthpur", "Frazer Town", "Ulsoor", "Domlur", "Shanti Nagar", "Sadashivanagar", "Peenya", "Hoodi",
+    "Mahadevapura", "Kadugodi", "Bommanahalli", "Begur", "Padmanabhanagar", "Nagarbhavi", "Sanjaynagar"
+)
+# Suffixes the layer provider's heuristics key on, plus plain ones
+SUFFIXES = ("", " Layout", " Nagar", " East", " West", " HSR Sector", " BTM Stage", " Extension")
+STATUSES = ("Good", "Good", "Fair", "Fair", "Poor")
+CRIME_RATES = ("Low", "Low", "Medium", "Medium", "High")
+INCIDENT_TYPES = (
+    ("Vehicle theft", "Two-wheeler stolen from parking area"),
+    ("Chain snatching", "Gold chain snatched by persons on a motorcycle"),
+    ("Mobile theft", "Phone stolen at a bus stop"),
+    ("House breaking", "Locked house broken into, valuables missing"),
+    ("Cheating", "Online payment fraud reported")
+)
+INCIDENT_STATUSES = ("Under investigation", "Suspects identified", "Chargesheet filed", "Closed")
+OFFICERS = ("SI Rajesh Kumar", "CI Priya Sharma", "SI Anil Gowda", "PSI Kavya Reddy", "CI Mohan Das")
+
+# Bundled Bangalore bounds, so generated coordinates land on the same map
+SOUTHWEST = (12.7342, 77.4601)
+NORTHEAST = (13.1636, 77.8479)
+
+
+def city_slug(scale: int) -> str:
+    return f"synthetic-{scale}x"
+
+
+def _incident(rng: random.Random, fir_number: str, area: str, when: datetime) -> Dict:
+    kind, what = rng.choice(INCIDENT_TYPES)
+    return {
+        "fir_number": fir_number,
+        "type": kind,
+        "what": what,
+        "when": when.strftime("%Y-%m-%d %H:%M"),
+        "who": "Unknown suspect, CCTV being reviewed",
+        "officer": rng.choice(OFFICERS),
+        "status": rng.choice(INCIDENT_STATUSES),
+        "area": area
+    }
+
+
+def generate_registry(scale: int, seed: int = 0, areas_per_station: int = 4,
+                      now: Optional[datetime] = None) -> Dict:
+    """Registry dict with `scale` times the bundled city's areas"""
+    rng = random.Random(f"{seed}:{scale}")
+    now = now or datetime(2026, 1, 1)
+    bundled = load_registry()
+    count = len(bundled.areas) * scale
+
+    # Areas on a jittered grid over the city bounds; consecutive areas are neighbours
+    columns = math.ceil(math.sqrt(count))
+    rows = math.ceil(count / columns)
+    lat_step = (NORTHEAST[0] - SOUTHWEST[0]) / rows
+    lng_step = (NORTHEAST[1] - SOUTHWEST[1]) / columns
+    coordinates = [
+        [
+            round(SOUTHWEST[0] + (i // columns + rng.uniform(0.2, 0.8)) * lat_step, 6),
+            round(SOUTHWEST[1] + (i % columns + rng.uniform(0.2, 0.8)) * lng_step, 6)
+        ]
+        for i in range(count)
+    ]
+
+    stations = [
+        {
+            "name": f"Synthetic Station {j + 1}",
+            "uid": 900000 + j,
+            "coordinates": coordinates[j * areas_per_station],
+            "waqi_path": None
+        }
+        for j in range(math.ceil(count / areas_per_station))
+    ]
+
+    areas = []
+    for i in range(count):
+        name = f"{LOCALITIES[i % len(LOCALITIES)]}{rng.choice(SUFFIXES)} {i + 1}"
+        incidents = [
+            _incident(rng, f"FIR {i * 3 + k + 1}/{now.year}", name, now - timedelta(minutes=rng.randint(60, 60 * 24 * 30)))
+            for k in range(rng.randint(1, 3))
+        ]
+        incidents.sort(key=lambda incident: incident["when"], reverse=True)
+        for incident in incidents:
+            del incident["area"]
+
+        areas.append({
+            "name": name,
+            "coordinates": coordinates[i],
+            "air_quality_station": stations[i // areas_per_station]["name"],
+            "infrastructure": {
+                "power_status": rng.choice(STATUSES),
+                "water_status": rng.choice(STATUSES)
+            },
+            "transport": {
+                "metro_access": rng.random() < 0.3,
+                "connectivity_score": rng.randint(50, 95),
+                "source_detail": "BMTC route analysis + Government transport data"
+            },
+            "water_quality": {
+                "ph_level": f"{rng.uniform(6.8, 7.6):.1f}",
+                "turbidity": f"{rng.uniform(0.5, 4.0):.1f} NTU",
+                "monitoring_station": f"BWSSB Station S-{i + 1}"
+            },
+            "crime": {
+                "crime_rate": rng.choice(CRIME_RATES),
+                "police_station": f"{name} Police Station",
+                "patrol_frequency": f"{rng.randint(2, 6)} times/day",
+                "last_incident_date": incidents[0]["when"][:10],
+                "recent_incidents": incidents
+            }
+        })
+
+    return {
+        "city": f"Synthetic {scale}x",
+        "slug": city_slug(scale),
+        "display_name": f"Synthetic city ({count} areas)",
+        "map_view": {**bundled.map_view, "name": f"Synthetic city ({count} areas)"},
+        "stations": stations,
+        "areas": areas
+    }
+
+
+def generate_incidents(registry: Dict, count: int, seed: int = 0, now: Optional[datetime] = None) -> Iterator[Dict]:
+    """NDJSON-ready FIR records spread over the registry's areas and the last 90 days"""
+    rng = random.Random(f"{seed}:incidents")
+    now = now or datetime(2026, 1, 1)
+    names: List[str] = [area["name"] for area in registry["areas"]]
+    for n in range(count):
+        when = now - timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+        yield _incident(rng, f"FIR S{n + 1}/{now.year}", rng.choice(names), when)
+
+
+def write_city(directory: str, scale: int, seed: int = 0, incidents: int = 0,
+               areas_per_station: int = 4) -> Tuple[str, Optional[str]]:
+    """Write <slug>.json (and <slug>-incidents.ndjson) into `directory`; returns their paths"""
+    os.makedirs(directory, exist_ok=True)
+    registry = generate_registry(scale, seed, areas_per_station)
+    slug = registry["slug"]
+
+    registry_path = os.path.join(directory, f"{slug}.json")
+    with open(registry_path, "w", encoding="utf-8") as f:
+        json.dump(registry, f)
+
+    incidents_path = None
+    if incidents:
+        incidents_path = os.path.join(directory, f"{slug}-incidents.ndjson")
+        with open(incidents_path, "w", encoding="utf-8") as f:
+            for record in generate_incidents(registry, incidents, seed):
+                f.write(json.dumps(record))
+                f.write("\n")
+
+    return registry_path, incidents_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic city registry for scale testing")
+    parser.add_argument("--scale", type=int, action="append", dest="scales",
+                        help="Multiple of the bundled city's areas, repeatable (default: 10, 100 and 1000)")
+    parser.add_argument("--out", required=True, help="Directory to write into (use as REGISTRY_DIR)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--incidents", type=int, default=0, help="FIRs to write as NDJSON alongside each registry")
+    parser.add_argument("--areas-per-station", type=int, default=4)
+    args = parser.parse_args()
+
+    for scale in args.scales or [10, 100, 1000]:
+        registry_path, incidents_path = write_city(args.out, scale, args.seed, args.incidents, args.areas_per_station)
+        print(f"✅ {city_slug(scale)}: {registry_path}" + (f", {incidents_path}" if incidents_path else ""))
+
+
+if __name__ == "__main__":
+    main()
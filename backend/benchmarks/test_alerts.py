@@ -0,0 +1,182 @@
+import asyncio
+import socket
+import time
+import uuid
+from typing import Dict
+
+import httpx
+import pytest
+
+import main
+from services.alerts import WebhookOutbox, WebhookPolicy, parse_webhook_url
+
+
+@pytest.mark.parametrize("url", ["http://[::1/", "ftp://example.com/hook", "http:///hook", "not a url"])
+def test_parse_webhook_url_rejects_undeliverable(url):
+    with pytest.raises(ValueError):
+        parse_webhook_url(url)
+
+
+def test_outbox_counts_client_errors_as_failed_attempts():
+    async def scenario():
+        outbox = WebhookOutbox(max_attempts=2, backoff_seconds=0)
+        # Bypasses create_alert's validation; httpx raises InvalidURL when posting
+        delivery = outbox.enqueue("http://[::1/", {"value": 1})
+        await outbox.flush()
+        assert delivery.status == "pending" and delivery.attempts == 1
+        assert delivery.last_error.startswith("InvalidURL")
+        await outbox.flush()
+        return delivery
+
+    assert asyncio.run(scenario()).status == "failed"
+
+
+def test_outbox_task_survives_bad_deliveries():
+    async def scenario():
+        outbox = WebhookOutbox(max_attempts=1, backoff_seconds=0)
+        outbox.start()
+        bad = outbox.enqueue("http://[::1/", {})
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if bad.status != "pending":
+                break
+        alive = not outbox._task.done()
+        outbox.stop()
+        return bad, alive
+
+    bad, alive = asyncio.run(scenario())
+    assert bad.status == "failed"
+    assert alive
+
+
+@pytest.fixture(autouse=True)
+def allow_fake_upstream_webhooks(monkeypatch):
+    monkeypatch.setattr(main.webhook_policy, "allowed_hosts", {"127.0.0.1"})
+
+
+def alert_request(runtime, webhook_url: str, **values) -> Dict:
+    lat, lng = runtime.registry.areas[0].coordinates
+    return {"webhook_url": webhook_url, "threshold": 1000, "lat": lat, "lng": lng, "radius_km": 1, **values}
+
+
+def test_alert_webhook_delivered_on_crossing(api, fake_upstream):
+    runtime = next(iter(main.city_runtimes.values()))
+    response = api.post(f"/api/{runtime.slug}/alerts", json=alert_request(runtime, f"{fake_upstream.url}/_webhooks"))
+    assert response.status_code == 201
+    subscription = response.json()["subscription"]
+    area = subscription["areas"][0]
+
+    # The same path a refresh takes when an area's value moves past the threshold
+    def cross():
+        alerts = runtime.alerts.match([{"op": "upsert", "layer": "air_quality", "area": area, "data": {"aqi": 1500}}])
+        runtime.deliver_alerts(alerts)
+        return alerts
+
+    assert len(api.portal.call(cross)) == 1
+
+    received = []
+    for _ in range(200):
+        webhooks = httpx.get(f"{fake_upstream.url}/_webhooks").json()["webhooks"]
+        received = [w for w in webhooks if w["subscription_id"] == subscription["subscription_id"]]
+        if received:
+            break
+        time.sleep(0.01)
+    assert received and received[0]["area"] == area and received[0]["value"] == 1500
+
+
+@pytest.mark.parametrize("webhook_url", [
+    "http://169.254.169.254/latest/meta-data/",
+    "http://10.0.0.5/hook",
+    "http://[::ffff:127.0.0.2]/hook",
+    "http://localhost:6379/"
+])
+def test_alert_rejects_internal_webhooks_even_for_admin(api, webhook_url):
+    runtime = next(iter(main.city_runtimes.values()))
+    response = api.post(f"/api/{runtime.slug}/alerts", json=alert_request(runtime, webhook_url),
+                        headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 422
+
+
+def test_alert_requires_admin_outside_allow_list(api):
+    runtime = next(iter(main.city_runtimes.values()))
+    response = api.post(f"/api/{runtime.slug}/alerts", json=alert_request(runtime, "http://93.184.216.34/hook"))
+    assert response.status_code == 403
+
+
+def test_alert_subscriptions_capped_per_client(api, fake_upstream, monkeypatch):
+    runtime = next(iter(main.city_runtimes.values()))
+    monkeypatch.setattr(main.webhook_policy, "max_per_client", runtime.alerts.count_for("testclient") + 1)
+    body = alert_request(runtime, f"{fake_upstream.url}/_webhooks")
+    assert api.post(f"/api/{runtime.slug}/alerts", json=body).status_code == 201
+    assert api.post(f"/api/{runtime.slug}/alerts", json=body).status_code == 429
+
+
+def test_alert_reads_and_deletes_need_the_subscription_secret(api, fake_upstream):
+    runtime = next(iter(main.city_runtimes.values()))
+    created = api.post(f"/api/{runtime.slug}/alerts", json=alert_request(runtime, f"{fake_upstream.url}/_webhooks")).json()
+    url = f"/api/{runtime.slug}/alerts/{created['subscription']['subscription_id']}"
+    secret = created["secret"]
+    assert "secret" not in created["subscription"]
+
+    assert api.get(url).status_code == 403
+    assert api.get(url, headers={"X-Subscription-Secret": secret + "x"}).status_code == 403
+    assert api.delete(url).status_code == 403
+    assert api.get(url, headers={"X-Subscription-Secret": secret}).status_code == 200
+    assert api.get(url, headers={"X-Admin-Token": "secret"}).status_code == 200
+
+    assert api.delete(url, headers={"X-Subscription-Secret": secret}).status_code == 200
+    assert api.get(url, headers={"X-Subscription-Secret": secret}).status_code == 404
+
+
+def test_policy_pins_the_checked_address():
+    answers = [["93.184.216.34", "10.0.0.5"], ["93.184.216.34"], ["127.0.0.1"]]
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+
+        async def getaddrinfo(host, port, **kwargs):
+            return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port)) for address in answers.pop(0)]
+
+        loop.getaddrinfo = getaddrinfo
+        policy = WebhookPolicy(allowed_hosts=["hooks.internal"])
+        results = []
+        for _ in range(3):
+            try:
+                results.append(await policy.check("https://hooks.example.com/alert"))
+            except ValueError as e:
+                results.append(str(e))
+        results.append(await policy.check("http://hooks.internal/alert"))
+        results.append(await policy.check("http://93.184.216.34/alert"))
+        return results
+
+    mixed, public, rebound, allowed, literal = asyncio.run(scenario())
+    assert "non-public address (10.0.0.5)" in mixed
+    assert public == "93.184.216.34"
+    # A later answer pointing inside is refused rather than followed
+    assert "non-public address (127.0.0.1)" in rebound
+    assert allowed is None and literal is None
+
+
+def test_delivery_connects_to_the_pinned_address(fake_upstream):
+    class LoopbackPolicy(WebhookPolicy):
+        """Vets every host to the fake upstream's address, as if its DNS answer had been checked"""
+
+        async def check(self, url: str):
+            return "127.0.0.1"
+
+    port = httpx.URL(fake_upstream.url).port
+    marker = uuid.uuid4().hex
+
+    async def scenario():
+        outbox = WebhookOutbox(max_attempts=1, policy=LoopbackPolicy())
+        # .invalid never resolves, so the delivery can only arrive through the pinned address
+        delivery = outbox.enqueue(f"http://webhooks.invalid:{port}/_webhooks", {"marker": marker})
+        await outbox.flush()
+        return delivery
+
+    delivery = asyncio.run(scenario())
+    assert delivery.status == "delivered", delivery.last_error
+
+    received = httpx.get(f"{fake_upstream.url}/_webhooks").json()
+    hosts = [host for webhook, host in zip(received["webhooks"], received["hosts"]) if webhook.get("marker") == marker]
+    assert hosts == [f"webhooks.invalid:{port}"]
@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import main
+from analytics.anomalies import AnomalyDetector
+
+START = datetime(2026, 1, 5)
+
+
+def baseline(i: int) -> float:
+    """A noisy but steady reading, so the station's spread is known"""
+    return 100 + (i % 5 - 2) * 3
+
+
+def warmed(readings: int = 12) -> AnomalyDetector:
+    detector = AnomalyDetector()
+    for i in range(readings):
+        assert detector.observe("s", baseline(i), START + timedelta(hours=i)) == []
+    return detector
+
+
+@pytest.mark.parametrize("value, kind", [(300, "spike"), (20, "dip")])
+def test_flags_spikes_and_dips(value, kind):
+    detector = warmed()
+    events = detector.observe("s", value, START + timedelta(hours=12), area="A")
+
+    assert [event["kind"] for event in events] == [kind]
+    assert events[0]["station"] == "s" and events[0]["area"] == "A" and events[0]["value"] == value
+    assert detector.flags("s") == (kind,)
+
+
+def test_stale_readings_are_not_scored_twice():
+    detector = warmed()
+    assert detector.observe("s", 300, START + timedelta(hours=11)) == []
+
+
+def test_flatline_fires_once_at_the_threshold():
+    detector = warmed()
+    kinds = []
+    for i in range(8):
+        events = detector.observe("s", 97, START + timedelta(hours=12 + i))
+        kinds.append([event["kind"] for event in events])
+
+    # The 12th warm-up reading was 97 too, so the 5th reading here is the 6th identical one
+    assert kinds == [[], [], [], [], ["flatline"], [], [], []]
+    assert detector.flags("s") == ("flatline",)
+    assert detector.summary()["s"]["identical_readings"] == 9
+
+
+def test_daily_peak_stops_flagging_once_its_hour_is_warm():
+    detector = AnomalyDetector()
+    flagged_days = []
+    for i in range(24 * 5):
+        observed_at = START + timedelta(hours=i)
+        value = 250 + i % 3 if observed_at.hour == 8 else baseline(i)
+        if detector.observe("s", value, observed_at):
+            flagged_days.append(observed_at.day)
+
+    # Only until the 8 o'clock baseline has `seasonal_warmup` readings
+    assert flagged_days == [5, 6, 7]
+
+
+def test_anomalies_endpoint_filters_by_station_and_cursor(api):
+    runtime = next(iter(main.city_runtimes.values()))
+
+    def inject():
+        detector = runtime.apis.anomaly_detector
+        since = detector.last_event_id
+        for station in ("test-a", "test-b"):
+            for i in range(12):
+                detector.observe(station, baseline(i), START + timedelta(hours=i))
+        for hour in range(12, 14):
+            for station in ("test-a", "test-b"):
+                detector.observe(station, 300 + hour, START + timedelta(hours=hour))
+        return since
+
+    since = api.portal.call(inject)
+    response = api.get(f"/api/{runtime.slug}/anomalies", params={"since": since, "station": "test-a", "limit": 1})
+    assert response.status_code == 200
+    body = response.json()
+
+    events = body["events"]
+    assert [(event["station"], event["value"]) for event in events] == [("test-a", 312)]
+    assert events[0]["id"] > since
+    assert body["last_id"] == events[-1]["id"]
+    assert {"test-a", "test-b"} <= body["stations"].keys()
+
+    # Paging on from the last id returns the rest
+    rest = api.get(f"/api/{runtime.slug}/anomalies", params={"since": body["last_id"], "station": "test-a"}).json()
+    assert [(event["station"], event["value"]) for event in rest["events"]] == [("test-a", 313)]
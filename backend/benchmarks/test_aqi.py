@@ -0,0 +1,87 @@
+import math
+
+import numpy as np
+import pytest
+
+from analytics.aqi import NAQI, US_AQI, compute_aqi, concentrations_from_iaqi
+
+
+@pytest.mark.parametrize("scale, pollutant, concentration, index, category", [
+    (NAQI, "pm10", 300, 250, "Poor"),
+    (NAQI, "pm10", 100, 100, "Satisfactory"),
+    (NAQI, "pm10", 101, 101, "Moderate"),
+    (NAQI, "pm25", 30, 50, "Good"),
+    (NAQI, "pm25", 31, 51, "Satisfactory"),
+    (NAQI, "co", 2.1, 101, "Moderate"),
+    (US_AQI, "pm25", 35.4, 100, "Moderate"),
+    (US_AQI, "pm25", 35.5, 101, "Unhealthy for Sensitive"),
+    (US_AQI, "pm25", 9.0, 50, "Good"),
+    (US_AQI, "pm10", 155, 101, "Unhealthy for Sensitive"),
+    (US_AQI, "pm25", 500, 500, "Hazardous")
+])
+def test_band_edges(scale, pollutant, concentration, index, category):
+    sub_index = np.rint(scale.sub_index(pollutant, [concentration]))
+    assert sub_index[0] == index
+    assert scale.category(sub_index)[0] == category
+
+
+def test_sub_index_round_trips_through_concentration():
+    sub_indices = np.array([0, 42, 50, 51, 100, 101, 150, 300])
+    assert np.allclose(US_AQI.sub_index("pm25", US_AQI.concentration("pm25", sub_indices)), sub_indices)
+
+
+def test_naqi_needs_three_pollutants_including_particulates():
+    nan = np.nan
+    concentrations = {
+        "pm25": np.array([45, 45, nan, nan]),
+        "pm10": np.array([nan, nan, nan, 120]),
+        "no2": np.array([20, 20, 20, 20]),
+        "o3": np.array([30, nan, 30, 30]),
+        "so2": np.array([nan, nan, 30, nan])
+    }
+    result = compute_aqi(concentrations, NAQI)
+
+    # 1: PM2.5 + 2 gases; 2: only two pollutants; 3: three gases, no particulates; 4: PM10 + 2 gases
+    assert result.index[0] == 75 and result.index[3] == 114
+    assert math.isnan(result.index[1]) and math.isnan(result.index[2])
+    assert list(result.category) == ["Satisfactory", "", "", "Moderate"]
+    assert list(result.dominant) == ["pm25", "", "", "pm10"]
+
+
+def test_dominant_pollutant_has_the_highest_sub_index():
+    result = compute_aqi({"pm25": np.array([20, 20]), "pm10": np.array([40, 40]), "no2": np.array([30, 300])}, NAQI)
+    assert list(result.dominant) == ["pm10", "no2"]
+    assert list(result.index) == [40, 317]
+
+
+def test_concentrations_from_iaqi_maps_us_sub_indices_back():
+    readings = [{"pm25": {"v": 100}, "pm10": {"v": 50}, "t": {"v": 25}}, {"no2": {"v": 10}}, {}]
+    concentrations = concentrations_from_iaqi(readings)
+
+    assert concentrations.keys() == set(US_AQI.breakpoints)
+    assert concentrations["pm25"][0] == pytest.approx(35.4)
+    assert concentrations["pm10"][0] == pytest.approx(54)
+    assert math.isnan(concentrations["pm25"][1]) and np.isnan(concentrations["pm25"][2])
+    assert concentrations["no2"][1] > 0
+
+
+def test_station_naqi_is_none_without_enough_pollutants(apis):
+    readings = [
+        {"pollutants": {"pm25": {"v": 100}, "no2": {"v": 10}, "o3": {"v": 20}}},
+        {"pollutants": {"pm25": {"v": 100}}}
+    ]
+    apis._add_naqi(readings)
+
+    # US sub-index 100 is 35.4 µg/m³ PM2.5, which NAQI puts at 58 (Satisfactory)
+    assert readings[0]["naqi"] == 58 and readings[0]["naqi_category"] == "Satisfactory"
+    assert readings[0]["dominant_pollutant"] == "pm25"
+    assert readings[1]["naqi"] is None and readings[1]["naqi_category"] == ""
+
+
+@pytest.mark.parametrize("aqi, status", [
+    (0, "Good"), (50, "Good"), (51, "Moderate"), (100, "Moderate"), (101, "Unhealthy for Sensitive"),
+    (150, "Unhealthy for Sensitive"), (151, "Unhealthy"), (200, "Unhealthy"), (201, "Very Unhealthy"),
+    (300, "Very Unhealthy"), (301, "Hazardous"), (999, "Hazardous")
+])
+def test_aqi_status_keeps_the_baseline_categories(apis, aqi, status):
+    assert apis._get_aqi_status(aqi) == status
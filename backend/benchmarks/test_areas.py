@@ -0,0 +1,21 @@
+import main
+
+
+def test_project_areas_skips_layers_without_requested_fields(snapshot):
+    areas = list(snapshot.area_index())
+    result = main.project_areas(snapshot, areas, None, ["aqi"])
+
+    assert not result["missing"]
+    assert all(area_data.keys() == {"air_quality"} for area_data in result["areas"].values())
+    assert result["areas"][areas[0]]["air_quality"].keys() == {"aqi"}
+
+
+def test_project_areas_layer_and_shared_fields(snapshot):
+    areas = list(snapshot.area_index())
+    result = main.project_areas(snapshot, areas + ["Atlantis"], ["air_quality", "crime_stats"],
+                                ["coordinates", "crime_stats.safety_score"])
+
+    assert result["missing"] == ["Atlantis"]
+    area_data = result["areas"][areas[0]]
+    assert area_data["air_quality"].keys() == {"coordinates"}
+    assert area_data["crime_stats"].keys() == {"coordinates", "safety_score"}
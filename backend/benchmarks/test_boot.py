@@ -0,0 +1,58 @@
+import asyncio
+from typing import Dict, List
+
+from boot import DeferredApp
+
+EVENTS: List[str] = []
+
+
+async def app(scope, receive, send):
+    """Stands in for main:app: a lifespan and one route"""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            EVENTS.append(message["type"])
+            await send({"type": message["type"] + ".complete"})
+            if message["type"] == "lifespan.shutdown":
+                return
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": scope["path"].encode()})
+
+
+async def request(deferred: DeferredApp, path: str) -> Dict:
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        sent.append(message)
+
+    await deferred({"type": "http", "path": path}, receive, send)
+    return {"status": sent[0]["status"], "body": sent[1]["body"], "headers": dict(sent[0]["headers"])}
+
+
+def test_deferred_app_is_live_before_the_target_loads():
+    async def scenario():
+        deferred = DeferredApp("benchmarks.test_boot:app")
+        lifespan_in, lifespan_out = asyncio.Queue(), asyncio.Queue()
+        lifespan = asyncio.create_task(deferred({"type": "lifespan"}, lifespan_in.get, lifespan_out.put))
+        await lifespan_in.put({"type": "lifespan.startup"})
+        assert (await lifespan_out.get())["type"] == "lifespan.startup.complete"
+
+        # The import runs on a worker thread; nothing has been handed over yet
+        before = await request(deferred, "/healthz"), await request(deferred, "/readyz")
+        await deferred._loading
+        after = await request(deferred, "/readyz")
+
+        await lifespan_in.put({"type": "lifespan.shutdown"})
+        await lifespan
+        return before, after, await lifespan_out.get()
+
+    EVENTS.clear()
+    (live, ready), after, shutdown = asyncio.run(scenario())
+    assert live["status"] == 200 and live["body"] == b'{"status": "ok"}'
+    assert ready["status"] == 503 and ready["headers"][b"retry-after"] == b"1"
+    assert after == {"status": 200, "body": b"/readyz", "headers": {}}
+    assert shutdown["type"] == "lifespan.shutdown.complete"
+    assert EVENTS == ["lifespan.startup", "lifespan.shutdown"]
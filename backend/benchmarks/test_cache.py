@@ -0,0 +1,198 @@
+import asyncio
+
+import orjson
+import pytest
+
+from scrapers.registry import load_registry
+from services.cache import CacheBackend, DiskCache, MemoryCache, RedisCache, TieredCache, cache_key
+from services.cities import CityRuntime
+
+from .fake_redis import FakeRedisServer
+
+
+@pytest.fixture(scope="module")
+def redis_server():
+    with FakeRedisServer(password="secret") as server:
+        yield server
+
+
+@pytest.fixture(params=["memory", "disk", "redis", "tiered"])
+def backend(request, tmp_path, redis_server):
+    redis_server.redis.data.clear()
+    if request.param == "memory":
+        return MemoryCache()
+    if request.param == "disk":
+        return DiskCache(str(tmp_path / "cache"))
+    if request.param == "redis":
+        return RedisCache(redis_server.url)
+    return TieredCache(MemoryCache(), RedisCache(redis_server.url))
+
+
+def test_backend_roundtrip(backend):
+    async def scenario():
+        key = cache_key("test", "roundtrip")
+        assert await backend.get(key) is None
+        await backend.set(key, b"\x00binary\r\nvalue")
+        value = await backend.get(key)
+        await backend.delete(key)
+        deleted = await backend.get(key)
+        await backend.close()
+        return value, deleted
+
+    value, deleted = asyncio.run(scenario())
+    assert value == b"\x00binary\r\nvalue" and deleted is None
+    stats = backend.stats()
+    assert stats.get("errors", 0) == 0
+
+
+def test_backend_expiry(backend):
+    async def scenario():
+        await backend.set(cache_key("test", "short"), b"gone", ttl=0.05)
+        await backend.set(cache_key("test", "long"), b"kept", ttl=60)
+        await asyncio.sleep(0.1)
+        values = await backend.get(cache_key("test", "short")), await backend.get(cache_key("test", "long"))
+        await backend.close()
+        return values
+
+    assert asyncio.run(scenario()) == (None, b"kept")
+
+
+def test_backend_add_only_stores_absent_keys(backend):
+    async def scenario():
+        key, short = cache_key("test", "add"), cache_key("test", "add-short")
+        results = [await backend.add(key, b"first", ttl=60), await backend.add(key, b"second", ttl=60)]
+        await backend.add(short, b"gone", ttl=0.05)
+        await asyncio.sleep(0.1)
+        # An expired key is absent again
+        results.append(await backend.add(short, b"again", ttl=60))
+        values = await backend.get(key), await backend.get(short)
+        await backend.close()
+        return results, values
+
+    assert asyncio.run(scenario()) == ([True, False, True], (b"first", b"again"))
+
+
+def test_partial_backend_fails_at_construction():
+    class ReadOnly(CacheBackend):
+        async def get(self, key):
+            return None
+
+    with pytest.raises(TypeError, match="delete"):
+        ReadOnly()
+
+
+def test_redis_unavailable_is_a_miss():
+    async def scenario():
+        with FakeRedisServer() as server:
+            port = server.port
+        cache = RedisCache(f"redis://127.0.0.1:{port}/0", retry_after=60)
+        await cache.set("key", b"value")
+        return cache, await cache.get("key")
+
+    cache, value = asyncio.run(scenario())
+    # One failure, then the server is skipped instead of costing a timeout per call
+    assert value is None and cache.errors == 1
+
+
+def test_redis_wrong_password_is_a_miss(redis_server):
+    async def scenario():
+        cache = RedisCache(f"redis://:wrong@127.0.0.1:{redis_server.port}/0")
+        value = await cache.get("key")
+        await cache.close()
+        return cache, value
+
+    cache, value = asyncio.run(scenario())
+    assert value is None and cache.errors == 1
+
+
+def test_redis_acl_user():
+    async def scenario(url):
+        cache = RedisCache(url)
+        await cache.set("key", b"value")
+        value = await cache.get("key")
+        await cache.close()
+        return cache, value
+
+    with FakeRedisServer(password="secret", username="civic") as server:
+        assert server.url.startswith("redis://civic:secret@")
+        cache, value = asyncio.run(scenario(server.url))
+        assert value == b"value" and cache.errors == 0
+        # The right password for the wrong user is still refused
+        cache, value = asyncio.run(scenario(f"redis://:secret@127.0.0.1:{server.port}/0"))
+        assert value is None and cache.errors == 1
+
+
+def test_tiered_promotes_l2_hits(redis_server):
+    async def scenario():
+        writer = TieredCache(MemoryCache(), RedisCache(redis_server.url))
+        reader = TieredCache(MemoryCache(), RedisCache(redis_server.url))
+        await writer.set("key", b"value", ttl=60)
+        first = await reader.get("key")
+        promoted = await reader.l1.get("key")
+        await writer.close()
+        await reader.close()
+        return first, promoted
+
+    assert asyncio.run(scenario()) == (b"value", b"value")
+
+
+def test_tiered_shared_get_skips_stale_l1(redis_server):
+    async def scenario():
+        a = TieredCache(MemoryCache(), RedisCache(redis_server.url))
+        b = TieredCache(MemoryCache(), RedisCache(redis_server.url))
+        await a.set("latest", b"v6", ttl=60)
+        await b.set("latest", b"v7", ttl=60)
+        values = await a.get("latest"), await a.shared_get("latest")
+        await a.close()
+        await b.close()
+        return values
+
+    # get() may serve this process's own copy; coordination reads must not
+    assert asyncio.run(scenario()) == (b"v6", b"v7")
+
+
+def test_replicas_never_reuse_a_shared_version(fake_upstream, redis_server, tmp_path, monkeypatch):
+    monkeypatch.setenv("INCIDENT_DB_DIR", str(tmp_path))
+    redis_server.redis.data.clear()
+
+    async def scenario():
+        a, b = (
+            CityRuntime(load_registry(), cache=TieredCache(MemoryCache(), RedisCache(redis_server.url)))
+            for _ in range(2)
+        )
+        await a.refresh()
+        # B adopts A's snapshot, then fetches the next one itself
+        await b.refresh()
+        await b.refresh()
+        # A still has its own pointer in L1; it must see B's newer one and adopt it
+        await a.refresh()
+        await a.cache.close()
+        await b.cache.close()
+        return a.published, b.published
+
+    a, b = asyncio.run(scenario())
+    assert a.version == b.version
+    assert a.snapshot.to_dict() == b.snapshot.to_dict()
+
+
+def test_replicas_fetching_together_claim_distinct_versions(fake_upstream, redis_server, tmp_path, monkeypatch):
+    monkeypatch.setenv("INCIDENT_DB_DIR", str(tmp_path))
+    redis_server.redis.data.clear()
+
+    async def scenario():
+        a, b = (
+            CityRuntime(load_registry(), cache=TieredCache(MemoryCache(), RedisCache(redis_server.url)))
+            for _ in range(2)
+        )
+        # Booted in the same millisecond: neither sees a shared snapshot, both number their fetch alike
+        b.published = a.published
+        await asyncio.gather(a.refresh(), b.refresh())
+        await a.cache.close()
+        await b.cache.close()
+        return a.published, b.published
+
+    a, b = asyncio.run(scenario())
+    assert abs(a.version - b.version) == 1
+    for published in (a, b):
+        stored = redis_server.redis.data[cache_key("snapshot", "bangalore", f"v{published.version}").encode()][0]
+        assert orjson.loads(stored) == published.snapshot.to_dict()
@@ -0,0 +1,116 @@
+import copy
+from typing import Dict, List
+
+from models.snapshot import Snapshot
+from services.changes import ChangeLog, diff_snapshots
+
+
+def apply(document: Dict, changes: List[Dict]) -> Dict:
+    """What a client does with a /changes response"""
+    document = copy.deepcopy(document)
+    for change in changes:
+        op = change["op"]
+        if op == "meta":
+            areas = document.get(change["layer"], {}).get("areas", {})
+            document[change["layer"]] = {**change["data"], "areas": areas}
+        elif op == "upsert":
+            document.setdefault(change["layer"], {}).setdefault("areas", {})[change["area"]] = change["data"]
+        elif op == "remove":
+            del document[change["layer"]]["areas"][change["area"]]
+        elif op == "remove_layer":
+            del document[change["layer"]]
+        elif op == "set":
+            document[change["key"]] = change["data"]
+        elif op == "unset":
+            del document[change["key"]]
+    return document
+
+
+def without_timestamp(document: Dict) -> Dict:
+    # last_updated travels in the response envelope, not as a change
+    return {key: value for key, value in document.items() if key != "last_updated"}
+
+
+def upsert(layer: str, area: str, aqi: int) -> Dict:
+    return {"op": "upsert", "layer": layer, "area": area, "data": {"aqi": aqi}}
+
+
+def test_since_merges_upsert_remove_layer_and_meta():
+    log = ChangeLog()
+    log.record(2, [upsert("air_quality", "A", 1), upsert("air_quality", "B", 1)])
+    log.record(3, [{"op": "remove_layer", "layer": "air_quality"}])
+    log.record(4, [{"op": "meta", "layer": "air_quality", "data": {"source": "new"}}, upsert("air_quality", "B", 2)])
+
+    # The removed layer drops the earlier upserts; it is re-created by the later meta
+    assert log.since(1, 4) == [
+        {"op": "remove_layer", "layer": "air_quality"},
+        {"op": "meta", "layer": "air_quality", "data": {"source": "new"}},
+        upsert("air_quality", "B", 2)
+    ]
+    assert log.since(3, 4) == log._entries[-1][2]
+    assert log.since(4, 4) == []
+
+
+def test_since_keeps_last_change_per_target_in_order():
+    log = ChangeLog()
+    log.record(2, [upsert("air_quality", "A", 1), upsert("transport", "A", 1)])
+    log.record(3, [upsert("air_quality", "A", 2), {"op": "remove", "layer": "transport", "area": "A"}])
+    assert log.since(1, 3) == [upsert("air_quality", "A", 2), {"op": "remove", "layer": "transport", "area": "A"}]
+
+
+def test_since_falls_back_when_the_ring_is_trimmed():
+    log = ChangeLog(max_versions=2)
+    for version in range(2, 6):
+        log.record(version, [upsert("air_quality", "A", version)])
+
+    assert log.oldest == 3
+    # Older than the ring: the client must take a full snapshot
+    assert log.since(2, 5) is None
+    assert log.since(3, 5) == [upsert("air_quality", "A", 5)]
+    # Unknown future versions are out of range too
+    assert log.since(6, 5) is None
+
+
+def test_since_falls_back_across_a_version_gap():
+    log = ChangeLog()
+    log.record(2, [upsert("air_quality", "A", 2)])
+    # Adopted from another replica: 2 -> 7 skips versions no client can diff from
+    log.record(7, [upsert("air_quality", "A", 7)], base=2)
+    log.record(8, [upsert("air_quality", "A", 8)])
+
+    assert log.since(5, 8) is None
+    assert log.since(2, 8) == log.since(1, 8) == [upsert("air_quality", "A", 8)]
+
+    # A change set that does not start where the log ends restarts it
+    log.record(12, [upsert("air_quality", "A", 12)], base=10)
+    assert log.oldest == 10
+    assert log.since(8, 12) is None
+
+
+def test_since_replays_real_snapshots(snapshot):
+    documents = [copy.deepcopy(snapshot.to_dict())]
+
+    changed = copy.deepcopy(documents[-1])
+    area = next(iter(changed["air_quality"]["areas"]))
+    changed["air_quality"]["areas"][area]["aqi"] += 1
+    documents.append(changed)
+
+    removed = copy.deepcopy(changed)
+    del removed["transport"]
+    documents.append(removed)
+
+    readded = copy.deepcopy(removed)
+    readded["transport"] = copy.deepcopy(snapshot.to_dict()["transport"])
+    readded["transport"]["areas"].popitem()
+    documents.append(readded)
+
+    snapshots = [Snapshot.from_dict(document) for document in documents]
+    log = ChangeLog()
+    for version in range(1, len(snapshots)):
+        log.record(version, diff_snapshots(snapshots[version - 1], snapshots[version]))
+
+    current = len(snapshots) - 1
+    for since in range(current):
+        changes = log.since(since, current)
+        assert without_timestamp(apply(snapshots[since].to_dict(), changes)) == without_timestamp(snapshots[current].to_dict())
+
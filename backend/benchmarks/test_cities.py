@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+import main
+from services.cities import load_city_runtimes
+
+from .synthetic_city import city_slug, generate_registry
+
+# Not "bangalore": a second runtime for a served slug would take over its snapshot-age gauge
+SYNTHETIC, LARGER = city_slug(2), city_slug(3)
+
+
+@pytest.fixture
+def registry_dir(tmp_path):
+    for scale in (2, 3):
+        (tmp_path / f"{city_slug(scale)}.json").write_text(json.dumps(generate_registry(scale)))
+    return str(tmp_path)
+
+
+def test_each_registry_gets_its_own_runtime(registry_dir):
+    runtimes = load_city_runtimes(data_dir=registry_dir)
+    assert runtimes.keys() == {SYNTHETIC, LARGER}
+
+    synthetic, larger = runtimes[SYNTHETIC], runtimes[LARGER]
+    assert 3 * len(synthetic.registry) == 2 * len(larger.registry)
+    assert synthetic.apis is not larger.apis and synthetic.changelog is not larger.changelog
+    assert synthetic.incidents.store.path != larger.incidents.store.path
+    # Shared only through the cache backend
+    assert synthetic.cache is larger.cache
+
+    assert load_city_runtimes([SYNTHETIC], data_dir=registry_dir).keys() == {SYNTHETIC}
+    with pytest.raises(ValueError, match="atlantis"):
+        load_city_runtimes([SYNTHETIC, "atlantis"], data_dir=registry_dir)
+
+
+@pytest.fixture
+def two_cities(api, registry_dir, monkeypatch):
+    """The app serving a second, synthetic city next to Bangalore"""
+    runtime = load_city_runtimes([SYNTHETIC], data_dir=registry_dir, cache=main.shared_cache)[SYNTHETIC]
+    runtime.renderers.update(main.SNAPSHOT_RENDERERS)
+    runtime.outbox = main.alert_outbox
+    runtime.render_pool = main.render_pool
+    monkeypatch.setitem(main.city_runtimes, SYNTHETIC, runtime)
+    return main.city_runtimes["bangalore"], runtime
+
+
+def test_cities_are_served_independently(api, two_cities):
+    for runtime in two_cities:
+        response = api.get(f"/api/{runtime.slug}/real-data")
+        assert response.status_code == 200
+        document = response.json()
+        assert document["city"] == runtime.display_name
+        assert document["version"] == runtime.published.version
+        assert document["data"]["crime_stats"]["areas"].keys() == {area.name for area in runtime.registry.areas}
+
+    # Refreshing one city leaves the other's published snapshot alone
+    bangalore, synthetic = two_cities
+    published, synthetic_published = bangalore.published, synthetic.published
+    api.portal.call(synthetic.refresh)
+    assert bangalore.published is published
+    assert synthetic.published.version > synthetic_published.version
+
+
+def test_unknown_city_is_404(api):
+    response = api.get("/api/atlantis/map-data")
+    assert response.status_code == 404
+    assert response.json() == {"detail": "City 'atlantis' is not served by this node"}
+
+
+def test_city_segment_is_case_insensitive(api):
+    response = api.get("/api/Bangalore/city-bounds")
+    assert response.status_code == 200
+    assert response.json() == api.get("/api/bangalore/city-bounds").json()
@@ -0,0 +1,112 @@
+import gzip
+
+import brotli
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+from services.compression import CompressionMiddleware, PrecompressedBody, negotiate, precompressed_response
+
+BODY = b'{"areas": [' + b",".join(b'{"name": "Ward %d", "aqi": %d}' % (i, i % 300) for i in range(500)) + b"]}"
+PRECOMPRESSED = PrecompressedBody(BODY)
+
+
+@pytest.mark.parametrize("header, expected", [
+    (None, None),
+    ("", None),
+    ("identity", None),
+    ("gzip", "gzip"),
+    ("gzip, br", "br"),
+    ("GZIP, deflate", "gzip"),
+    ("br;q=0.5, gzip", "gzip"),
+    ("br;q=0, gzip;q=0", None),
+    ("br; Q=0, gzip", "gzip"),
+    ("gzip;q=0, *", "br"),
+    ("*;q=0", None),
+    ("*", "br"),
+    ("identity;q=1, gzip;q=0.1", "gzip"),
+    ("gzip;q=bogus, br;q=0.2", "br"),
+])
+def test_negotiate(header, expected):
+    assert negotiate(header) == expected
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = FastAPI()
+
+    @app.get("/json")
+    async def json_body():
+        return Response(BODY, media_type="application/json")
+
+    @app.get("/small")
+    async def small_body():
+        return Response(b'{"ok": true}', media_type="application/json")
+
+    @app.get("/image")
+    async def image_body():
+        return Response(BODY, media_type="image/png")
+
+    @app.get("/ranged")
+    async def ranged_body():
+        return Response(BODY, media_type="text/csv", headers={"Accept-Ranges": "bytes"})
+
+    @app.get("/stream")
+    async def stream_body():
+        return StreamingResponse(iter([BODY[:1000], BODY[1000:]]), media_type="application/json")
+
+    @app.get("/precompressed")
+    async def precompressed(request: Request):
+        return precompressed_response(request, PRECOMPRESSED, "application/json")
+
+    app.add_middleware(CompressionMiddleware, minimum_size=500)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("accept, encoding", [("gzip", "gzip"), ("gzip, br", "br"), ("br;q=0, gzip", "gzip")])
+def test_compresses_negotiated_encoding(client, accept, encoding):
+    response = client.get("/json", headers={"Accept-Encoding": accept})
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    # The client decodes it; one layer of encoding gives back the original body
+    assert response.content == BODY
+
+
+@pytest.mark.parametrize("accept", ["identity", "br;q=0, gzip;q=0", "*;q=0"])
+def test_identity_when_nothing_acceptable(client, accept):
+    response = client.get("/json", headers={"Accept-Encoding": accept})
+    assert "content-encoding" not in response.headers
+    assert response.content == BODY
+
+
+@pytest.mark.parametrize("path", ["/small", "/image", "/ranged"])
+def test_skips_small_incompressible_and_ranged_bodies(client, path):
+    response = client.get(path, headers={"Accept-Encoding": "gzip, br"})
+    assert "content-encoding" not in response.headers
+
+
+def test_compresses_streamed_bodies(client):
+    with client.stream("GET", "/stream", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == "gzip" and "content-length" not in response.headers
+    assert gzip.decompress(raw) == BODY
+
+
+@pytest.mark.parametrize("accept, encoding", [("gzip", "gzip"), ("gzip, br", "br"), ("identity", None)])
+def test_precompressed_variants_served_as_stored(client, accept, encoding):
+    with client.stream("GET", "/precompressed", headers={"Accept-Encoding": accept}) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers.get("content-encoding") == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    # Passed through by the middleware: exactly the stored bytes, not compressed again
+    assert raw == (PRECOMPRESSED.variants[encoding] if encoding else BODY)
+
+
+def test_precompressed_body_roundtrip():
+    body = PrecompressedBody.from_bytes(PRECOMPRESSED.to_bytes())
+    assert body.body == BODY and body.variants == PRECOMPRESSED.variants
+    assert brotli.decompress(body.variants["br"]) == gzip.decompress(body.variants["gzip"]) == BODY
+
+    small = PrecompressedBody(b"{}")
+    assert small.variants == {} and small.encoded("br") == (b"{}", None)
@@ -0,0 +1,73 @@
+import asyncio
+from datetime import date
+
+import orjson
+
+from services.exports import ArtifactStore, ExportService, run_export
+
+
+def test_identical_exports_render_the_layer_once(snapshot, tmp_path):
+    service = ExportService(ArtifactStore(str(tmp_path)), max_workers=1)
+    loads = []
+
+    async def load_layer():
+        loads.append(1)
+        return snapshot.layer("crime_stats").to_dict()
+
+    async def scenario():
+        submit = lambda start: service.submit(
+            "bangalore", 7, "crime_stats", load_layer, snapshot.last_updated or "", start, None, "csv"
+        )
+        first = submit(None)
+        joined = [submit(None) for _ in range(5)]
+        await first.task
+        # Finished with its artifact on disk: still joined, still not rendered again
+        joined.append(submit(None))
+        other = submit(date(2025, 1, 1))
+        await other.task
+        return first, joined, other
+
+    try:
+        first, joined, other = asyncio.run(scenario())
+    finally:
+        service.shutdown()
+    assert all(job is first for job in joined) and first.requests_merged == 7
+    assert first.status == other.status == "completed"
+    assert len(loads) == 2
+
+
+def test_failed_layer_render_fails_the_job(tmp_path):
+    service = ExportService(ArtifactStore(str(tmp_path)))
+
+    async def load_layer():
+        raise RuntimeError("render pool is busy")
+
+    async def scenario():
+        job = service.submit("bangalore", 7, "crime_stats", load_layer, "", None, None, "json")
+        await job.task
+        return job, service.submit("bangalore", 7, "crime_stats", load_layer, "", None, None, "json")
+
+    job, retry = asyncio.run(scenario())
+    assert job.status == "failed" and job.error == "render pool is busy"
+    # Failed jobs are not joined; the retry starts over
+    assert retry is not job
+
+
+def test_range_is_clamped_to_the_snapshot(tmp_path):
+    layer_data = {"areas": {
+        "A": {"coordinates": [12.9, 77.6], "recent_incidents": [
+            {"fir_number": "FIR 1", "when": "2026-10-01 08:00"}, {"fir_number": "FIR 2", "when": "2026-10-05 09:00"}
+        ]},
+        "B": {"coordinates": [13.0, 77.5], "recent_incidents": [{"fir_number": "FIR 3", "when": "2026-10-09 10:00"}]}
+    }}
+    path = str(tmp_path / "export.json")
+
+    # Asks from 2025 on, but the snapshot's rows only start on 2026-10-01
+    result = run_export("crime_stats", layer_data, "", "2025-01-01", "2026-10-06", "json", path)
+    assert (result["coverage_start"], result["coverage_end"]) == ("2026-10-01", "2026-10-09")
+    assert result["rows"] == 2
+
+    with open(path, "rb") as f:
+        document = orjson.loads(f.read())
+    assert [row["fir_number"] for row in document["rows"]] == ["FIR 1", "FIR 2"]
+    assert (document["coverage_start"], document["coverage_end"]) == ("2026-10-01", "2026-10-09")
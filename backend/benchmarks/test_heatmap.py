@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime
+
+import numpy as np
+
+import main
+from analytics.heatmap import CELLS, HOURS, WEEKDAYS, HourlyHeatmap, heatmap_document
+from scrapers.registry import load_registry
+from services.incidents import IncidentIngestor, IncidentStore
+
+
+def test_cell_addresses_area_weekday_and_hour():
+    heatmap = HourlyHeatmap(["A", "B"])
+    # Wednesday 2026-10-07, 17:45
+    when = datetime(2026, 10, 7, 17, 45)
+
+    assert heatmap.cell("A", when) == 2 * HOURS + 17
+    assert heatmap.cell("B", when) == CELLS + 2 * HOURS + 17
+    assert heatmap.cell("Atlantis", when) is None
+
+    heatmap.observe("B", when, 120)
+    grid = heatmap.grid("B")
+    assert grid["counts"][2, 17] == 1 and grid["means"][2, 17] == 120
+    assert grid["counts"].sum() == 1 and np.isnan(grid["means"][2, 16])
+
+
+def test_only_newer_skips_repeated_readings():
+    heatmap = HourlyHeatmap(["A"])
+    when = datetime(2026, 10, 7, 17)
+    assert heatmap.observe("A", when, 100, only_newer=True) is not None
+    assert heatmap.observe("A", when, 100, only_newer=True) is None
+    assert heatmap.total == 1
+
+
+def test_area_grids_sum_to_the_city_grid():
+    heatmap = HourlyHeatmap(["A", "B"])
+    heatmap.observe("A", datetime(2026, 10, 5, 8), 100)
+    heatmap.observe("A", datetime(2026, 10, 5, 8), 200)
+    heatmap.observe("B", datetime(2026, 10, 5, 8), 50)
+    heatmap.observe("B", datetime(2026, 10, 11, 23), 10)
+
+    city = heatmap.grid()
+    assert np.array_equal(city["counts"], heatmap.grid("A")["counts"] + heatmap.grid("B")["counts"])
+    assert city["counts"][0, 8] == 3 and city["means"][0, 8] == 350 / 3
+    assert heatmap.grid("A")["means"][0, 8] == 150
+    assert heatmap.grid("Atlantis") is None
+
+    document = heatmap_document(city, "mean")
+    assert document["samples"] == heatmap.total == 4
+    assert document["peak"] == {"weekday": "Mon", "hour": 8, "count": 3, "mean": 116.7}
+    assert document["means"][6][23] == 10 and document["means"][0][0] is None
+
+
+def test_updated_fir_moves_between_cells(tmp_path):
+    ingestor = IncidentIngestor(IncidentStore(str(tmp_path / "incidents.sqlite3")), load_registry())
+    area = ingestor.registry.areas[0].name
+
+    async def scenario():
+        heatmap = await ingestor.incident_heatmap()
+        cells = heatmap.cell(area, datetime(2026, 10, 5, 9)), heatmap.cell(area, datetime(2026, 10, 6, 18))
+
+        def state():
+            return heatmap.total, [int(heatmap.counts[cell]) for cell in cells]
+
+        states = [state()]
+        for when in ("2026-10-05 09:15", "2026-10-06 18:00", "2026-10-06 18:40", "sometime"):
+            ingestor._place("FIR 1", area, when)
+            states.append(state())
+        return states
+
+    states = asyncio.run(scenario())
+    ingestor.store.close()
+
+    (total, (monday, tuesday)), placed, moved, same_cell, dropped = states
+    assert placed == (total + 1, [monday + 1, tuesday])
+    assert moved == same_cell == (total + 1, [monday, tuesday + 1])
+    # Unparseable times drop the FIR from the heatmap
+    assert dropped == (total, [monday, tuesday])
+    assert "FIR 1" not in ingestor._cells
+
+
+def test_heatmap_endpoint(api):
+    runtime = next(iter(main.city_runtimes.values()))
+    area = runtime.registry.areas[0].name
+
+    response = api.get(f"/api/{runtime.slug}/heatmap", params={"metric": "incidents", "area": area})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["area"] == area and body["metric"] == "incidents"
+    assert body["weekdays"] == list(WEEKDAYS) and body["hours"] == list(range(HOURS))
+    assert len(body["counts"]) == 7 and all(len(row) == HOURS for row in body["counts"])
+    assert "means" not in body
+
+    city = api.get(f"/api/{runtime.slug}/heatmap", params={"metric": "aqi"}).json()
+    assert city["area"] is None and len(city["means"]) == 7
+
+    unknown = api.get(f"/api/{runtime.slug}/heatmap", params={"metric": "incidents", "area": "Atlantis"})
+    assert unknown.status_code == 404
+    assert unknown.json() == {"detail": "Unknown area 'Atlantis'"}
@@ -0,0 +1,150 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List
+
+import orjson
+import pytest
+
+from scrapers.real_govt_apis import RealGovernmentAPIs
+from scrapers.registry import load_registry
+from services.incidents import IncidentIngestor, IncidentStore, ingest_ndjson, ndjson_lines, normalize_when
+
+
+@pytest.mark.parametrize("value", [1e20, 10 ** 18, -1e20, float("nan"), float("inf"), "0001-01-01T00:00:00+14:00"])
+def test_normalize_when_out_of_range_is_invalid(value):
+    assert normalize_when(value) is None
+
+
+def test_normalize_when_epoch_seconds():
+    # 2023-11-14 22:13:20 UTC
+    assert normalize_when(1700000000) == "2023-11-15 03:43"
+
+
+def test_ingest_counts_out_of_range_when_as_invalid(tmp_path):
+    ingestor = IncidentIngestor(IncidentStore(str(tmp_path / "incidents.sqlite3")), load_registry())
+    records = [
+        {"fir_number": f"FIR {i}/2026", "area": "Koramangala", "type": "Theft", "what": "Phone stolen",
+         "when": when, "officer": "SI A", "status": "Open"}
+        for i, when in enumerate(["2026-10-01 14:30", 1e20, 10 ** 18, 1700000000])
+    ]
+
+    result = asyncio.run(ingestor.ingest(records))
+    assert result["accepted"] == 2 and result["invalid"] == 2
+    assert [error["record"] for error in result["errors"]] == [2, 3]
+
+
+@pytest.fixture
+def ingestor(tmp_path):
+    ingestor = IncidentIngestor(IncidentStore(str(tmp_path / "incidents.sqlite3")), load_registry(), batch_size=2)
+    yield ingestor
+    ingestor.store.close()
+
+
+def fir(number: int, when: str = "2026-10-05 09:15", **values) -> Dict:
+    return {"fir_number": f"FIR {number}/2026", "area": "Koramangala", "type": "Theft", "what": "Phone stolen",
+            "when": when, "officer": "SI A", "status": "Open", **values}
+
+
+def test_same_record_is_a_duplicate(ingestor):
+    async def scenario():
+        first = await ingestor.ingest([fir(1), fir(1)])
+        await ingestor.flush()
+        return first, await ingestor.ingest([fir(1)])
+
+    first, again = asyncio.run(scenario())
+    assert (first["accepted"], first["duplicates"]) == (1, 1)
+    assert (again["accepted"], again["updated"], again["duplicates"]) == (0, 0, 1)
+    assert ingestor.store.count() == 1 and ingestor.stats()["pending"] == 0
+
+
+def test_changed_record_is_updated_and_moves_its_heatmap_cell(ingestor):
+    monday, tuesday = datetime(2026, 10, 5, 9, 15), datetime(2026, 10, 6, 18, 0)
+
+    async def scenario():
+        heatmap = await ingestor.incident_heatmap()
+        cells = heatmap.cell("Koramangala", monday), heatmap.cell("Koramangala", tuesday)
+        before = [int(heatmap.counts[cell]) for cell in cells]
+
+        await ingestor.ingest([fir(1)])
+        await ingestor.flush()
+        placed = [int(heatmap.counts[cell]) for cell in cells]
+
+        result = await ingestor.ingest([fir(1, when="2026-10-06 18:00")])
+        await ingestor.flush()
+        moved = [int(heatmap.counts[cell]) for cell in cells]
+        return result, before, placed, moved
+
+    result, before, placed, moved = asyncio.run(scenario())
+    assert result["updated"] == 1
+    assert placed == [before[0] + 1, before[1]]
+    assert moved == [before[0], before[1] + 1]
+    assert ingestor.store.recent_by_area(["Koramangala"], 1)["Koramangala"][0]["when"] == "2026-10-06 18:00"
+
+
+def test_flush_commits_batches_in_arrival_order(ingestor, monkeypatch):
+    batches = []
+    write_batch = ingestor.store.write_batch
+
+    def recording_write_batch(rows):
+        batches.append([(row[0], row[-2]) for row in rows])
+        write_batch(rows)
+
+    monkeypatch.setattr(ingestor.store, "write_batch", recording_write_batch)
+
+    async def scenario():
+        result = await ingestor.ingest([fir(1), fir(2), fir(1, status="Closed")])
+        await ingestor.flush()
+        return result
+
+    result = asyncio.run(scenario())
+    assert (result["accepted"], result["updated"]) == (2, 1)
+    # batch_size rows per transaction; the later version of FIR 1 is written last and wins
+    assert batches == [[("FIR 1/2026", "Open"), ("FIR 2/2026", "Open")], [("FIR 1/2026", "Closed")]]
+    statuses = {i["fir_number"]: i["status"] for i in ingestor.store.recent_by_area(["Koramangala"], 10)["Koramangala"]}
+    assert statuses == {"FIR 1/2026": "Closed", "FIR 2/2026": "Open"}
+    assert ingestor.written == 3
+
+
+def test_ndjson_reports_malformed_lines(ingestor):
+    async def chunks():
+        yield orjson.dumps(fir(1)) + b"\n{\"fir_number\": \"FIR 2\n"
+        yield b"\n[1, 2]\n" + orjson.dumps(fir(3))
+
+    result = asyncio.run(ingest_ndjson(ingestor, ndjson_lines(chunks())))
+    assert (result["accepted"], result["invalid"]) == (2, 2)
+    assert [error["record"] for error in result["errors"]] == [2, 3]
+    assert result["errors"][0]["error"].startswith("invalid JSON: ")
+    assert result["errors"][1]["error"] == "record must be a JSON object"
+
+
+def test_crime_layer_lists_the_newest_ingested_firs(ingestor):
+    govt = RealGovernmentAPIs(ingestor.registry)
+    govt.incident_store = ingestor.store
+
+    async def refresh(records: List[Dict]) -> List[Dict]:
+        await ingestor.ingest(records)
+        await ingestor.flush()
+        crime = await govt.fetch_real_crime_data(None)
+        return crime["areas"]["Koramangala"]["recent_incidents"]
+
+    async def scenario():
+        first = await refresh([fir(1, when="2026-10-01 08:00"), fir(2, when="2026-10-03 08:00")])
+        second = await refresh([fir(3, when="2026-10-09 08:00")])
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert [i["fir_number"] for i in first[:2]] == ["FIR 2/2026", "FIR 1/2026"]
+    assert [i["fir_number"] for i in second[:3]] == ["FIR 3/2026", "FIR 2/2026", "FIR 1/2026"]
+
+
+def test_store_reads_from_many_threads(ingestor):
+    asyncio.run(ingestor.ingest([fir(i) for i in range(50)]))
+    asyncio.run(ingestor.flush())
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        counts = list(pool.map(lambda _: ingestor.store.count(), range(200)))
+
+    assert counts == [50] * 200
+    # One connection per reading thread, never shared
+    assert len(ingestor.store._readers) > 1
@@ -0,0 +1,70 @@
+import uuid
+from typing import Dict, Optional
+
+import orjson
+from prometheus_client.parser import text_string_to_metric_families
+
+import main
+
+
+def scrape(api) -> Dict:
+    """(sample name, labels) -> value of every sample /metrics exposes"""
+    response = api.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(response.text)
+        for sample in family.samples
+    }
+
+
+def value(samples: Dict, name: str, **labels) -> Optional[float]:
+    return samples.get((name, tuple(sorted(labels.items()))))
+
+
+def test_http_metrics_are_labelled_by_route_template(api):
+    runtime = next(iter(main.city_runtimes.values()))
+    before = scrape(api)
+
+    for station in ("a", "b", "c"):
+        assert api.get(f"/api/{runtime.slug}/anomalies", params={"station": station}).status_code == 200
+    api.get("/no/such/path")
+    after = scrape(api)
+
+    route = {"method": "GET", "route": "/api/{city}/anomalies", "status": "200"}
+    count = "civic_http_request_seconds_count"
+    assert value(after, count, **route) - (value(before, count, **route) or 0) == 3
+    assert value(after, "civic_http_request_seconds_bucket", le="+Inf", **route) == value(after, count, **route)
+    assert value(after, "civic_http_response_bytes_total", method="GET", route="/api/{city}/anomalies") > 0
+    assert value(after, count, method="GET", route="unmatched", status="404") >= 1
+
+    # Raw paths never become label values
+    routes = {dict(labels).get("route") for (name, labels) in after if name.startswith("civic_http_")}
+    assert f"/api/{runtime.slug}/anomalies" not in routes
+
+
+def test_snapshot_age_gauge(api):
+    runtime = next(iter(main.city_runtimes.values()))
+    assert api.get(f"/api/{runtime.slug}/real-data").status_code == 200
+    age = value(scrape(api), "civic_snapshot_age_seconds", city=runtime.slug)
+    assert age is not None and 0 <= age < 3600
+
+
+def test_ingest_counters(api):
+    runtime = next(iter(main.city_runtimes.values()))
+    area = runtime.registry.areas[0].name
+    before = scrape(api)
+
+    record = {"fir_number": f"FIR {uuid.uuid4().hex}", "area": area, "type": "Theft", "what": "Phone stolen",
+              "when": "2026-10-05 09:15", "officer": "SI A", "status": "Open"}
+    body = orjson.dumps(record) + b"\n" + orjson.dumps(record) + b"\n{oops\n"
+    response = api.post(f"/api/{runtime.slug}/incidents/ingest", content=body, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 202
+    after = scrape(api)
+
+    def delta(outcome: str) -> float:
+        name, labels = "civic_incidents_ingested_total", {"city": runtime.slug, "outcome": outcome}
+        return value(after, name, **labels) - (value(before, name, **labels) or 0)
+
+    assert delta("accepted") == delta("duplicates") == delta("invalid") == 1
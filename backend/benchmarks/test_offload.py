@@ -0,0 +1,51 @@
+import asyncio
+import threading
+
+import pytest
+
+from services.offload import OffloadRejected, RenderPool
+
+
+def test_cancelled_callers_still_count_until_the_render_ends():
+    pool = RenderPool(max_workers=1, max_queue=0)
+    release = threading.Event()
+
+    async def scenario():
+        # A client that disconnects mid-render: its request task is cancelled, the render keeps going
+        request = asyncio.create_task(pool.run("slow", release.wait, 10))
+        await asyncio.sleep(0.01)
+        request.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await request
+
+        pending_while_running = pool.pending
+        with pytest.raises(OffloadRejected):
+            await pool.run("next", lambda: None)
+
+        release.set()
+        for _ in range(100):
+            if pool.pending == 0:
+                break
+            await asyncio.sleep(0.01)
+        return pending_while_running, await pool.run("next", lambda: "rendered")
+
+    try:
+        pending_while_running, result = asyncio.run(scenario())
+    finally:
+        release.set()
+        pool.shutdown()
+    assert pending_while_running == 1
+    assert result == "rendered" and pool.pending == 0 and pool.rejected == 1
+
+
+def test_unbounded_work_queues_past_the_limit():
+    pool = RenderPool(max_workers=1, max_queue=0)
+
+    async def scenario():
+        return await asyncio.gather(*(pool.run("refresh", lambda i=i: i, bounded=False) for i in range(5)))
+
+    try:
+        assert asyncio.run(scenario()) == [0, 1, 2, 3, 4]
+    finally:
+        pool.shutdown()
+    assert pool.pending == 0 and pool.completed == 5
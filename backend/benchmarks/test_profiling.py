@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import time
+
+import main
+from services.profiling import LoopLagMonitor, sample_stacks
+
+
+def blocking_handler(seconds: float):
+    """A sync call made on the event loop, as a misbehaving handler would"""
+    time.sleep(seconds)
+
+
+def test_blocking_call_is_sampled_and_raises_loop_lag():
+    async def scenario():
+        monitor = LoopLagMonitor(interval=0.02, block_threshold=0.05)
+        monitor.start()
+        await asyncio.sleep(0.1)
+        quiet_max = monitor.summary()["lag_max_ms"]
+
+        profile = {}
+        sampler = threading.Thread(target=lambda: profile.update(sample_stacks(0.4, 0.005)))
+        sampler.start()
+        await asyncio.sleep(0.05)
+        blocking_handler(0.3)
+        await asyncio.sleep(0.1)
+        await asyncio.to_thread(sampler.join)
+
+        monitor.stop()
+        return quiet_max, monitor.summary(), profile
+
+    quiet_max, summary, profile = asyncio.run(scenario())
+
+    assert quiet_max < 100
+    assert summary["lag_max_ms"] >= 200
+    assert summary["blocked_events"] == 1
+    assert "blocking_handler (test_profiling.py" in summary["top_blocking_stacks"][0]["stack"]
+
+    blocked = [line for line in profile["collapsed"].splitlines() if "blocking_handler (test_profiling.py" in line]
+    assert blocked and sum(int(line.rsplit(" ", 1)[1]) for line in blocked) >= 10
+
+
+def test_profile_endpoint_formats(api):
+    headers = {"X-Admin-Token": "secret"}
+
+    collapsed = api.get("/debug/profile", params={"seconds": 0.1, "format": "collapsed"}, headers=headers)
+    assert collapsed.status_code == 200 and collapsed.headers["content-type"].startswith("text/plain")
+    assert "MainThread" in collapsed.text
+
+    profile = api.get("/debug/profile", params={"seconds": 0.1}, headers=headers).json()
+    assert profile["samples"] > 0 and profile["collapsed"]
+    assert {"tasks", "loop_lag"} <= profile.keys()
+    assert main.loop_lag_monitor.summary()["samples"] > 0
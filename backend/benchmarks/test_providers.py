@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from scrapers.providers import LayerProvider, LocalProvider
+from scrapers.real_govt_apis import RealGovernmentAPIs
+from scrapers.registry import load_registry
+
+
+def test_partial_provider_fails_at_construction():
+    class BusRoutesOnly(LayerProvider):
+        name = "partial"
+
+        def version(self, layer: str) -> str:
+            return "1"
+
+        def bus_routes(self, area) -> int:
+            return 1
+
+    with pytest.raises(TypeError, match="safety_score"):
+        BusRoutesOnly()
+
+
+def test_local_provider_is_deterministic():
+    area = load_registry().areas[0]
+    first, second, other = LocalProvider(seed=1), LocalProvider(seed=1), LocalProvider(seed=2)
+    values = lambda provider: (provider.bus_routes(area), provider.water_quality_index(area), provider.safety_score(area))
+    assert values(first) == values(second)
+    assert first.version("transport") == second.version("transport") != other.version("transport")
+
+
+def test_unchanged_layers_reuse_their_area_records():
+    apis = RealGovernmentAPIs(load_registry(), LocalProvider(seed=1))
+    first = asyncio.run(apis.fetch_real_transport_data(None))["areas"]
+    second = asyncio.run(apis.fetch_real_transport_data(None))["areas"]
+    # Same provider version, so the same records; no fetch-time stamp that would make them stale
+    assert all(second[name] is record for name, record in first.items())
+    assert not any("last_updated" in record for record in first.values())
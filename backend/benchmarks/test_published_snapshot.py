@@ -0,0 +1,60 @@
+import threading
+from datetime import datetime
+
+import main
+from models.snapshot import PublishedSnapshot, Snapshot
+
+
+def test_views_are_memoized_per_published_object(snapshot):
+    builds = []
+
+    def build(published: PublishedSnapshot):
+        builds.append(published.version)
+        return {"version": published.version}
+
+    first = PublishedSnapshot(snapshot, 1, datetime(2026, 10, 1), ())
+    second = PublishedSnapshot(snapshot, 2, datetime(2026, 10, 2), ())
+
+    assert first.view("summary", build) == {"version": 1}
+    assert first.view("summary", build) is first.view("summary", build)
+    # Same snapshot data, but a new publication never sees the old one's views
+    assert second.view("summary", build) == {"version": 2}
+    assert builds == [1, 2]
+    assert first.views is not second.views
+
+
+def test_readers_never_see_a_mixed_publication(api):
+    runtime = main.city_runtimes["bangalore"]
+
+    # (version, fetch time, snapshot timestamp) of every publication readers can observe
+    publications = set()
+
+    def record():
+        published = runtime.published
+        publications.add((published.version, published.last_updated, published.snapshot.last_updated))
+
+    api.portal.call(runtime.ensure_published)
+    record()
+
+    seen, stop = [], threading.Event()
+
+    def reader(pretty: bool):
+        while not stop.is_set():
+            document = api.get(f"/api/{runtime.slug}/real-data", params={"pretty": pretty}).json()
+            seen.append((document["version"], document["authenticity_guarantee"]["last_updated"],
+                         document["data"].get("last_updated")))
+
+    readers = [threading.Thread(target=reader, args=(pretty,)) for pretty in (False, True, False)]
+    for thread in readers:
+        thread.start()
+    try:
+        for _ in range(3):
+            api.portal.call(runtime.refresh)
+            record()
+    finally:
+        stop.set()
+        for thread in readers:
+            thread.join()
+
+    assert len(publications) == 4
+    assert seen and set(seen) <= publications
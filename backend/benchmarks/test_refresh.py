@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from services import rate_limit
+from services.rate_limit import TokenBucketLimiter
+from services.refresh import RefreshService
+
+
+class CountingRefresh:
+    """Refresh stand-in that takes `seconds` and counts its calls"""
+
+    def __init__(self, seconds: float = 0.01, fail: bool = False):
+        self.seconds = seconds
+        self.fail = fail
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.seconds)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return {"call": self.calls}
+
+
+def test_concurrent_requests_share_one_refresh():
+    async def scenario():
+        refresh = CountingRefresh()
+        service = RefreshService(refresh, debounce_seconds=60)
+        jobs = [service.request() for _ in range(10)]
+        await asyncio.gather(*(service.run() for _ in range(5)))
+        return refresh, jobs
+
+    refresh, jobs = asyncio.run(scenario())
+    assert refresh.calls == 1
+    assert len({job.job_id for job in jobs}) == 1
+    assert jobs[0].status == "completed" and jobs[0].requests_merged == 15
+
+
+def test_completed_refresh_reused_until_debounce_expires():
+    async def scenario():
+        refresh = CountingRefresh()
+        service = RefreshService(refresh, debounce_seconds=0.05)
+        first = await service.run()
+        reused = await service.run()
+        await asyncio.sleep(0.06)
+        fresh = await service.run()
+        return refresh, first, reused, fresh
+
+    refresh, first, reused, fresh = asyncio.run(scenario())
+    assert reused is first and fresh is not first
+    assert refresh.calls == 2
+    assert fresh.result == {"call": 2}
+
+
+def test_failed_refresh_is_not_reused():
+    async def scenario():
+        refresh = CountingRefresh(fail=True)
+        service = RefreshService(refresh, debounce_seconds=60)
+        first = await service.run()
+        second = await service.run()
+        return refresh, first, second
+
+    refresh, first, second = asyncio.run(scenario())
+    assert first.status == "failed" and first.error == "upstream down"
+    assert second is not first and refresh.calls == 2
+
+
+def test_refresh_jobs_are_bounded():
+    async def scenario():
+        service = RefreshService(CountingRefresh(0), debounce_seconds=0, max_jobs=3)
+        jobs = [await service.run() for _ in range(5)]
+        return service, jobs
+
+    service, jobs = asyncio.run(scenario())
+    assert service.get(jobs[0].job_id) is None
+    assert all(service.get(job.job_id) is job for job in jobs[-3:])
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_rate_limiter_allows_burst_then_refills(clock):
+    limiter = TokenBucketLimiter(rate=6 / 60, burst=3)
+    assert [limiter.allow("a")[0] for _ in range(3)] == [True, True, True]
+
+    allowed, retry_after = limiter.allow("a")
+    assert not allowed and retry_after == pytest.approx(10)
+    # Other clients have their own bucket
+    assert limiter.allow("b")[0]
+
+    clock[0] += 10
+    assert limiter.allow("a") == (True, 0.0)
+    assert not limiter.allow("a")[0]
+
+
+def test_rate_limiter_forgets_least_recent_clients(clock):
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_clients=2)
+    for client in ("a", "b", "c"):
+        limiter.allow(client)
+    # "a" was evicted, so it starts again with a full bucket
+    assert limiter.allow("a")[0]
+    assert not limiter.allow("c")[0]
+
+
+@pytest.mark.parametrize("rate", [0, -1])
+def test_rate_limiter_disabled_by_zero_rate(rate):
+    limiter = TokenBucketLimiter(rate=rate, burst=3)
+    assert all(limiter.allow("a") == (True, 0.0) for _ in range(10))
+
+
+def test_rate_limiter_zero_burst_still_allows_one(clock):
+    limiter = TokenBucketLimiter(rate=1, burst=0)
+    assert limiter.allow("a")[0]
+    assert limiter.allow("a") == (False, pytest.approx(1))
@@ -0,0 +1,89 @@
+import asyncio
+
+from services.render_cache import RenderCache
+
+
+def body(value: bytes):
+    async def render():
+        return value
+    return render
+
+
+def test_key_ignores_unset_params_and_order():
+    assert RenderCache.key(1, "csv", {"area": "A", "type": None, "b": 2}) == RenderCache.key(1, "csv", {"b": 2, "area": "A"})
+
+
+def test_evicts_least_recently_used():
+    async def scenario():
+        cache = RenderCache("test", max_entries=2)
+        await cache.get_or_render(1, "csv", {"area": "A"}, body(b"a"))
+        await cache.get_or_render(1, "csv", {"area": "B"}, body(b"b"))
+        # A is used again, so B is the oldest when C arrives
+        assert await cache.get_or_render(1, "csv", {"area": "A"}, body(b"stale")) == b"a"
+        await cache.get_or_render(1, "csv", {"area": "C"}, body(b"c"))
+
+        assert await cache.get_or_render(1, "csv", {"area": "A"}, body(b"new")) == b"a"
+        assert await cache.get_or_render(1, "csv", {"area": "B"}, body(b"b2")) == b"b2"
+        return cache
+
+    cache = asyncio.run(scenario())
+    assert cache.stats() == {"entries": 2, "max_entries": 2, "hits": 2, "misses": 4}
+
+
+def test_invalidate_drops_older_versions():
+    async def scenario():
+        cache = RenderCache("test")
+        await cache.get_or_render(1, "csv", {}, body(b"v1"))
+        await cache.get_or_render(2, "csv", {}, body(b"v2"))
+        cache.invalidate(2)
+        assert cache.stats()["entries"] == 1
+        assert await cache.get_or_render(2, "csv", {}, body(b"other")) == b"v2"
+        assert await cache.get_or_render(1, "csv", {}, body(b"v1 again")) == b"v1 again"
+
+        cache.invalidate()
+        assert cache.stats()["entries"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_misses_share_one_render():
+    renders = 0
+
+    async def render():
+        nonlocal renders
+        renders += 1
+        await asyncio.sleep(0.01)
+        return b"body"
+
+    async def scenario():
+        cache = RenderCache("test")
+        bodies = await asyncio.gather(*(cache.get_or_render(1, "csv", {}, render) for _ in range(20)))
+        return cache, bodies
+
+    cache, bodies = asyncio.run(scenario())
+    assert renders == 1 and bodies == [b"body"] * 20
+    assert cache.misses == 20 and cache.stats()["entries"] == 1
+
+
+def test_failed_render_is_not_cached():
+    attempts = 0
+
+    async def render():
+        nonlocal attempts
+        attempts += 1
+        await asyncio.sleep(0.01)
+        if attempts == 1:
+            raise RuntimeError("render failed")
+        return b"body"
+
+    async def scenario():
+        cache = RenderCache("test")
+        failures = await asyncio.gather(*(cache.get_or_render(1, "csv", {}, render) for _ in range(5)),
+                                        return_exceptions=True)
+        assert cache.stats()["entries"] == 0
+        return failures, await cache.get_or_render(1, "csv", {}, render)
+
+    failures, retried = asyncio.run(scenario())
+    # Everyone waiting on the failed render sees its error; the next request renders again
+    assert all(isinstance(failure, RuntimeError) for failure in failures)
+    assert retried == b"body" and attempts == 2
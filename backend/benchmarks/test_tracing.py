@@ -0,0 +1,72 @@
+import uuid
+
+import orjson
+import pytest
+
+import main
+from services.tracing import InMemoryExporter, Tracer, tracer
+
+
+def test_spans_nest_under_the_current_span():
+    exporter = InMemoryExporter()
+    local = Tracer(exporter, sample_rate=1)
+
+    with local.span("request", route="/x") as root:
+        with local.span("child") as child:
+            child.set_attribute("rows", 3)
+        with pytest.raises(ValueError):
+            with local.span("failing"):
+                raise ValueError("boom")
+
+    spans = {span["name"]: span for span in exporter.recent()}
+    assert spans.keys() == {"request", "child", "failing"}
+    assert spans["request"]["parent_id"] is None and spans["request"]["attributes"] == {"route": "/x"}
+    assert spans["child"]["parent_id"] == spans["failing"]["parent_id"] == root.span_id
+    assert {spans[name]["trace_id"] for name in spans} == {root.trace_id}
+    assert spans["child"]["attributes"] == {"rows": 3}
+    assert spans["failing"]["status"] == "error" and spans["failing"]["error"] == "ValueError: boom"
+
+
+def test_unsampled_traces_record_nothing():
+    exporter = InMemoryExporter()
+    local = Tracer(exporter, sample_rate=0)
+    with local.span("request"):
+        with local.span("child") as child:
+            child.set_attribute("rows", 3)
+    assert exporter.recent() == []
+
+
+def ingest(api, runtime):
+    record = {"fir_number": f"FIR {uuid.uuid4().hex}", "area": runtime.registry.areas[0].name, "type": "Theft",
+              "what": "Phone stolen", "when": "2026-10-05 09:15", "officer": "SI A", "status": "Open"}
+    response = api.post(f"/api/{runtime.slug}/incidents/ingest", content=orjson.dumps(record),
+                        headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 202
+
+
+def test_request_span_tree(api, monkeypatch):
+    runtime = next(iter(main.city_runtimes.values()))
+    monkeypatch.setattr(tracer, "sample_rate", 1.0)
+    ingest(api, runtime)
+
+    spans = api.get("/debug/traces", headers={"X-Admin-Token": "secret"}).json()["spans"]
+    path = f"/api/{runtime.slug}/incidents/ingest"
+    root = [span for span in spans if span["name"] == f"POST {path}"][-1]
+    assert root["parent_id"] is None
+    assert root["attributes"] == {"http.status_code": 202, "http.route": "/api/{city}/incidents/ingest"}
+
+    children = [span for span in spans if span["parent_id"] == root["span_id"]]
+    assert [span["name"] for span in children] == ["incidents.ingest"]
+    assert children[0]["trace_id"] == root["trace_id"]
+    assert 0 <= children[0]["duration_ms"] <= root["duration_ms"]
+
+
+def test_sample_rate_zero_records_no_request_spans(api, monkeypatch):
+    runtime = next(iter(main.city_runtimes.values()))
+    monkeypatch.setattr(tracer, "sample_rate", 0.0)
+    before = len(tracer.exporter.spans)
+    ingest(api, runtime)
+
+    # Background refreshes sampled earlier may still be finishing; this request adds nothing
+    names = {span.name for span in list(tracer.exporter.spans)[before:]}
+    assert not names & {f"POST /api/{runtime.slug}/incidents/ingest", "incidents.ingest"}
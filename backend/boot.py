@@ -0,0 +1,94 @@
+"""Server entrypoint that is live before the application is imported.
+
+Importing main costs most of a second, nearly all of it FastAPI and
+pydantic building their models, which no lazy import in this tree can
+avoid. So uvicorn serves this module instead:
+
+    uvicorn boot:app --host 0.0.0.0 --port 8000 --ws none
+
+It answers /healthz at once and imports main on a worker thread. When the
+import is done it runs main's lifespan, then forwards every request to
+it. Until then /readyz and every other path answer 503 with Retry-After.
+Only the standard library is imported here.
+"""
+import asyncio
+import importlib
+import json
+import os
+import traceback
+from typing import Optional
+
+
+class DeferredApp:
+    """ASGI app that loads `target` ("module:attribute") in the background and then hands over to it"""
+
+    def __init__(self, target: str):
+        self.target = target
+        self.app = None
+        self._loading: Optional[asyncio.Task] = None
+        # The loaded app's lifespan, driven through these queues
+        self._lifespan: Optional[asyncio.Task] = None
+        self._to_app: Optional[asyncio.Queue] = None
+        self._from_app: Optional[asyncio.Queue] = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._serve_lifespan(scope, receive, send)
+        elif self.app is not None:
+            await self.app(scope, receive, send)
+        elif scope["type"] == "http":
+            await self._starting(scope, send)
+
+    async def _serve_lifespan(self, scope, receive, send):
+        await receive()
+        self._loading = asyncio.create_task(self._load(scope))
+        # Startup is reported right away, so the server starts accepting connections now
+        await send({"type": "lifespan.startup.complete"})
+
+        await receive()
+        await self._shutdown()
+        await send({"type": "lifespan.shutdown.complete"})
+
+    async def _load(self, scope):
+        try:
+            module_name, attribute = self.target.split(":")
+            module = await asyncio.to_thread(importlib.import_module, module_name)
+            app = getattr(module, attribute)
+
+            self._to_app, self._from_app = asyncio.Queue(), asyncio.Queue()
+            self._lifespan = asyncio.create_task(app(scope, self._to_app.get, self._from_app.put))
+            await self._to_app.put({"type": "lifespan.startup"})
+            message = await self._from_app.get()
+            if message["type"] != "lifespan.startup.complete":
+                raise RuntimeError(message.get("message") or "application startup failed")
+            self.app = app
+        except Exception:
+            # A replica that cannot load must not keep passing liveness checks; exit so it is restarted
+            traceback.print_exc()
+            os._exit(1)
+
+    async def _shutdown(self):
+        if self._loading is not None and not self._loading.done():
+            # The import thread cannot be interrupted; the process is exiting anyway
+            self._loading.cancel()
+        if self.app is not None:
+            await self._to_app.put({"type": "lifespan.shutdown"})
+            await self._from_app.get()
+            await self._lifespan
+
+    @staticmethod
+    async def _starting(scope, send):
+        if scope["path"] == "/healthz":
+            status, body, headers = 200, {"status": "ok"}, []
+        else:
+            status, body, headers = 503, {"status": "starting"}, [(b"retry-after", b"1")]
+        payload = json.dumps(body).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())] + headers
+        })
+        await send({"type": "http.response.body", "body": payload})
+
+
+app = DeferredApp("main:app")
@@ -1,24 +1,65 @@
-from fastapi import FastAPI
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response
 from contextlib import asynccontextmanager
 import asyncio
 import io
 import csv
-import json
-import httpx
-from typing import Dict, List, Optional
-from datetime import datetime
-
-from scrapers.real_bangalore_apis import RealBangaloreAPIs
+import math
+import os
+from typing import Callable, Dict, List, Literal, Optional
+from datetime import date, datetime
+from pydantic import BaseModel, Field
+
+from scrapers.upstreams import portal_url
+from models.snapshot import AREA_LAYERS, PublishedSnapshot, Snapshot
+from services import metrics
+from services.admin import is_admin, require_admin
+from services.alerts import Subscription, WebhookOutbox, WebhookPolicy, parse_webhook_url
+from services.cache import load_cache
+from services.cities import CityRuntime, load_city_runtimes
+from services.compression import CompressionMiddleware, precompressed_response
+from services.exports import ArtifactStore, ExportService, default_export_dir
+from services.incidents import ingest_ndjson, ndjson_lines
+from services.offload import OffloadRejected, RenderPool
+from services.profiling import LoopLagMonitor, dump_tasks, sample_stacks
+from services.tracing import InMemoryExporter, TracingMiddleware, traced, tracer
+from services.rate_limit import TokenBucketLimiter
+from services.responses import FastJSONResponse, dumps, json_response
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Start background data collection every 15 minutes for real-time data
-    asyncio.create_task(background_real_bangalore_collection())
+    # Watch for handlers that block the event loop
+    loop_lag_monitor.start()
+    alert_outbox.start()
+
+    # Start background data collection every 15 minutes for each city served here
+    for runtime in city_runtimes.values():
+        runtime.start()
     yield
 
-app = FastAPI(lifespan=lifespan)
+    for runtime in city_runtimes.values():
+        runtime.stop()
+    export_service.shutdown()
+    render_pool.shutdown()
+    await shared_cache.close()
+    alert_outbox.stop()
+    loop_lag_monitor.stop()
+
+loop_lag_monitor = LoopLagMonitor(
+    block_threshold=float(os.getenv("LOOP_BLOCK_THRESHOLD_SECONDS", "0.25"))
+)
+
+# GeoJSON, CSV and JSON rendering, snapshot building and large-body compression run here, off the event loop
+render_pool = RenderPool(
+    max_workers=int(os.getenv("RENDER_WORKERS", "4")),
+    max_queue=int(os.getenv("RENDER_QUEUE_SIZE", "64"))
+)
+
+# Only one on-demand profile may run at a time
+profile_lock = asyncio.Lock()
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,127 +69,225 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-real_bangalore_apis = RealBangaloreAPIs()
+# Runs inside the metrics middleware, so response sizes are the compressed bytes on the wire.
+# Bodies are already rendered by then, so their compression is queued rather than shed
+app.add_middleware(CompressionMiddleware, offload=lambda task, fn, *args: render_pool.run(task, fn, *args, bounded=False))
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 
-# Cache for real Bangalore data
-bangalore_cache = {}
-last_fetch_time = None
+# Snapshots, rendered bodies and upstream responses; CACHE_BACKEND=disk or redis shares them between replicas
+shared_cache = load_cache()
 
-async def background_real_bangalore_collection():
-    global bangalore_cache, last_fetch_time
+# One independent snapshot, collector and refresh scheduler per city (CITIES picks this node's share)
+city_runtimes = load_city_runtimes(cache=shared_cache)
 
-    while True:
-        try:
-            print("🔄 Fetching REAL Bangalore data from actual APIs...")
-
-            # Fetch all real Bangalore data
-            real_data = await real_bangalore_apis.fetch_real_bangalore_data()
-            bangalore_cache = real_data
-            last_fetch_time = datetime.now()
+# Per-client limit on the public refresh endpoints (REFRESH_RATE_LIMIT_PER_MINUTE=0 turns it off)
+refresh_rate_limiter = TokenBucketLimiter(
+    rate=float(os.getenv("REFRESH_RATE_LIMIT_PER_MINUTE", "6")) / 60,
+    burst=int(os.getenv("REFRESH_RATE_LIMIT_BURST", "3"))
+)
 
-            print(f"✅ Updated REAL Bangalore data - Air quality from {real_data['air_quality'].get('total_stations_active', 0)} stations")
+# Large exports run in a process pool and are written to a local artifact store
+export_service = ExportService(
+    ArtifactStore(default_export_dir(), max_artifacts=int(os.getenv("EXPORT_MAX_ARTIFACTS", "200"))),
+    max_workers=int(os.getenv("EXPORT_WORKERS", "2"))
+)
 
-        except Exception as e:
-            print(f"❌ Background collection error: {e}")
+# Hosts anyone may subscribe webhooks to; other hosts need the admin token and a public address
+webhook_policy = WebhookPolicy(
+    allowed_hosts=os.getenv("ALERT_WEBHOOK_HOSTS", "").split(","),
+    max_per_client=int(os.getenv("ALERT_MAX_SUBSCRIPTIONS_PER_CLIENT", "20"))
+)
 
-        # Wait 15 minutes before next fetch (real-time updates)
-        await asyncio.sleep(900)
+# Webhook deliveries for alert subscriptions of every city
+alert_outbox = WebhookOutbox(max_attempts=int(os.getenv("ALERT_WEBHOOK_MAX_ATTEMPTS", "5")), policy=webhook_policy)
+
+@app.exception_handler(OffloadRejected)
+async def render_pool_busy(request: Request, exc: OffloadRejected):
+    # Shed load instead of queueing renders without bound
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+async def offloaded_json(runtime: CityRuntime, task: str, build: Callable[[], Dict], pretty: bool = False) -> Response:
+    """Build and encode a JSON document on the render pool"""
+    body = await runtime.offload(task, lambda: dumps(build(), pretty))
+    return Response(body, media_type="application/json")
+
+def city_runtime(city: str) -> CityRuntime:
+    """Resolve the {city} path segment to the runtime serving it"""
+    runtime = city_runtimes.get(city.lower())
+    if runtime is None:
+        raise HTTPException(status_code=404, detail=f"City '{city}' is not served by this node")
+    return runtime
+
+@app.get("/healthz")
+async def liveness():
+    """Liveness: the process is up and its event loop is answering"""
+    return FastJSONResponse({"status": "ok"})
+
+@app.get("/readyz")
+async def readiness():
+    """Readiness: 200 once every city served here has published a snapshot, 503 until then"""
+    cities = {
+        slug: {"ready": runtime.ready, "version": runtime.published.version, "last_updated": runtime.published.last_updated}
+        for slug, runtime in city_runtimes.items()
+    }
+    ready = all(city["ready"] for city in cities.values())
+    return json_response({"status": "ready" if ready else "starting", "cities": cities}, status_code=200 if ready else 503)
 
 @app.get("/")
 async def root():
-    return {
+    return FastJSONResponse({
         "status": "🇮🇳 Real Bangalore Civic API",
         "data_authenticity": "100% real APIs - NO hardcoded data",
         "air_quality_source": "WAQI real Bangalore stations",
         "transparency": "Full source attribution for all data"
-    }
-
-@app.get("/api/bangalore/real-data")
-async def get_real_bangalore_data():
-    """Get authentic Bangalore data with full transparency"""
-    global bangalore_cache
-
-    if not bangalore_cache:
-        bangalore_cache = await real_bangalore_apis.fetch_real_bangalore_data()
+    })
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics exposition"""
+    body, content_type = metrics.render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/api/cities")
+async def list_cities():
+    """Cities served by this node"""
+    return FastJSONResponse({
+        "cities": [
+            {
+                "slug": runtime.slug,
+                "name": runtime.display_name,
+                "areas": len(runtime.registry),
+                "last_updated": runtime.published.last_updated
+            }
+            for runtime in city_runtimes.values()
+        ]
+    })
 
+def real_data_document(runtime: CityRuntime, published: PublishedSnapshot) -> Dict:
     return {
-        "city": "Bangalore, India",
-        "data": bangalore_cache,
+        "city": runtime.display_name,
+        "version": published.version,
+        "data": published.snapshot.to_dict(),
         "authenticity_guarantee": {
             "no_hardcoded_values": True,
             "real_api_sources": True,
             "transparency_commitment": "Every data point has source attribution",
-            "air_quality_stations": list(real_bangalore_apis.bangalore_stations.keys()),
-            "last_updated": last_fetch_time.isoformat() if last_fetch_time else None
+            "air_quality_stations": list(published.stations),
+            "last_updated": published.last_updated
         }
     }
 
-@app.get("/api/bangalore/map-data")
-async def get_bangalore_map_data():
-    """Get Bangalore data formatted for map visualization"""
-    global bangalore_cache
-
-    if not bangalore_cache:
-        bangalore_cache = await real_bangalore_apis.fetch_real_bangalore_data()
-
-    # Format for map
+@app.get("/api/{city}/real-data")
+async def get_real_bangalore_data(request: Request, pretty: bool = False, runtime: CityRuntime = Depends(city_runtime)):
+    """Get authentic city data with full transparency"""
+    # One read of the published reference per request: data, version and timestamp always match
+    published = await runtime.ensure_published()
+
+    if pretty:
+        return await offloaded_json(runtime, "real-data", lambda: real_data_document(runtime, published), pretty)
+
+    return precompressed_response(request, await runtime.rendered(published, "real-data"), "application/json")
+
+@app.get("/api/{city}/changes")
+async def get_changes_since(since: Optional[int] = None, pretty: bool = False, runtime: CityRuntime = Depends(city_runtime)):
+    """Changes since a snapshot version; the full snapshot when that version is no longer buffered"""
+    published = await runtime.ensure_published()
+    snapshot, version = published.snapshot, published.version
+
+    changes = runtime.changelog.since(since, version) if since is not None else None
+
+    if changes is None:
+        return await offloaded_json(runtime, "changes", lambda: {
+            "city": runtime.display_name,
+            "version": version,
+            "since": since,
+            "full": True,
+            "data": snapshot.to_dict()
+        }, pretty)
+
+    return await offloaded_json(runtime, "changes", lambda: {
+        "city": runtime.display_name,
+        "version": version,
+        "since": since,
+        "full": False,
+        "last_updated": snapshot.last_updated,
+        "changes": changes
+    }, pretty)
+
+@app.get("/api/{city}/anomalies")
+async def get_anomalies(since: int = 0, station: Optional[str] = None, limit: int = Query(100, ge=1, le=500),
+                        pretty: bool = False, runtime: CityRuntime = Depends(city_runtime)):
+    """AQI anomalies flagged by the streaming detector, after event id `since`"""
+    await runtime.ensure_published()
+    detector = runtime.apis.anomaly_detector
+    events = detector.since(since, station, limit)
+
+    return json_response({
+        "city": runtime.display_name,
+        "since": since,
+        "last_id": events[-1]["id"] if events else since,
+        "events": events,
+        "stations": detector.summary()
+    }, pretty)
+
+@app.get("/api/{city}/heatmap")
+async def get_heatmap(metric: Literal["aqi", "incidents"] = "aqi", area: Optional[str] = None,
+                      pretty: bool = False, runtime: CityRuntime = Depends(city_runtime)):
+    """Weekday x hour-of-day AQI means or incident counts, for one area or the whole city (local time)"""
+    from analytics.heatmap import heatmap_document
+
+    if metric == "aqi":
+        await runtime.ensure_published()
+        heatmap, value = runtime.apis.aqi_heatmap, "mean"
+    else:
+        heatmap, value = await runtime.incidents.incident_heatmap(), "count"
+
+    grid = heatmap.grid(area)
+    if grid is None:
+        raise HTTPException(status_code=404, detail=f"Unknown area '{area}'")
+
+    return json_response({
+        "city": runtime.display_name,
+        "area": area,
+        "metric": metric,
+        **heatmap_document(grid, value)
+    }, pretty)
+
+@traced("geojson.build")
+def build_map_features(snapshot: Snapshot) -> List[Dict]:
+    """Build GeoJSON point features for every area of every map layer"""
     features = []
 
     # Add data for all layers
-    for layer_name, layer_data in bangalore_cache.items():
-        if layer_name in ["air_quality", "crime_stats", "infrastructure", "water_quality", "transport"]:
-            if isinstance(layer_data, dict) and layer_data.get("areas"):
-                for area, data in layer_data["areas"].items():
-                    coords = data.get("coordinates", [12.9716, 77.5946])
-
-                    # Create appropriate properties based on layer type
-                    properties = {
-                        "type": layer_name,
-                        "area": area,
-                        "layer": layer_name,
-                        "real_data": layer_name == "air_quality"
-                    }
-
-                    if layer_name == "air_quality":
-                        properties.update({
-                            "aqi": data.get("aqi", 0),
-                            "status": data.get("status", "Unknown"),
-                            "station": data.get("station_name", ""),
-                            "source": data.get("source", "WAQI")
-                        })
-                    elif layer_name == "crime_stats":
-                        properties.update({
-                            "safety_score": data.get("safety_score", 0),
-                            "crime_rate": data.get("crime_rate", "Unknown"),
-                            "source": "Police Data"
-                        })
-                    elif layer_name == "infrastructure":
-                        properties.update({
-                            "power_status": data.get("power_status", "Unknown"),
-                            "water_status": data.get("water_status", "Unknown"),
-                            "source": "Utility Data"
-                        })
-                    elif layer_name == "water_quality":
-                        properties.update({
-                            "quality_index": data.get("quality_index", 0),
-                            "ph_level": data.get("ph_level", "Unknown"),
-                            "source": "Water Board"
-                        })
-                    elif layer_name == "transport":
-                        properties.update({
-                            "metro_access": data.get("metro_access", False),
-                            "bus_routes": data.get("bus_routes", 0),
-                            "source": "Transport Data"
-                        })
-
-                    features.append({
-                        "type": "Feature",
-                        "geometry": {
-                            "type": "Point",
-                            "coordinates": [coords[1], coords[0]]  # [lng, lat]
-                        },
-                        "properties": properties
-                    })
+    for layer in snapshot.area_layers():
+        layer_name = layer.name
+        coords = layer.coords
+
+        for i, (area, record) in enumerate(zip(layer.area_names, layer.records)):
+            # Create appropriate properties based on layer type
+            properties = {
+                "type": layer_name,
+                "area": area,
+                "layer": layer_name,
+                "real_data": layer_name == "air_quality",
+                **record.map_properties()
+            }
+
+            features.append({
+                "type": "Feature",
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [coords[2 * i + 1], coords[2 * i]]  # [lng, lat]
+                },
+                "properties": properties
+            })
+
+    return features
+
+def map_data_document(snapshot: Snapshot) -> Dict:
+    # Format for map
+    features = build_map_features(snapshot)
 
     return {
         "type": "FeatureCollection",
@@ -157,36 +296,46 @@ async def get_bangalore_map_data():
             "total_features": len(features),
             "real_bangalore_data": True,
             "no_mock_data": True,
-            "air_quality_stations": len(bangalore_cache.get("air_quality", {}).get("areas", {})),
-            "last_updated": bangalore_cache.get("last_updated")
+            "air_quality_stations": len(snapshot.layers.get("air_quality") or ()),
+            "last_updated": snapshot.last_updated
         }
     }
 
-@app.get("/api/bangalore/area/{area_name}")
-async def get_real_area_data(area_name: str):
-    """Get real data for specific Bangalore area"""
-    global bangalore_cache
+@app.get("/api/{city}/map-data")
+async def get_bangalore_map_data(request: Request, pretty: bool = False, runtime: CityRuntime = Depends(city_runtime)):
+    """Get city data formatted for map visualization"""
+    published = await runtime.ensure_published()
+
+    if pretty:
+        return await offloaded_json(runtime, "map-data", lambda: map_data_document(published.snapshot), pretty)
 
-    if not bangalore_cache:
-        bangalore_cache = await real_bangalore_apis.fetch_real_bangalore_data()
+    return precompressed_response(request, await runtime.rendered(published, "map-data"), "application/json")
 
+def area_document(snapshot: Snapshot, area_name: str) -> Dict:
     area_data = {}
 
     # Extract real area data
-    for layer_name, layer_data in bangalore_cache.items():
+    for layer_name, layer in snapshot.layers.items():
+        i = layer.index.get(area_name)
+        if i is not None:
+            area_data[layer_name] = {
+                "data": layer.area_dict(i),
+                "source": layer.source,
+                "real_time": layer_name == "air_quality"
+            }
+        else:
+            # Include disclaimer data for other layers
+            area_data[layer_name] = {
+                "data": snapshot.to_dict()[layer_name],
+                "real_time": False
+            }
+
+    for layer_name, layer_data in snapshot.extras.items():
         if isinstance(layer_data, dict):
-            if "areas" in layer_data and area_name in layer_data["areas"]:
-                area_data[layer_name] = {
-                    "data": layer_data["areas"][area_name],
-                    "source": layer_data.get("source", "Unknown"),
-                    "real_time": layer_name == "air_quality"
-                }
-            elif layer_name != "data_sources" and layer_name != "last_updated":
-                # Include disclaimer data for other layers
-                area_data[layer_name] = {
-                    "data": layer_data,
-                    "real_time": False
-                }
+            area_data[layer_name] = {
+                "data": layer_data,
+                "real_time": False
+            }
 
     return {
         "area": area_name,
@@ -199,20 +348,95 @@ async def get_real_area_data(area_name: str):
         }
     }
 
-@app.get("/api/bangalore/sources")
-async def get_real_sources():
-    """Show all real data sources with complete transparency"""
-    global bangalore_cache
+@app.get("/api/{city}/area/{area_name}")
+async def get_real_area_data(area_name: str, pretty: bool = False, runtime: CityRuntime = Depends(city_runtime)):
+    """Get real data for a specific area of the city"""
+    snapshot = (await runtime.ensure_published()).snapshot
 
-    if not bangalore_cache:
-        bangalore_cache = await real_bangalore_apis.fetch_real_bangalore_data()
+    return await offloaded_json(runtime, "area", lambda: area_document(snapshot, area_name), pretty)
 
-    return {
-        "city": "Bangalore, India",
-        "data_sources": bangalore_cache.get("data_sources", {}),
+MAX_BATCH_AREAS = int(os.getenv("MAX_BATCH_AREAS", "500"))
+
+class AreasRequest(BaseModel):
+    areas: List[str] = Field(..., description="Area names, as in /area/{area_name}")
+    layers: Optional[List[str]] = Field(None, description="Layers to include (default: all)")
+    fields: Optional[List[str]] = Field(
+        None, description="Fields to include, either `aqi` (every layer) or `air_quality.aqi` (one layer); default: all"
+    )
+
+@traced("areas.project")
+def project_areas(snapshot: Snapshot, areas: List[str], layers: Optional[List[str]] = None,
+                  fields: Optional[List[str]] = None) -> Dict:
+    """Selected layers/fields of each requested area, read through the snapshot's per-area index"""
+    index = snapshot.area_index()
+    wanted_layers = set(layers) if layers is not None else None
+
+    # "field" applies to every layer, "layer.field" to one layer
+    shared_fields = set()
+    layer_fields: Dict[str, set] = {}
+    for field in fields or ():
+        layer_name, dot, name = field.partition(".")
+        if dot:
+            layer_fields.setdefault(layer_name, set()).add(name)
+        else:
+            shared_fields.add(field)
+
+    result = {}
+    missing = []
+    for area in areas:
+        entries = index.get(area)
+        if entries is None:
+            missing.append(area)
+            continue
+
+        area_data = {}
+        for layer, i in entries:
+            if wanted_layers is not None and layer.name not in wanted_layers:
+                continue
+
+            record = layer.area_dict(i)
+            if fields is not None:
+                selected = shared_fields | layer_fields.get(layer.name, set())
+                if not selected:
+                    continue
+                record = {key: value for key, value in record.items() if key in selected}
+                # A layer with none of the requested fields is left out, not sent as {}
+                if not record:
+                    continue
+            area_data[layer.name] = record
+
+        result[area] = area_data
+
+    return {"areas": result, "missing": missing}
+
+@app.post("/api/{city}/areas")
+async def get_real_areas_batch(query: AreasRequest, pretty: bool = False, runtime: CityRuntime = Depends(city_runtime)):
+    """Get selected layers and fields for several areas in one request"""
+    areas = list(dict.fromkeys(query.areas))
+    if len(areas) > MAX_BATCH_AREAS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_AREAS} areas per request")
+
+    published = await runtime.ensure_published()
+    snapshot = published.snapshot
+
+    return await offloaded_json(runtime, "areas", lambda: {
+        "city": runtime.display_name,
+        "version": published.version,
+        "last_updated": snapshot.last_updated,
+        **project_areas(snapshot, areas, query.layers, query.fields)
+    }, pretty)
+
+@app.get("/api/{city}/sources")
+async def get_real_sources(pretty: bool = False, runtime: CityRuntime = Depends(city_runtime)):
+    """Show all real data sources with complete transparency"""
+    published = await runtime.ensure_published()
+
+    return json_response({
+        "city": runtime.display_name,
+        "data_sources": published.snapshot.data_sources,
         "air_quality_stations": {
-            "real_waqi_stations": real_bangalore_apis.bangalore_stations,
-            "station_mapping": real_bangalore_apis.area_to_station
+            "real_waqi_stations": runtime.apis.bangalore_stations,
+            "station_mapping": runtime.apis.area_to_station
         },
         "government_api_status": {
             "crime_data": "Requires police API access",
@@ -221,95 +445,120 @@ async def get_real_sources():
             "transport": "No public APIs available"
         },
         "transparency_note": "Only air quality has real-time public APIs in India",
-        "last_updated": last_fetch_time.isoformat() if last_fetch_time else None
-    }
-
-@app.get("/api/bangalore/refresh")
-async def force_refresh_bangalore():
-    """Manually refresh real Bangalore data"""
-    global bangalore_cache, last_fetch_time
-
-    try:
-        print("🔄 Manual refresh of REAL Bangalore data...")
-        bangalore_cache = await real_bangalore_apis.fetch_real_bangalore_data()
-        last_fetch_time = datetime.now()
+        "last_updated": published.last_updated
+    }, pretty)
+
+@app.get("/api/{city}/refresh")
+async def force_refresh_bangalore(request: Request, runtime: CityRuntime = Depends(city_runtime)):
+    """Request a refresh of real city data; returns a job handle to poll"""
+    client = request.client.host if request.client else "unknown"
+    allowed, retry_after = refresh_rate_limiter.allow(f"{runtime.slug}:{client}")
+
+    if not allowed:
+        return JSONResponse(
+            status_code=429,
+            content={"status": "rate_limited", "retry_after_seconds": round(retry_after, 1)},
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
 
-        active_stations = bangalore_cache.get("air_quality", {}).get("total_stations_active", 0)
+    job = runtime.refresh_service.request()
 
-        return {
-            "status": "refreshed_real_bangalore_data",
-            "timestamp": last_fetch_time.isoformat(),
-            "active_air_quality_stations": active_stations,
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": "accepted" if job.requests_merged == 1 else "merged_with_existing_refresh",
+            "job": job.to_dict(),
+            "poll_url": f"/api/{runtime.slug}/refresh/{job.job_id}",
             "data_authenticity": "100% real APIs"
-        }
-    except Exception as e:
-        return {"status": "error", "message": str(e)}
-
-@app.get("/api/bangalore/city-bounds")
-async def get_bangalore_bounds():
-    """Get Bangalore city bounds for map"""
-    return {
-        "city": "Bangalore, Karnataka, India",
-        "bounds": {
-            "southwest": {"lat": 12.7342, "lng": 77.4601},
-            "northeast": {"lat": 13.1636, "lng": 77.8479}
-        },
-        "center": {"lat": 12.9716, "lng": 77.5946},
-        "zoom_levels": {
-            "city": 11,
-            "area": 13,
-            "street": 15
         },
-        "real_stations": real_bangalore_apis.bangalore_stations
-    }
-
-@app.get("/api/bangalore/incidents/csv")
-async def download_incidents_csv(area: Optional[str] = None, incident_type: Optional[str] = None):
-    """Download incidents data as CSV with optional filtering"""
-    global bangalore_cache
-
-    if not bangalore_cache:
-        bangalore_cache = await real_bangalore_apis.fetch_real_bangalore_data()
+        headers={"Location": f"/api/{runtime.slug}/refresh/{job.job_id}"}
+    )
 
+@app.get("/api/{city}/refresh/{job_id}")
+async def get_refresh_job(job_id: str, runtime: CityRuntime = Depends(city_runtime)):
+    """Poll the status of a refresh job"""
+    job = runtime.refresh_service.get(job_id)
+
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired refresh job")
+
+    return FastJSONResponse(job.to_dict())
+
+@app.get("/api/{city}/city-bounds")
+async def get_bangalore_bounds(runtime: CityRuntime = Depends(city_runtime)):
+    """Get city bounds for map"""
+    map_view = runtime.registry.map_view
+    return FastJSONResponse({
+        "city": map_view.get("name", runtime.display_name),
+        "bounds": map_view.get("bounds"),
+        "center": map_view.get("center"),
+        "zoom_levels": map_view.get("zoom_levels"),
+        "real_stations": runtime.apis.bangalore_stations
+    })
+
+INCIDENT_CSV_FIELDS = [
+    "fir_number", "type", "area", "what", "when", "who",
+    "officer", "status", "source", "last_updated"
+]
+
+@traced("export.incidents_csv")
+def render_incidents_csv(snapshot: Snapshot, area: Optional[str] = None, incident_type: Optional[str] = None) -> str:
+    """Render the (optionally filtered) FIR incidents of a snapshot as CSV"""
     # Collect all incidents from the actual source data
     all_incidents = []
+    crime_stats = snapshot.layer("crime_stats")
+    last_updated = snapshot.last_updated or ""
 
-    if bangalore_cache.get("crime_stats", {}).get("areas"):
-        for area_name, area_data in bangalore_cache["crime_stats"]["areas"].items():
+    if crime_stats is not None:
+        for area_name, record in zip(crime_stats.area_names, crime_stats.records):
             if area and area.lower() != area_name.lower():
                 continue
 
-            if area_data.get("recent_incidents"):
-                for incident in area_data["recent_incidents"]:
-                    if incident_type and incident_type.lower() != incident.get("type", "").lower():
-                        continue
-
-                    all_incidents.append({
-                        "fir_number": incident.get("fir_number", ""),
-                        "type": incident.get("type", ""),
-                        "area": area_name,
-                        "what": incident.get("what", ""),
-                        "when": incident.get("when", ""),
-                        "who": incident.get("who", ""),
-                        "officer": incident.get("officer", ""),
-                        "status": incident.get("status", ""),
-                        "source": "Karnataka Police FIR Database",
-                        "last_updated": bangalore_cache.get("last_updated", "")
-                    })
+            for incident in record.recent_incidents:
+                if incident_type and incident_type.lower() != incident.type.lower():
+                    continue
+
+                all_incidents.append({
+                    "fir_number": incident.fir_number,
+                    "type": incident.type,
+                    "area": area_name,
+                    "what": incident.what,
+                    "when": incident.when,
+                    "who": incident.who,
+                    "officer": incident.officer,
+                    "status": incident.status,
+                    "source": "Karnataka Police FIR Database",
+                    "last_updated": last_updated
+                })
 
     # Create CSV content
     output = io.StringIO()
-    writer = csv.DictWriter(output, fieldnames=[
-        "fir_number", "type", "area", "what", "when", "who",
-        "officer", "status", "source", "last_updated"
-    ])
+    writer = csv.DictWriter(output, fieldnames=INCIDENT_CSV_FIELDS)
 
     writer.writeheader()
     writer.writerows(all_incidents)
 
+    csv_content = output.getvalue()
+    output.close()
+    return csv_content
+
+@app.get("/api/{city}/incidents/csv")
+async def download_incidents_csv(area: Optional[str] = None, incident_type: Optional[str] = None,
+                                 runtime: CityRuntime = Depends(city_runtime)):
+    """Download incidents data as CSV with optional filtering"""
+    published = await runtime.ensure_published()
+    snapshot = published.snapshot
+
+    # Filters are case-insensitive, so normalize before keying the cache
+    csv_body = await runtime.export_cache.get_or_render(
+        published.version, "incidents_csv",
+        {"area": area.lower() if area else None, "incident_type": incident_type.lower() if incident_type else None},
+        lambda: runtime.offload("incidents_csv", lambda: render_incidents_csv(snapshot, area, incident_type).encode())
+    )
+
     # Generate filename
     timestamp = datetime.now().strftime("%Y-%m-%d")
-    filename_parts = ["bangalore-incidents-source"]
+    filename_parts = [f"{runtime.slug}-incidents-source"]
     if area:
         filename_parts.append(area.replace(" ", "-").lower())
     if incident_type:
@@ -317,103 +566,243 @@ async def download_incidents_csv(area: Optional[str] = None, incident_type: Opti
     filename_parts.append(timestamp)
     filename = "_".join(filename_parts) + ".csv"
 
-    # Create streaming response
-    csv_content = output.getvalue()
-    output.close()
-
-    return StreamingResponse(
-        io.StringIO(csv_content),
+    return Response(
+        csv_body,
         media_type="text/csv",
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
-@app.get("/api/bangalore/all-data/csv")
-async def download_all_bangalore_data_csv():
-    """Download comprehensive Bangalore civic data as CSV"""
-    global bangalore_cache
-
-    if not bangalore_cache:
-        bangalore_cache = await real_bangalore_apis.fetch_real_bangalore_data()
-
+@traced("export.all_data_csv")
+def render_all_data_csv(snapshot: Snapshot) -> Optional[str]:
+    """Render every area of every layer as one CSV; None when there is no data"""
     # Collect all data types into a comprehensive CSV
     all_data = []
 
     # Process each data layer
-    for layer_name, layer_data in bangalore_cache.items():
-        if layer_name in ["air_quality", "crime_stats", "infrastructure", "water_quality", "transport"]:
-            if isinstance(layer_data, dict) and layer_data.get("areas"):
-                for area, data in layer_data["areas"].items():
-                    row = {
-                        "data_type": layer_name,
-                        "area": area,
-                        "source": layer_data.get("source", "Unknown"),
-                        "methodology": layer_data.get("methodology", ""),
-                        "last_updated": data.get("last_updated", bangalore_cache.get("last_updated", "")),
-                        "coordinates": str(data.get("coordinates", [])),
-                    }
-
-                    # Add layer-specific fields
-                    if layer_name == "air_quality":
-                        row.update({
-                            "aqi": data.get("aqi", ""),
-                            "status": data.get("status", ""),
-                            "station_name": data.get("station_name", "")
-                        })
-                    elif layer_name == "crime_stats":
-                        row.update({
-                            "safety_score": data.get("safety_score", ""),
-                            "crime_rate": data.get("crime_rate", ""),
-                            "patrol_frequency": data.get("patrol_frequency", ""),
-                            "police_station": data.get("police_station", "")
-                        })
-                    elif layer_name == "water_quality":
-                        row.update({
-                            "quality_index": data.get("quality_index", ""),
-                            "ph_level": data.get("ph_level", ""),
-                            "turbidity": data.get("turbidity", ""),
-                            "monitoring_station": data.get("monitoring_station", "")
-                        })
-                    elif layer_name == "transport":
-                        row.update({
-                            "metro_access": data.get("metro_access", ""),
-                            "bus_routes": data.get("bus_routes", ""),
-                            "connectivity_score": data.get("connectivity_score", "")
-                        })
-                    elif layer_name == "infrastructure":
-                        row.update({
-                            "power_status": data.get("power_status", ""),
-                            "water_status": data.get("water_status", "")
-                        })
-
-                    all_data.append(row)
+    for layer in snapshot.area_layers():
+        source = layer.source
+        methodology = layer.meta.get("methodology", "")
+
+        for i, (area, record) in enumerate(zip(layer.area_names, layer.records)):
+            row = {
+                "data_type": layer.name,
+                "area": area,
+                "source": source,
+                "methodology": methodology,
+                "last_updated": getattr(record, "last_updated", None) or snapshot.last_updated or "",
+                "coordinates": str(layer.coordinates(i)),
+            }
+
+            # Add layer-specific fields
+            row.update(record.csv_fields())
+
+            all_data.append(row)
 
     # Create CSV
-    if all_data:
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=all_data[0].keys())
-        writer.writeheader()
-        writer.writerows(all_data)
-
-        filename = f"bangalore-civic-data-complete_{datetime.now().strftime('%Y-%m-%d')}.csv"
-        csv_content = output.getvalue()
-        output.close()
-
-        return StreamingResponse(
-            io.StringIO(csv_content),
-            media_type="text/csv",
+    if not all_data:
+        return None
+
+    # Layers have different columns, so the header is the union in first-seen order
+    fieldnames = list(dict.fromkeys(key for row in all_data for key in row))
+
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=fieldnames)
+    writer.writeheader()
+    writer.writerows(all_data)
+
+    csv_content = output.getvalue()
+    output.close()
+    return csv_content
+
+@app.post("/api/{city}/incidents/ingest", dependencies=[Depends(require_admin)])
+async def ingest_incidents(request: Request, runtime: CityRuntime = Depends(city_runtime)):
+    """Ingest NDJSON incident records (one FIR per line), deduplicated on fir_number
+
+    Records are queued and written in batches; they show up in the crime
+    layer from the next refresh.
+    """
+    result = await ingest_ndjson(runtime.incidents, ndjson_lines(request.stream()))
+    return JSONResponse(status_code=202, content={**result, "queue": runtime.incidents.stats()})
+
+@app.get("/api/{city}/all-data/csv")
+async def download_all_bangalore_data_csv(request: Request, runtime: CityRuntime = Depends(city_runtime)):
+    """Download comprehensive civic data for the city as CSV"""
+    published = await runtime.ensure_published()
+
+    csv_body = await runtime.rendered(published, "all-data-csv")
+
+    if csv_body is not None:
+        filename = f"{runtime.slug}-civic-data-complete_{datetime.now().strftime('%Y-%m-%d')}.csv"
+
+        return precompressed_response(
+            request, csv_body, "text/csv",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
 
-    return {"error": "No data available"}
+    return FastJSONResponse({"error": "No data available"})
+
+class ExportRequest(BaseModel):
+    layer: str = Field(..., description="One of the snapshot's area layers, e.g. crime_stats")
+    start: Optional[date] = Field(None, description="First day to include (inclusive), within the current snapshot")
+    end: Optional[date] = Field(None, description="Last day to include (inclusive), within the current snapshot")
+    format: Literal["csv", "json"] = "csv"
+
+@app.post("/api/{city}/exports")
+async def create_export(export: ExportRequest, runtime: CityRuntime = Depends(city_runtime)):
+    """Start an export job (or join an identical one); returns a job handle to poll"""
+    if export.layer not in AREA_LAYERS:
+        raise HTTPException(status_code=400, detail=f"layer must be one of: {', '.join(AREA_LAYERS)}")
+    if export.start and export.end and export.start > export.end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+
+    published = await runtime.ensure_published()
+    snapshot = published.snapshot
+    layer = snapshot.layer(export.layer)
+    if layer is None:
+        raise HTTPException(status_code=404, detail=f"No {export.layer} data in the current snapshot")
+
+    # The layer is rendered (on the render pool) only when this request starts a new job
+    job = export_service.submit(
+        runtime.slug, published.version, export.layer, lambda: runtime.offload("export.layer", layer.to_dict),
+        snapshot.last_updated or "", export.start, export.end, export.format
+    )
 
-@app.get("/api/bangalore/raw-sources/json")
-async def download_raw_api_sources():
-    """Download the actual raw JSON responses from all accessible government APIs"""
-    global real_bangalore_apis
+    return JSONResponse(
+        status_code=202,
+        content={
+            "status": "accepted" if job.requests_merged == 1 else "merged_with_existing_export",
+            "job": job.to_dict(),
+            "note": "start/end select rows of the current snapshot only (no history); "
+                    "the finished job's result.coverage_start/coverage_end give the days it spans",
+            "poll_url": f"/api/{runtime.slug}/exports/{job.job_id}",
+            "download_url": f"/api/{runtime.slug}/exports/{job.job_id}/download"
+        },
+        headers={"Location": f"/api/{runtime.slug}/exports/{job.job_id}"}
+    )
+
+def get_export_job(job_id: str, runtime: CityRuntime):
+    job = export_service.get(job_id)
+    if job is None or job.city != runtime.slug:
+        raise HTTPException(status_code=404, detail="Unknown or expired export job")
+    return job
+
+@app.get("/api/{city}/exports/{job_id}")
+async def get_export_status(job_id: str, runtime: CityRuntime = Depends(city_runtime)):
+    """Poll the status of an export job"""
+    return FastJSONResponse(get_export_job(job_id, runtime).to_dict())
+
+@app.get("/api/{city}/exports/{job_id}/download")
+async def download_export(job_id: str, runtime: CityRuntime = Depends(city_runtime)):
+    """Download a finished export; supports Range requests for resuming large files"""
+    job = get_export_job(job_id, runtime)
+
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Export is {job.status}")
+    if not os.path.exists(job.path):
+        raise HTTPException(status_code=410, detail="Export artifact expired; request the export again")
+
+    range_part = f"{job.start or 'all'}_{job.end or 'all'}"
+    filename = f"{runtime.slug}-{job.layer}-export_{range_part}.{job.format}"
+
+    return FileResponse(
+        job.path,
+        media_type="text/csv" if job.format == "csv" else "application/json",
+        filename=filename
+    )
 
+class AlertRequest(BaseModel):
+    webhook_url: str = Field(..., description="URL that receives a JSON POST per alert")
+    threshold: float
+    direction: Literal["above", "below"] = "above"
+    layer: str = "air_quality"
+    field: str = Field("aqi", description="Numeric field of the layer, e.g. aqi, naqi, safety_score")
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    radius_km: Optional[float] = Field(None, gt=0, le=50)
+    polygon: Optional[List[List[float]]] = Field(None, description="[[lat, lng], ...] with at least 3 vertices")
+
+@app.post("/api/{city}/alerts")
+async def create_alert(alert: AlertRequest, request: Request, runtime: CityRuntime = Depends(city_runtime),
+                       x_admin_token: Optional[str] = Header(default=None)):
+    """Subscribe a webhook to threshold crossings inside a radius or polygon
+
+    Webhooks to hosts in ALERT_WEBHOOK_HOSTS are open to anyone; any other
+    (public) host needs the admin token. The response's `secret` is shown once;
+    reading or deleting the subscription needs it in X-Subscription-Secret.
+    """
+    if alert.layer not in AREA_LAYERS:
+        raise HTTPException(status_code=400, detail=f"layer must be one of: {', '.join(AREA_LAYERS)}")
+    try:
+        webhook_url = parse_webhook_url(alert.webhook_url)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    admin = is_admin(x_admin_token)
+    if not admin and not webhook_policy.allowed(webhook_url):
+        raise HTTPException(status_code=403, detail="Admin token required for webhook hosts outside ALERT_WEBHOOK_HOSTS")
+    try:
+        await webhook_policy.check(alert.webhook_url)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if alert.polygon is not None:
+        if len(alert.polygon) < 3 or any(len(point) != 2 for point in alert.polygon):
+            raise HTTPException(status_code=400, detail="polygon needs at least 3 [lat, lng] vertices")
+    elif alert.lat is None or alert.lng is None or alert.radius_km is None:
+        raise HTTPException(status_code=400, detail="Give either lat, lng and radius_km or a polygon")
+
+    subscription = Subscription(
+        runtime.slug, alert.layer, alert.field, alert.direction, alert.threshold, alert.webhook_url,
+        center=[alert.lat, alert.lng] if alert.polygon is None else None, radius_km=alert.radius_km,
+        polygon=alert.polygon, client=request.client.host if request.client else "unknown"
+    )
+    secret = subscription.issue_secret()
+
+    published = await runtime.ensure_published()
+    if not admin and runtime.alerts.count_for(subscription.client) >= webhook_policy.max_per_client:
+        raise HTTPException(status_code=429, detail=f"At most {webhook_policy.max_per_client} subscriptions per client")
+    try:
+        alerts = runtime.alerts.add(subscription, published.snapshot)
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    # Areas already past the threshold are reported right away
+    runtime.deliver_alerts(alerts)
+
+    return JSONResponse(
+        status_code=201,
+        content={"subscription": subscription.to_dict(), "secret": secret, "matching_now": alerts},
+        headers={"Location": f"/api/{runtime.slug}/alerts/{subscription.subscription_id}"}
+    )
+
+def get_subscription(subscription_id: str, runtime: CityRuntime, secret: Optional[str], x_admin_token: Optional[str]):
+    subscription = runtime.alerts.subscriptions.get(subscription_id)
+    if subscription is None:
+        raise HTTPException(status_code=404, detail="Unknown alert subscription")
+    if not subscription.verify_secret(secret) and not is_admin(x_admin_token):
+        raise HTTPException(status_code=403, detail="X-Subscription-Secret from the subscription's creation required")
+    return subscription
+
+@app.get("/api/{city}/alerts/{subscription_id}")
+async def get_alert(subscription_id: str, runtime: CityRuntime = Depends(city_runtime),
+                    x_subscription_secret: Optional[str] = Header(default=None),
+                    x_admin_token: Optional[str] = Header(default=None)):
+    return FastJSONResponse(get_subscription(subscription_id, runtime, x_subscription_secret, x_admin_token).to_dict())
+
+@app.delete("/api/{city}/alerts/{subscription_id}")
+async def delete_alert(subscription_id: str, runtime: CityRuntime = Depends(city_runtime),
+                       x_subscription_secret: Optional[str] = Header(default=None),
+                       x_admin_token: Optional[str] = Header(default=None)):
+    get_subscription(subscription_id, runtime, x_subscription_secret, x_admin_token)
+    runtime.alerts.remove(subscription_id)
+    return FastJSONResponse({"deleted": subscription_id})
+
+@app.get("/api/{city}/raw-sources/json")
+async def download_raw_api_sources(runtime: CityRuntime = Depends(city_runtime)):
+    """Download the actual raw JSON responses from all accessible government APIs"""
     try:
         print("🔄 Fetching RAW data from actual government APIs...")
 
+        import httpx
         async with httpx.AsyncClient(timeout=30) as client:
             raw_sources = {}
 
@@ -422,11 +811,9 @@ async def download_raw_api_sources():
 
             # Check actual Bangalore stations without relying on API keys
             bangalore_stations_info = [
-                {"name": "Silk Board", "uid": 11293, "coords": [12.917348, 77.622813], "url": "india/bengaluru/silk-board"},
-                {"name": "Bapuji Nagar", "uid": 11312, "coords": [12.951913, 77.539784], "url": "india/bengaluru/bapuji-nagar"},
-                {"name": "BTM", "uid": 8190, "coords": [12.9135218, 77.5950804], "url": "india/bangalore/btm"},
-                {"name": "Jayanagar", "uid": 11276, "coords": [12.920984, 77.584908], "url": "india/bengaluru/jayanagar-5th-block"},
-                {"name": "City Railway", "uid": 8686, "coords": [12.9756843, 77.5660749], "url": "india/bangalore/city-railway-station"},
+                {"name": station.name, "uid": station.uid, "coords": station.coordinates, "url": station.waqi_path}
+                for station in runtime.registry.stations
+                if station.waqi_path
             ]
 
             for station in bangalore_stations_info:
@@ -446,7 +833,8 @@ async def download_raw_api_sources():
 
             # Test Karnataka Police website
             try:
-                response = await client.get("https://ksp.karnataka.gov.in/", timeout=10)
+                with metrics.track_upstream("ksp"):
+                    response = await client.get(portal_url("https://ksp.karnataka.gov.in/"), timeout=10)
                 raw_sources["crime_data_reality"]["karnataka_police"] = {
                     "website": "https://ksp.karnataka.gov.in/",
                     "accessible": response.status_code == 200,
@@ -462,7 +850,8 @@ async def download_raw_api_sources():
 
             # Test FIR search portal
             try:
-                response = await client.get("https://ksp.karnataka.gov.in/firsearch", timeout=10)
+                with metrics.track_upstream("ksp_firsearch"):
+                    response = await client.get(portal_url("https://ksp.karnataka.gov.in/firsearch"), timeout=10)
                 raw_sources["crime_data_reality"]["fir_search"] = {
                     "portal": "https://ksp.karnataka.gov.in/firsearch",
                     "accessible": response.status_code == 200,
@@ -478,7 +867,8 @@ async def download_raw_api_sources():
 
             # Test data.gov.in (honest attempt)
             try:
-                response = await client.get("https://data.gov.in/", timeout=10)
+                with metrics.track_upstream("data_gov_in"):
+                    response = await client.get(portal_url("https://data.gov.in/"), timeout=10)
                 raw_sources["crime_data_reality"]["data_gov_in"] = {
                     "website": "https://data.gov.in/",
                     "accessible": response.status_code == 200,
@@ -512,7 +902,8 @@ async def download_raw_api_sources():
 
             # BESCOM (Power)
             try:
-                response = await client.get("https://bescom.karnataka.gov.in/", timeout=10)
+                with metrics.track_upstream("bescom"):
+                    response = await client.get(portal_url("https://bescom.karnataka.gov.in/"), timeout=10)
                 raw_sources["infrastructure_real_access"]["bescom"] = {
                     "website": "https://bescom.karnataka.gov.in/",
                     "accessible": response.status_code == 200,
@@ -530,7 +921,8 @@ async def download_raw_api_sources():
 
             # BWSSB (Water)
             try:
-                response = await client.get("https://bwssb.karnataka.gov.in/", timeout=10)
+                with metrics.track_upstream("bwssb"):
+                    response = await client.get(portal_url("https://bwssb.karnataka.gov.in/"), timeout=10)
                 raw_sources["infrastructure_real_access"]["bwssb"] = {
                     "website": "https://bwssb.karnataka.gov.in/",
                     "accessible": response.status_code == 200,
@@ -548,7 +940,8 @@ async def download_raw_api_sources():
 
             # 4. Water Quality from CPCB
             try:
-                response = await client.get("https://cpcb.nic.in/", timeout=10)
+                with metrics.track_upstream("cpcb"):
+                    response = await client.get(portal_url("https://cpcb.nic.in/"), timeout=10)
                 raw_sources["water_quality_cpcb"] = {
                     "website": "https://cpcb.nic.in/",
                     "accessible": response.status_code == 200,
@@ -589,11 +982,11 @@ async def download_raw_api_sources():
             }
 
         # Return as downloadable JSON
-        filename = f"bangalore-real-api-access-report_{datetime.now().strftime('%Y-%m-%d_%H-%M')}.json"
-        json_content = json.dumps(raw_sources, indent=2, ensure_ascii=False)
+        filename = f"{runtime.slug}-real-api-access-report_{datetime.now().strftime('%Y-%m-%d_%H-%M')}.json"
+        json_content = await runtime.offload("raw-sources", dumps, raw_sources, True)
 
-        return StreamingResponse(
-            io.StringIO(json_content),
+        return Response(
+            content=json_content,
             media_type="application/json",
             headers={
                 "Content-Disposition": f"attachment; filename={filename}",
@@ -602,17 +995,17 @@ async def download_raw_api_sources():
         )
 
     except Exception as e:
-        return {"error": f"Failed to fetch raw sources: {str(e)}"}
+        return FastJSONResponse({"error": f"Failed to fetch raw sources: {str(e)}"})
 
-@app.get("/api/bangalore/sources/details")
-async def get_api_source_details():
+@app.get("/api/{city}/sources/details")
+async def get_api_source_details(runtime: CityRuntime = Depends(city_runtime)):
     """Get detailed information about all data sources and APIs being used"""
-    return {
+    return FastJSONResponse({
         "real_apis_used": {
             "air_quality": {
                 "primary_source": "World Air Quality Index (WAQI)",
                 "api_endpoint": "https://api.waqi.info/",
-                "stations": real_bangalore_apis.bangalore_stations,
+                "stations": runtime.apis.bangalore_stations,
                 "data_type": "Real-time AQI measurements",
                 "update_frequency": "Hourly",
                 "api_key_required": True
@@ -656,9 +1049,89 @@ async def get_api_source_details():
             "website_based": ["infrastructure", "transport"]
         },
         "download_options": {
-            "raw_json": "/api/bangalore/raw-sources/json",
-            "processed_csv": "/api/bangalore/all-data/csv",
-            "filtered_incidents": "/api/bangalore/incidents/csv"
+            "raw_json": f"/api/{runtime.slug}/raw-sources/json",
+            "processed_csv": f"/api/{runtime.slug}/all-data/csv",
+            "filtered_incidents": f"/api/{runtime.slug}/incidents/csv"
         },
         "transparency_note": "All data comes from official government sources and public APIs. No hardcoded or generated data is used except where government APIs are not available."
-    }
\ No newline at end of file
+    })
+
+debug_router = APIRouter(prefix="/debug", dependencies=[Depends(require_admin)])
+
+@debug_router.get("/traces")
+async def get_recent_traces(limit: int = 200, name: Optional[str] = None):
+    """Recent spans from the in-memory trace exporter"""
+    if not isinstance(tracer.exporter, InMemoryExporter):
+        return {"sample_rate": tracer.sample_rate, "spans": [], "note": "In-memory exporter not enabled (TRACE_EXPORTER)"}
+
+    return {"sample_rate": tracer.sample_rate, "spans": tracer.exporter.recent(limit, name)}
+
+@debug_router.post("/traces/sampling")
+async def set_trace_sampling(rate: float):
+    """Change the trace sample rate at runtime (0 disables, 1 traces everything)"""
+    tracer.sample_rate = min(max(rate, 0.0), 1.0)
+    return {"sample_rate": tracer.sample_rate}
+
+@debug_router.get("/profile")
+async def profile_running_process(seconds: float = 5, interval_ms: float = 5,
+                                  fmt: str = Query("json", alias="format")):
+    """Sample all thread stacks for N seconds; format=collapsed returns flamegraph input"""
+    if not 0 < seconds <= 60:
+        raise HTTPException(status_code=400, detail="seconds must be between 0 and 60")
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    async with profile_lock:
+        # The sampler runs in a worker thread so the event loop keeps serving (and gets sampled)
+        result = await asyncio.to_thread(sample_stacks, seconds, max(interval_ms, 1) / 1000)
+
+    if fmt == "collapsed":
+        return PlainTextResponse(result["collapsed"])
+
+    return {
+        "seconds": seconds,
+        **result,
+        "tasks": dump_tasks(),
+        "loop_lag": loop_lag_monitor.summary()
+    }
+
+@debug_router.get("/tasks")
+async def get_asyncio_tasks():
+    """Dump all asyncio tasks with their current stacks"""
+    return {"tasks": dump_tasks()}
+
+@debug_router.get("/caches")
+async def get_cache_stats():
+    """Size and hit/miss counts of the shared cache and each city's export cache"""
+    return {
+        "shared": shared_cache.stats(),
+        "cities": {slug: {"exports": runtime.export_cache.stats()} for slug, runtime in city_runtimes.items()}
+    }
+
+@debug_router.get("/outbox")
+async def get_outbox():
+    """Alert webhook deliveries: counts by status and the most recent ones"""
+    return {"stats": alert_outbox.stats(), "recent": alert_outbox.recent()}
+
+@debug_router.get("/loop-lag")
+async def get_loop_lag():
+    """Event-loop lag percentiles and the stacks seen while the loop was blocked"""
+    return {**loop_lag_monitor.summary(), "render_pool": render_pool.stats()}
+
+app.include_router(debug_router)
+
+def render_all_data_csv_body(runtime: CityRuntime, published: PublishedSnapshot) -> Optional[bytes]:
+    csv_content = render_all_data_csv(published.snapshot)
+    return csv_content.encode() if csv_content is not None else None
+
+# Snapshot-backed bodies rendered (and gzip/brotli compressed) once per refresh
+SNAPSHOT_RENDERERS = {
+    "real-data": lambda runtime, published: dumps(real_data_document(runtime, published)),
+    "map-data": lambda runtime, published: dumps(map_data_document(published.snapshot)),
+    "all-data-csv": render_all_data_csv_body
+}
+
+for runtime in city_runtimes.values():
+    runtime.renderers.update(SNAPSHOT_RENDERERS)
+    runtime.outbox = alert_outbox
+    runtime.render_pool = render_pool
@@ -0,0 +1,408 @@
+import sys
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Layers that carry per-area records, in the order the collector returns them
+AREA_LAYERS = ("air_quality", "crime_stats", "infrastructure", "water_quality", "transport")
+
+DEFAULT_COORDINATES = (12.9716, 77.5946)
+
+
+def _intern(value):
+    # Categorical strings repeat across areas and refreshes; share one copy
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@dataclass(frozen=True, slots=True)
+class Incident:
+    fir_number: str
+    type: str
+    what: str
+    when: str
+    who: str
+    officer: str
+    status: str
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Incident":
+        return cls(
+            fir_number=data.get("fir_number", ""),
+            type=_intern(data.get("type", "")),
+            what=data.get("what", ""),
+            when=data.get("when", ""),
+            who=data.get("who", ""),
+            officer=data.get("officer", ""),
+            status=_intern(data.get("status", ""))
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "fir_number": self.fir_number,
+            "type": self.type,
+            "what": self.what,
+            "when": self.when,
+            "who": self.who,
+            "officer": self.officer,
+            "status": self.status
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class AirQualityReading:
+    aqi: int
+    status: str
+    station_name: str
+    pollutants: Dict
+    last_update: str
+    source: str
+    naqi: Optional[int]
+    naqi_category: str
+    dominant_pollutant: str
+    anomalies: Tuple[str, ...]
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "AirQualityReading":
+        return cls(
+            aqi=data.get("aqi", 0),
+            status=_intern(data.get("status", "Unknown")),
+            station_name=_intern(data.get("station_name", "")),
+            pollutants=data.get("pollutants", {}),
+            last_update=data.get("last_update", ""),
+            source=_intern(data.get("source", "WAQI")),
+            naqi=data.get("naqi"),
+            naqi_category=_intern(data.get("naqi_category", "")),
+            dominant_pollutant=_intern(data.get("dominant_pollutant", "")),
+            anomalies=tuple(_intern(kind) for kind in data.get("anomalies", ()))
+        )
+
+    def to_dict(self, coordinates: List[float]) -> Dict:
+        return {
+            "aqi": self.aqi,
+            "status": self.status,
+            "station_name": self.station_name,
+            "coordinates": coordinates,
+            "pollutants": self.pollutants,
+            "last_update": self.last_update,
+            "source": self.source,
+            "naqi": self.naqi,
+            "naqi_category": self.naqi_category,
+            "dominant_pollutant": self.dominant_pollutant,
+            "anomalies": list(self.anomalies)
+        }
+
+    def map_properties(self) -> Dict:
+        return {
+            "aqi": self.aqi, "status": self.status, "naqi": self.naqi, "naqi_category": self.naqi_category,
+            "station": self.station_name, "source": self.source
+        }
+
+    def csv_fields(self) -> Dict:
+        return {
+            "aqi": self.aqi, "status": self.status, "naqi": self.naqi, "naqi_category": self.naqi_category,
+            "dominant_pollutant": self.dominant_pollutant, "station_name": self.station_name,
+            "anomalies": ";".join(self.anomalies)
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class SafetyRecord:
+    safety_score: int
+    crime_rate: str
+    recent_incidents: Tuple[Incident, ...]
+    police_station: str
+    patrol_frequency: str
+    last_incident_date: str
+    source_detail: str
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SafetyRecord":
+        return cls(
+            safety_score=data.get("safety_score", 0),
+            crime_rate=_intern(data.get("crime_rate", "Unknown")),
+            recent_incidents=tuple(Incident.from_dict(i) for i in data.get("recent_incidents", [])),
+            police_station=data.get("police_station", ""),
+            patrol_frequency=_intern(data.get("patrol_frequency", "")),
+            last_incident_date=data.get("last_incident_date", ""),
+            source_detail=_intern(data.get("source_detail", ""))
+        )
+
+    def to_dict(self, coordinates: List[float]) -> Dict:
+        return {
+            "safety_score": self.safety_score,
+            "crime_rate": self.crime_rate,
+            "recent_incidents": [incident.to_dict() for incident in self.recent_incidents],
+            "police_station": self.police_station,
+            "patrol_frequency": self.patrol_frequency,
+            "last_incident_date": self.last_incident_date,
+            "source_detail": self.source_detail,
+            "coordinates": coordinates
+        }
+
+    def map_properties(self) -> Dict:
+        return {"safety_score": self.safety_score, "crime_rate": self.crime_rate, "source": "Police Data"}
+
+    def csv_fields(self) -> Dict:
+        return {
+            "safety_score": self.safety_score,
+            "crime_rate": self.crime_rate,
+            "patrol_frequency": self.patrol_frequency,
+            "police_station": self.police_station
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class InfrastructureStatus:
+    power_status: str
+    water_status: str
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "InfrastructureStatus":
+        return cls(
+            power_status=_intern(data.get("power_status", "Unknown")),
+            water_status=_intern(data.get("water_status", "Unknown"))
+        )
+
+    def to_dict(self, coordinates: List[float]) -> Dict:
+        return {"power_status": self.power_status, "water_status": self.water_status, "coordinates": coordinates}
+
+    def map_properties(self) -> Dict:
+        return {"power_status": self.power_status, "water_status": self.water_status, "source": "Utility Data"}
+
+    def csv_fields(self) -> Dict:
+        return {"power_status": self.power_status, "water_status": self.water_status}
+
+
+@dataclass(frozen=True, slots=True)
+class WaterQualityReading:
+    quality_index: int
+    ph_level: str
+    turbidity: str
+    monitoring_station: str
+    source_detail: str
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "WaterQualityReading":
+        return cls(
+            quality_index=data.get("quality_index", 0),
+            ph_level=data.get("ph_level", "Unknown"),
+            turbidity=data.get("turbidity", ""),
+            monitoring_station=data.get("monitoring_station", ""),
+            source_detail=_intern(data.get("source_detail", ""))
+        )
+
+    def to_dict(self, coordinates: List[float]) -> Dict:
+        return {
+            "quality_index": self.quality_index,
+            "ph_level": self.ph_level,
+            "turbidity": self.turbidity,
+            "monitoring_station": self.monitoring_station,
+            "source_detail": self.source_detail,
+            "coordinates": coordinates
+        }
+
+    def map_properties(self) -> Dict:
+        return {"quality_index": self.quality_index, "ph_level": self.ph_level, "source": "Water Board"}
+
+    def csv_fields(self) -> Dict:
+        return {
+            "quality_index": self.quality_index,
+            "ph_level": self.ph_level,
+            "turbidity": self.turbidity,
+            "monitoring_station": self.monitoring_station
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class TransportStatus:
+    metro_access: bool
+    bus_routes: int
+    connectivity_score: int
+    source_detail: str
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "TransportStatus":
+        return cls(
+            metro_access=data.get("metro_access", False),
+            bus_routes=data.get("bus_routes", 0),
+            connectivity_score=data.get("connectivity_score", 0),
+            source_detail=_intern(data.get("source_detail", ""))
+        )
+
+    def to_dict(self, coordinates: List[float]) -> Dict:
+        return {
+            "metro_access": self.metro_access,
+            "bus_routes": self.bus_routes,
+            "connectivity_score": self.connectivity_score,
+            "source_detail": self.source_detail,
+            "coordinates": coordinates
+        }
+
+    def map_properties(self) -> Dict:
+        return {"metro_access": self.metro_access, "bus_routes": self.bus_routes, "source": "Transport Data"}
+
+    def csv_fields(self) -> Dict:
+        return {
+            "metro_access": self.metro_access,
+            "bus_routes": self.bus_routes,
+            "connectivity_score": self.connectivity_score
+        }
+
+
+LAYER_RECORD_TYPES = {
+    "air_quality": AirQualityReading,
+    "crime_stats": SafetyRecord,
+    "infrastructure": InfrastructureStatus,
+    "water_quality": WaterQualityReading,
+    "transport": TransportStatus
+}
+
+
+class Layer:
+    """One data layer: metadata plus area records aligned with a flat [lat, lng, ...] array"""
+
+    __slots__ = ("name", "meta", "area_names", "records", "coords", "index", "_areas_at")
+
+    def __init__(self, name: str, meta: Dict, area_names: Tuple[str, ...], records: Tuple, coords: array, areas_at: int):
+        self.name = name
+        self.meta = meta
+        self.area_names = area_names
+        self.records = records
+        self.coords = coords
+        self.index = {area: i for i, area in enumerate(area_names)}
+        self._areas_at = areas_at
+
+    @classmethod
+    def from_dict(cls, name: str, data: Dict) -> "Layer":
+        record_type = LAYER_RECORD_TYPES[name]
+        areas = data.get("areas", {})
+
+        keys = list(data.keys())
+        meta = {key: value for key, value in data.items() if key != "areas"}
+        areas_at = keys.index("areas") if "areas" in data else len(keys)
+
+        coords = array("d")
+        for area_data in areas.values():
+            coords.extend(area_data.get("coordinates") or DEFAULT_COORDINATES)
+
+        return cls(
+            name,
+            meta,
+            tuple(sys.intern(area) for area in areas),
+            tuple(record_type.from_dict(area_data) for area_data in areas.values()),
+            coords,
+            areas_at
+        )
+
+    @property
+    def source(self) -> str:
+        return self.meta.get("source", "Unknown")
+
+    def coordinates(self, i: int) -> List[float]:
+        return [self.coords[2 * i], self.coords[2 * i + 1]]
+
+    def get(self, area: str):
+        """Return (record, [lat, lng]) for an area, or None"""
+        i = self.index.get(area)
+        if i is None:
+            return None
+        return self.records[i], self.coordinates(i)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def area_dict(self, i: int) -> Dict:
+        return self.records[i].to_dict(self.coordinates(i))
+
+    def to_dict(self) -> Dict:
+        """Rebuild the collector's layer dict"""
+        items = list(self.meta.items())
+        areas = {area: self.area_dict(i) for i, area in enumerate(self.area_names)}
+        items.insert(self._areas_at, ("areas", areas))
+        return dict(items)
+
+
+class Snapshot:
+    """Typed, shared view of one refresh; built once and read by every endpoint"""
+
+    __slots__ = ("layers", "last_updated", "data_sources", "extras", "_dict", "_area_index")
+
+    def __init__(self, layers: Dict[str, Layer], last_updated: Optional[str], data_sources: Dict, extras: Dict):
+        self.layers = layers
+        self.last_updated = last_updated
+        self.data_sources = data_sources
+        self.extras = extras
+        self._dict: Optional[Dict] = None
+        self._area_index: Optional[Dict[str, Tuple[Tuple[Layer, int], ...]]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Snapshot":
+        layers = {}
+        extras = {}
+        for key, value in data.items():
+            if key in LAYER_RECORD_TYPES and isinstance(value, dict):
+                layers[key] = Layer.from_dict(key, value)
+            elif key not in ("last_updated", "data_sources"):
+                extras[key] = value
+
+        return cls(layers, data.get("last_updated"), data.get("data_sources", {}), extras)
+
+    def layer(self, name: str) -> Optional[Layer]:
+        return self.layers.get(name)
+
+    def area_layers(self):
+        """Yield the layers that have area records, in AREA_LAYERS order"""
+        for name in AREA_LAYERS:
+            layer = self.layers.get(name)
+            if layer is not None and len(layer):
+                yield layer
+
+    def area_index(self) -> Dict[str, Tuple[Tuple[Layer, int], ...]]:
+        """Area name -> (layer, record index) for every layer that has the area, built once"""
+        if self._area_index is None:
+            index: Dict[str, List[Tuple[Layer, int]]] = {}
+            for layer in self.layers.values():
+                for i, area in enumerate(layer.area_names):
+                    index.setdefault(area, []).append((layer, i))
+            self._area_index = {area: tuple(entries) for area, entries in index.items()}
+        return self._area_index
+
+    def to_dict(self) -> Dict:
+        """The collector-shaped document, rendered once and reused"""
+        if self._dict is None:
+            data = {name: layer.to_dict() for name, layer in self.layers.items()}
+            data.update(self.extras)
+            data["last_updated"] = self.last_updated
+            data["data_sources"] = self.data_sources
+            self._dict = data
+        return self._dict
+
+    def __bool__(self) -> bool:
+        return bool(self.layers)
+
+
+@dataclass(frozen=True, slots=True)
+class PublishedSnapshot:
+    """A city's published state: snapshot, version, fetch time and views derived from them
+
+    Published by swapping a single reference, so a request that reads it once
+    sees data, version and timestamp from the same refresh without locks.
+    Derived views are memoized on the object, so they can never be served
+    with another refresh's data.
+    """
+    snapshot: Snapshot
+    version: int
+    fetched_at: Optional[datetime]
+    stations: Tuple[str, ...]
+    views: Dict[str, object] = field(default_factory=dict, compare=False, repr=False)
+
+    @property
+    def last_updated(self) -> Optional[str]:
+        return self.fetched_at.isoformat() if self.fetched_at else None
+
+    def view(self, name: str, build: Callable[["PublishedSnapshot"], object]):
+        """Build a derived view once; builds are pure functions of this object, so a racing duplicate is harmless"""
+        if name not in self.views:
+            self.views[name] = build(self)
+        return self.views[name]
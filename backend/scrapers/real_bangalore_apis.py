@@ -1,37 +1,64 @@
-import httpx
 import json
+import math
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from typing import TYPE_CHECKING, List, Dict, Optional
 import asyncio
 from .real_govt_apis import RealGovernmentAPIs
+from .registry import AreaRegistry, load_registry
+from .upstreams import waqi_feed_url
+from analytics.anomalies import AnomalyDetector
+from services.cache import cache_key
+from services.metrics import UPSTREAM_ERRORS, track_upstream
+from services.tracing import traced
+
+# httpx and the numpy-backed analytics modules are imported on first use, so startup does not wait for them
+if TYPE_CHECKING:
+    import httpx
+    from analytics.heatmap import HourlyHeatmap
 
 class RealBangaloreAPIs:
-    def __init__(self):
+    def __init__(self, registry: Optional[AreaRegistry] = None):
+        # Areas and WAQI stations come from the registry data file
+        self.registry = registry or load_registry()
+
         # Real Bangalore air quality stations from WAQI
         self.bangalore_stations = {
-            "Silk Board": {"uid": 11293, "coords": [12.917348, 77.622813]},
-            "Bapuji Nagar": {"uid": 11312, "coords": [12.951913, 77.539784]},
-            "BTM": {"uid": 8190, "coords": [12.9135218, 77.5950804]},
-            "Jayanagar": {"uid": 11276, "coords": [12.920984, 77.584908]},
-            "Hebbal": {"uid": 11428, "coords": [13.029152, 77.585901]},
-            "City Railway": {"uid": 8686, "coords": [12.9756843, 77.5660749]}
+            station.name: {"uid": station.uid, "coords": station.coordinates}
+            for station in self.registry.stations
         }
 
         # Map stations to our areas
         self.area_to_station = {
-            "Electronic City": "Silk Board",  # Closest station
-            "Whitefield": "BTM",  # Closest available
-            "Koramangala": "BTM",  # Direct match
-            "Indiranagar": "City Railway",  # Close to railway station
-            "Jayanagar": "Jayanagar",  # Direct match
-            "Hebbal": "Hebbal"  # Direct match
+            area.name: area.air_quality_station
+            for area in self.registry.areas
+            if area.air_quality_station
         }
 
         # Initialize real government APIs
-        self.govt_apis = RealGovernmentAPIs()
+        self.govt_apis = RealGovernmentAPIs(self.registry)
+
+        # Rolling per-station statistics, fed as readings arrive
+        self.anomaly_detector = AnomalyDetector()
+        # AQI by weekday and hour of day per area (see aqi_heatmap)
+        self._aqi_heatmap: Optional["HourlyHeatmap"] = None
+
+        # Station feeds are cached for `upstream_ttl` seconds (services.cache), so areas sharing
+        # a station, and replicas sharing the cache, fetch each feed once
+        self.cache = None
+        self.upstream_ttl = 300
+
+    @property
+    def aqi_heatmap(self) -> "HourlyHeatmap":
+        """AQI by weekday and hour of day per area, fed as readings arrive (allocated on first use)"""
+        if self._aqi_heatmap is None:
+            from analytics.heatmap import HourlyHeatmap
+            self._aqi_heatmap = HourlyHeatmap(area.name for area in self.registry.areas)
+        return self._aqi_heatmap
 
+    @traced("snapshot.collect")
     async def fetch_real_bangalore_data(self) -> Dict:
         """Fetch real air quality data from actual Bangalore stations"""
+        import httpx
 
         async with httpx.AsyncClient(timeout=30) as client:
             air_quality_data = await self._fetch_real_bangalore_air_quality(client)
@@ -51,7 +78,8 @@ class RealBangaloreAPIs:
                 "data_sources": self._get_real_data_sources()
             }
 
-    async def _fetch_real_bangalore_air_quality(self, client: httpx.AsyncClient) -> Dict:
+    @traced("collector.air_quality")
+    async def _fetch_real_bangalore_air_quality(self, client: "httpx.AsyncClient") -> Dict:
         """Fetch real air quality from actual Bangalore WAQI stations"""
 
         air_data = {
@@ -72,11 +100,9 @@ class RealBangaloreAPIs:
 
                 try:
                     # Fetch real data from specific station
-                    response = await client.get(f"https://api.waqi.info/feed/@{station_info['uid']}/?token=demo")
-
-                    if response.status_code == 200:
-                        data = response.json()
+                    status, data = await self._fetch_feed(client, station_name, station_info["uid"], area)
 
+                    if status == 200:
                         if data.get("status") == "ok":
                             station_data = data.get("data", {})
                             aqi = station_data.get("aqi", 0)
@@ -92,17 +118,25 @@ class RealBangaloreAPIs:
                                     "source": f"WAQI Station UID {station_info['uid']}"
                                 }
                                 station_aqis.append(aqi)
+                                self._detect_anomalies(area, air_data["areas"][area])
+                                self._aggregate_reading(area, air_data["areas"][area])
                                 print(f"✅ Real AQI for {area}: {aqi} from {station_name}")
                             else:
+                                UPSTREAM_ERRORS.labels("waqi", "invalid_aqi").inc()
                                 print(f"⚠️ No valid AQI for {area} from {station_name}")
                         else:
+                            UPSTREAM_ERRORS.labels("waqi", "api_error").inc()
                             print(f"❌ API error for {station_name}: {data.get('status')}")
                     else:
-                        print(f"❌ HTTP error for {station_name}: {response.status_code}")
+                        UPSTREAM_ERRORS.labels("waqi", f"http_{status}").inc()
+                        print(f"❌ HTTP error for {station_name}: {status}")
 
                 except Exception as e:
                     print(f"❌ Exception fetching {station_name}: {e}")
 
+        # CPCB NAQI for every station in one vectorized pass
+        self._add_naqi(list(air_data["areas"].values()))
+
         # Calculate city average from real stations
         if station_aqis:
             air_data["city_average"] = round(sum(station_aqis) / len(station_aqis))
@@ -114,6 +148,34 @@ class RealBangaloreAPIs:
 
         return air_data
 
+    async def _fetch_feed(self, client: "httpx.AsyncClient", station_name: str, uid: int, area: str):
+        """(HTTP status, JSON) of a station's WAQI feed; successful feeds are served from the cache while fresh"""
+        key = cache_key("upstream", "waqi", uid)
+        if self.cache is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return 200, json.loads(cached)
+
+        with track_upstream("waqi", station=station_name, uid=uid, area=area):
+            response = await client.get(waqi_feed_url(uid))
+        if response.status_code != 200:
+            return response.status_code, None
+
+        data = response.json()
+        if self.cache is not None and data.get("status") == "ok":
+            await self.cache.set(key, response.content, self.upstream_ttl)
+        return 200, data
+
+    def observe_shared(self, snapshot):
+        """Feed the anomaly detector and heatmap from a snapshot another replica fetched"""
+        layer = snapshot.layer("air_quality")
+        if layer is None:
+            return
+        for area, record in zip(layer.area_names, layer.records):
+            reading = {"aqi": record.aqi, "station_name": record.station_name, "last_update": record.last_update}
+            self._detect_anomalies(area, reading)
+            self._aggregate_reading(area, reading)
+
     def _get_real_crime_disclaimer(self) -> Dict:
         """Real crime data sources information"""
         return {
@@ -180,49 +242,57 @@ class RealBangaloreAPIs:
         }
 
     def _get_aqi_status(self, aqi: int) -> str:
-        if aqi <= 50: return "Good"
-        elif aqi <= 100: return "Moderate"
-        elif aqi <= 150: return "Unhealthy for Sensitive"
-        elif aqi <= 200: return "Unhealthy"
-        elif aqi <= 300: return "Very Unhealthy"
-        else: return "Hazardous"
+        from analytics.aqi import US_AQI
+
+        # WAQI's aqi is on the US EPA scale
+        return str(US_AQI.category(aqi))
+
+    def _detect_anomalies(self, area: str, reading: Dict):
+        """Score the reading against its station's history and flag the area"""
+        try:
+            observed_at = datetime.strptime(reading["last_update"], "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            observed_at = datetime.now()
+
+        station = reading["station_name"]
+        for event in self.anomaly_detector.observe(station, reading["aqi"], observed_at, area=area):
+            print(f"🚨 AQI {event['kind']} at {station}: {event['value']} (expected ~{event['expected']})")
+        reading["anomalies"] = list(self.anomaly_detector.flags(station))
+
+    def _aggregate_reading(self, area: str, reading: Dict):
+        """Add the reading to the area's weekday x hour AQI heatmap, once per station timestamp"""
+        try:
+            observed_at = datetime.strptime(reading["last_update"], "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return
+        self.aqi_heatmap.observe(area, observed_at, reading["aqi"], only_newer=True)
+
+    def _add_naqi(self, readings: List[Dict]):
+        """Add CPCB NAQI, its category and the dominant pollutant to each station reading"""
+        if not readings:
+            return
+
+        from analytics.aqi import NAQI, compute_aqi, concentrations_from_iaqi
+        result = compute_aqi(concentrations_from_iaqi(r["pollutants"] for r in readings), NAQI)
+        for reading, index, category, dominant in zip(readings, result.index, result.category, result.dominant):
+            # Instantaneous readings, not the 24-hour averages CPCB reports, so the value is indicative
+            reading["naqi"] = None if math.isnan(index) else int(index)
+            reading["naqi_category"] = category
+            reading["dominant_pollutant"] = dominant
 
 
+    @traced("collector.infrastructure")
     def _get_sample_infrastructure_data(self) -> Dict:
         """Sample infrastructure data for demonstration"""
         return {
             "source": "Sample Infrastructure Data - Requires Utility APIs",
             "areas": {
-                "Electronic City": {
-                    "power_status": "Good",
-                    "water_status": "Fair",
-                    "coordinates": [12.8440, 77.6630]
-                },
-                "Whitefield": {
-                    "power_status": "Excellent",
-                    "water_status": "Good",
-                    "coordinates": [12.9698, 77.7500]
-                },
-                "Koramangala": {
-                    "power_status": "Good",
-                    "water_status": "Good",
-                    "coordinates": [12.9279, 77.6271]
-                },
-                "Indiranagar": {
-                    "power_status": "Excellent",
-                    "water_status": "Good",
-                    "coordinates": [12.9784, 77.6408]
-                },
-                "Jayanagar": {
-                    "power_status": "Good",
-                    "water_status": "Excellent",
-                    "coordinates": [12.9237, 77.5838]
-                },
-                "Hebbal": {
-                    "power_status": "Fair",
-                    "water_status": "Good",
-                    "coordinates": [13.0356, 77.5970]
+                area.name: {
+                    "power_status": area.infrastructure.get("power_status", "Unknown"),
+                    "water_status": area.infrastructure.get("water_status", "Unknown"),
+                    "coordinates": list(area.coordinates)
                 }
+                for area in self.registry.areas
             }
         }
 
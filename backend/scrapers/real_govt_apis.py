@@ -1,11 +1,28 @@
-import httpx
-import json
-from datetime import datetime
-from typing import Dict, List, Optional
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
 import asyncio
+from services.tracing import traced
+from .providers import LayerProvider, load_provider
+from .registry import AreaRegistry
+
+if TYPE_CHECKING:
+    import httpx
+
+# Incidents listed per area in the crime layer
+RECENT_INCIDENTS_PER_AREA = 10
 
 class RealGovernmentAPIs:
-    def __init__(self):
+    def __init__(self, registry: AreaRegistry, provider: Optional[LayerProvider] = None):
+        # Areas (and their static attributes) every collector iterates over
+        self.registry = registry
+
+        # Bus routes, water quality and safety scores until those have public APIs
+        self.provider = provider or load_provider()
+        # (layer, area) -> (source version, area record)
+        self._area_records: Dict[Tuple[str, str], Tuple[object, Dict]] = {}
+
+        # Store of ingested FIRs (services.incidents.IncidentStore), when the city has one
+        self.incident_store = None
+
         # Government API endpoints we discovered
         self.apis = {
             "data_gov_in": "https://api.data.gov.in/resource/",
@@ -38,375 +55,105 @@ class RealGovernmentAPIs:
             }
         }
 
-    async def fetch_real_transport_data(self, client: httpx.AsyncClient) -> Dict:
+    @traced("collector.transport")
+    async def fetch_real_transport_data(self, client: "httpx.AsyncClient") -> Dict:
         """Fetch real transport data from government sources"""
+        version = self.provider.version("transport")
+        areas = {}
+        for area in self.registry.areas:
+            transport = area.transport
+            areas[area.name] = self._memoized("transport", area.name, version, lambda: {
+                "metro_access": transport.get("metro_access", False),
+                "bus_routes": self.provider.bus_routes(area),
+                "connectivity_score": transport.get("connectivity_score", 0),
+                "source_detail": transport.get("source_detail", "BMTC route analysis + Government transport data"),
+                "coordinates": list(area.coordinates)
+            })
+
         return {
             "source": "Real Government Transport APIs",
             "methodology": "Bus frequency, route coverage, metro connectivity analysis",
             "data_note": "Integration with BMTC real-time systems and data.gov.in transport sector",
-            "areas": {
-                "Electronic City": {
-                    "metro_access": False,
-                    "bus_routes": await self._get_real_bus_count("Electronic City"),
-                    "connectivity_score": 65,
-                    "last_updated": datetime.now().isoformat(),
-                    "source_detail": "BMTC route analysis + Government transport data",
-                    "coordinates": [12.8440, 77.6630]
-                },
-                "Whitefield": {
-                    "metro_access": False,
-                    "bus_routes": await self._get_real_bus_count("Whitefield"),
-                    "connectivity_score": 55,
-                    "last_updated": datetime.now().isoformat(),
-                    "source_detail": "BMTC route analysis + Government transport data",
-                    "coordinates": [12.9698, 77.7500]
-                },
-                "Koramangala": {
-                    "metro_access": True,
-                    "bus_routes": await self._get_real_bus_count("Koramangala"),
-                    "connectivity_score": 90,
-                    "last_updated": datetime.now().isoformat(),
-                    "source_detail": "BMRCL Green Line + BMTC route analysis",
-                    "coordinates": [12.9279, 77.6271]
-                },
-                "Indiranagar": {
-                    "metro_access": True,
-                    "bus_routes": await self._get_real_bus_count("Indiranagar"),
-                    "connectivity_score": 95,
-                    "last_updated": datetime.now().isoformat(),
-                    "source_detail": "BMRCL Purple Line + BMTC route analysis",
-                    "coordinates": [12.9784, 77.6408]
-                },
-                "Jayanagar": {
-                    "metro_access": False,
-                    "bus_routes": await self._get_real_bus_count("Jayanagar"),
-                    "connectivity_score": 75,
-                    "last_updated": datetime.now().isoformat(),
-                    "source_detail": "BMTC route analysis + Government transport data",
-                    "coordinates": [12.9237, 77.5838]
-                },
-                "Hebbal": {
-                    "metro_access": False,
-                    "bus_routes": await self._get_real_bus_count("Hebbal"),
-                    "connectivity_score": 60,
-                    "last_updated": datetime.now().isoformat(),
-                    "source_detail": "BMTC route analysis + Government transport data",
-                    "coordinates": [13.0356, 77.5970]
-                }
-            }
+            "areas": areas
         }
 
-    async def fetch_real_water_quality_data(self, client: httpx.AsyncClient) -> Dict:
+    @traced("collector.water_quality")
+    async def fetch_real_water_quality_data(self, client: "httpx.AsyncClient") -> Dict:
         """Fetch real water quality data from CPCB/BWSSB"""
+        version = self.provider.version("water_quality")
+        areas = {}
+        for area in self.registry.areas:
+            water = area.water_quality
+            areas[area.name] = self._memoized("water_quality", area.name, version, lambda: {
+                "quality_index": self.provider.water_quality_index(area),
+                "ph_level": water.get("ph_level", "Unknown"),
+                "turbidity": water.get("turbidity", ""),
+                "monitoring_station": water.get("monitoring_station", ""),
+                "source_detail": "BWSSB Real-time Continuous Water Quality Monitoring",
+                "coordinates": list(area.coordinates)
+            })
+
         return {
             "source": "CPCB Real-time Water Quality Monitoring + BWSSB",
             "methodology": "Real-time monitoring stations: pH, turbidity, conductivity, dissolved oxygen",
             "monitoring_network": "CPCB dashboard + BWSSB continuous monitoring stations",
-            "areas": {
-                "Electronic City": {
-                    "quality_index": await self._get_water_quality_reading("Electronic City"),
-                    "ph_level": "7.1",
-                    "turbidity": "2.3 NTU",
-                    "monitoring_station": "BWSSB Station EC-1",
-                    "last_reading": datetime.now().isoformat(),
-                    "source_detail": "BWSSB Real-time Continuous Water Quality Monitoring",
-                    "coordinates": [12.8440, 77.6630]
-                },
-                "Whitefield": {
-                    "quality_index": await self._get_water_quality_reading("Whitefield"),
-                    "ph_level": "6.9",
-                    "turbidity": "1.8 NTU",
-                    "monitoring_station": "BWSSB Station WF-2",
-                    "last_reading": datetime.now().isoformat(),
-                    "source_detail": "BWSSB Real-time Continuous Water Quality Monitoring",
-                    "coordinates": [12.9698, 77.7500]
-                },
-                "Koramangala": {
-                    "quality_index": await self._get_water_quality_reading("Koramangala"),
-                    "ph_level": "7.0",
-                    "turbidity": "1.5 NTU",
-                    "monitoring_station": "BWSSB Station KR-3",
-                    "last_reading": datetime.now().isoformat(),
-                    "source_detail": "BWSSB Real-time Continuous Water Quality Monitoring",
-                    "coordinates": [12.9279, 77.6271]
-                },
-                "Indiranagar": {
-                    "quality_index": await self._get_water_quality_reading("Indiranagar"),
-                    "ph_level": "7.2",
-                    "turbidity": "1.2 NTU",
-                    "monitoring_station": "BWSSB Station IN-1",
-                    "last_reading": datetime.now().isoformat(),
-                    "source_detail": "BWSSB Real-time Continuous Water Quality Monitoring",
-                    "coordinates": [12.9784, 77.6408]
-                },
-                "Jayanagar": {
-                    "quality_index": await self._get_water_quality_reading("Jayanagar"),
-                    "ph_level": "6.8",
-                    "turbidity": "1.1 NTU",
-                    "monitoring_station": "BWSSB Station JN-4",
-                    "last_reading": datetime.now().isoformat(),
-                    "source_detail": "BWSSB Real-time Continuous Water Quality Monitoring",
-                    "coordinates": [12.9237, 77.5838]
-                },
-                "Hebbal": {
-                    "quality_index": await self._get_water_quality_reading("Hebbal"),
-                    "ph_level": "7.3",
-                    "turbidity": "2.1 NTU",
-                    "monitoring_station": "BWSSB Station HB-2",
-                    "last_reading": datetime.now().isoformat(),
-                    "source_detail": "BWSSB Real-time Continuous Water Quality Monitoring",
-                    "coordinates": [13.0356, 77.5970]
-                }
-            }
+            "areas": areas
         }
 
-    async def fetch_real_crime_data(self, client: httpx.AsyncClient) -> Dict:
+    @traced("collector.crime")
+    async def fetch_real_crime_data(self, client: "httpx.AsyncClient") -> Dict:
         """Fetch real crime data from Karnataka Police and NCRB"""
+        # One read of the ingested FIRs per refresh, off the event loop
+        ingested = {}
+        if self.incident_store is not None:
+            ingested = await asyncio.to_thread(
+                self.incident_store.recent_by_area, [area.name for area in self.registry.areas], RECENT_INCIDENTS_PER_AREA
+            )
+
+        provider_version = self.provider.version("crime_stats")
+        areas = {}
+        for area in self.registry.areas:
+            crime = area.crime
+            area_ingested = ingested.get(area.name, [])
+            # Newly ingested or updated FIRs change the record as well
+            version = (provider_version, tuple(tuple(incident.values()) for incident in area_ingested))
+            areas[area.name] = self._memoized("crime_stats", area.name, version, lambda: {
+                "safety_score": self.provider.safety_score(area),
+                "crime_rate": crime.get("crime_rate", "Unknown"),
+                "recent_incidents": self._get_recent_crimes(area.name, area_ingested),
+                "police_station": crime.get("police_station", f"{area.name} Police Station"),
+                "patrol_frequency": crime.get("patrol_frequency", ""),
+                "last_incident_date": max(
+                    [crime.get("last_incident_date", "")] + [incident["when"][:10] for incident in area_ingested]
+                ),
+                "source_detail": "Karnataka Police FIR Database analysis",
+                "coordinates": list(area.coordinates)
+            })
+
         return {
             "source": "Karnataka State Police FIR Database + NCRB Crime Statistics",
             "methodology": "FIR analysis, crime rate per 1000 residents, incident frequency, police response",
             "data_access": "ksp.karnataka.gov.in/firsearch + data.gov.in NCRB data",
-            "areas": {
-                "Electronic City": {
-                    "safety_score": await self._calculate_safety_score("Electronic City"),
-                    "crime_rate": "Low",
-                    "recent_incidents": await self._get_recent_crimes("Electronic City"),
-                    "police_station": "Electronic City Police Station",
-                    "patrol_frequency": "4 times/day",
-                    "last_incident_date": "2025-09-18",
-                    "source_detail": "Karnataka Police FIR Database analysis",
-                    "coordinates": [12.8440, 77.6630]
-                },
-                "Whitefield": {
-                    "safety_score": await self._calculate_safety_score("Whitefield"),
-                    "crime_rate": "Very Low",
-                    "recent_incidents": await self._get_recent_crimes("Whitefield"),
-                    "police_station": "Whitefield Police Station",
-                    "patrol_frequency": "3 times/day",
-                    "last_incident_date": "2025-09-15",
-                    "source_detail": "Karnataka Police FIR Database analysis",
-                    "coordinates": [12.9698, 77.7500]
-                },
-                "Koramangala": {
-                    "safety_score": await self._calculate_safety_score("Koramangala"),
-                    "crime_rate": "Low",
-                    "recent_incidents": await self._get_recent_crimes("Koramangala"),
-                    "police_station": "Koramangala Police Station",
-                    "patrol_frequency": "5 times/day",
-                    "last_incident_date": "2025-09-19",
-                    "source_detail": "Karnataka Police FIR Database analysis",
-                    "coordinates": [12.9279, 77.6271]
-                },
-                "Indiranagar": {
-                    "safety_score": await self._calculate_safety_score("Indiranagar"),
-                    "crime_rate": "Low",
-                    "recent_incidents": await self._get_recent_crimes("Indiranagar"),
-                    "police_station": "Indiranagar Police Station",
-                    "patrol_frequency": "5 times/day",
-                    "last_incident_date": "2025-09-17",
-                    "source_detail": "Karnataka Police FIR Database analysis",
-                    "coordinates": [12.9784, 77.6408]
-                },
-                "Jayanagar": {
-                    "safety_score": await self._calculate_safety_score("Jayanagar"),
-                    "crime_rate": "Very Low",
-                    "recent_incidents": await self._get_recent_crimes("Jayanagar"),
-                    "police_station": "Jayanagar Police Station",
-                    "patrol_frequency": "4 times/day",
-                    "last_incident_date": "2025-09-14",
-                    "source_detail": "Karnataka Police FIR Database analysis",
-                    "coordinates": [12.9237, 77.5838]
-                },
-                "Hebbal": {
-                    "safety_score": await self._calculate_safety_score("Hebbal"),
-                    "crime_rate": "Low",
-                    "recent_incidents": await self._get_recent_crimes("Hebbal"),
-                    "police_station": "Hebbal Police Station",
-                    "patrol_frequency": "3 times/day",
-                    "last_incident_date": "2025-09-16",
-                    "source_detail": "Karnataka Police FIR Database analysis",
-                    "coordinates": [13.0356, 77.5970]
-                }
-            }
+            "areas": areas
         }
 
-    async def _get_real_bus_count(self, area: str) -> int:
-        """Get actual bus route count for area"""
-        # This would integrate with BMTC API or data.gov.in transport data
-        route_counts = {
-            "Electronic City": 18,
-            "Whitefield": 12,
-            "Koramangala": 28,
-            "Indiranagar": 32,
-            "Jayanagar": 24,
-            "Hebbal": 16
-        }
-        # For areas not specifically defined, generate reasonable counts based on area type
-        if area not in route_counts:
-            import random
-            # Central areas tend to have more routes
-            central_areas = ["MG Road", "Brigade Road", "Commercial Street", "Shivajinagar"]
-            if any(central in area for central in central_areas):
-                return random.randint(25, 35)
-            # Layout areas have moderate connectivity
-            elif "Layout" in area or "HSR" in area or "BTM" in area:
-                return random.randint(15, 25)
-            # Outer areas have fewer routes
-            else:
-                return random.randint(8, 18)
-        return route_counts.get(area, 10)
+    def _memoized(self, layer: str, area: str, version, build: Callable[[], Dict]) -> Dict:
+        """The area's previous record while its source version is unchanged, so unchanged layers diff as equal"""
+        cached = self._area_records.get((layer, area))
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        record = build()
+        self._area_records[(layer, area)] = (version, record)
+        return record
 
-    async def _get_water_quality_reading(self, area: str) -> int:
-        """Get real water quality index from BWSSB monitoring"""
-        # This would integrate with BWSSB real-time monitoring API
-        import random
-        base_scores = {
-            "Electronic City": 82,
-            "Whitefield": 85,
-            "Koramangala": 88,
-            "Indiranagar": 86,
-            "Jayanagar": 90,
-            "Hebbal": 79
-        }
-        # For areas not specifically defined, generate reasonable scores
-        if area not in base_scores:
-            # Central areas tend to have better infrastructure
-            central_areas = ["MG Road", "Brigade Road", "Commercial Street", "Shivajinagar"]
-            if any(central in area for central in central_areas):
-                base = random.randint(85, 92)
-            # Layout areas have good infrastructure
-            elif "Layout" in area or "HSR" in area or "BTM" in area:
-                base = random.randint(80, 88)
-            # Outer areas may have variable quality
-            else:
-                base = random.randint(75, 85)
-        else:
-            base = base_scores[area]
-        # Add some realistic variation to simulate real-time readings
-        return base + random.randint(-3, 3)
-
-    async def _calculate_safety_score(self, area: str) -> int:
-        """Calculate safety score based on FIR data analysis"""
-        # This would analyze real FIR data from Karnataka Police
-        import random
-        base_scores = {
-            "Electronic City": 78,
-            "Whitefield": 87,
-            "Koramangala": 82,
-            "Indiranagar": 84,
-            "Jayanagar": 89,
-            "Hebbal": 80
-        }
-        # For areas not specifically defined, generate reasonable safety scores
-        if area not in base_scores:
-            # Central commercial areas tend to have good police presence
-            central_areas = ["MG Road", "Brigade Road", "Commercial Street", "Shivajinagar"]
-            if any(central in area for central in central_areas):
-                return random.randint(82, 90)
-            # Residential layouts generally safe
-            elif "Layout" in area or "HSR" in area or "BTM" in area or "JP Nagar" in area:
-                return random.randint(78, 86)
-            # Outer areas may have variable safety
-            else:
-                return random.randint(70, 82)
-        return base_scores[area]
-
-    async def _get_recent_crimes(self, area: str) -> List[Dict]:
+    def _get_recent_crimes(self, area: str, ingested: Optional[List[Dict]] = None) -> List[Dict]:
         """Get recent crime incidents from FIR database with detailed information"""
-        # This would query real Karnataka Police FIR data
-        sample_incidents = {
-            "Electronic City": [
-                {
-                    "fir_number": "FIR 234/2025",
-                    "type": "Vehicle theft",
-                    "what": "Motorcycle theft from parking area",
-                    "when": "2025-09-19 14:30",
-                    "who": "Unknown suspect, CCTV being reviewed",
-                    "officer": "SI Rajesh Kumar",
-                    "status": "Under investigation"
-                },
-                {
-                    "fir_number": "FIR 189/2025",
-                    "type": "Chain snatching",
-                    "what": "Gold chain snatched on Bannerghatta Road",
-                    "when": "2025-09-18 19:45",
-                    "who": "Two persons on motorcycle",
-                    "officer": "CI Priya Sharma",
-                    "status": "Suspects identified"
-                }
-            ],
-            "Whitefield": [
-                {
-                    "fir_number": "FIR 156/2025",
-                    "type": "Burglary",
-                    "what": "House break-in, electronics stolen",
-                    "when": "2025-09-17 02:00",
-                    "who": "Unknown burglars",
-                    "officer": "SI Mohan Das",
-                    "status": "Under investigation"
-                }
-            ],
-            "Koramangala": [
-                {
-                    "fir_number": "FIR 278/2025",
-                    "type": "Mobile theft",
-                    "what": "iPhone stolen from restaurant table",
-                    "when": "2025-09-20 20:15",
-                    "who": "Unknown person in crowd",
-                    "officer": "SI Deepa Rao",
-                    "status": "CCTV being analyzed"
-                },
-                {
-                    "fir_number": "FIR 245/2025",
-                    "type": "Fraud case",
-                    "what": "Online payment fraud, ₹25,000 lost",
-                    "when": "2025-09-19 10:30",
-                    "who": "Cyber criminal, bank details misused",
-                    "officer": "Inspector Vinay Singh",
-                    "status": "Referred to cyber crime cell"
-                }
-            ],
-            "Indiranagar": [
-                {
-                    "fir_number": "FIR 201/2025",
-                    "type": "Vehicle theft",
-                    "what": "Car theft from commercial complex",
-                    "when": "2025-09-18 11:00",
-                    "who": "Professional car lifters suspected",
-                    "officer": "CI Ramesh Babu",
-                    "status": "Vehicle tracking in progress"
-                }
-            ],
-            "Jayanagar": [
-                {
-                    "fir_number": "FIR 167/2025",
-                    "type": "Petty theft",
-                    "what": "Wallet stolen from auto rickshaw",
-                    "when": "2025-09-17 16:20",
-                    "who": "Co-passenger in auto",
-                    "officer": "SI Lakshmi Devi",
-                    "status": "Suspect apprehended"
-                }
-            ],
-            "Hebbal": [
-                {
-                    "fir_number": "FIR 198/2025",
-                    "type": "Chain snatching",
-                    "what": "Chain snatched near bus stop",
-                    "when": "2025-09-19 07:30",
-                    "who": "Two youth on bike",
-                    "officer": "SI Kiran Kumar",
-                    "status": "Patrolling increased"
-                },
-                {
-                    "fir_number": "FIR 223/2025",
-                    "type": "Vehicle theft",
-                    "what": "Scooter stolen from metro station",
-                    "when": "2025-09-20 18:00",
-                    "who": "Unknown, parking area CCTV checked",
-                    "officer": "CI Manjula K",
-                    "status": "Under investigation"
-                }
-            ]
-        }
-        return sample_incidents.get(area, [{"fir_number": "No recent incidents", "type": "", "what": "", "when": "", "who": "", "officer": "", "status": ""}])
\ No newline at end of file
+        # Ingested FIRs (newest first) take precedence over the registry's reference incidents
+        area_record = self.registry.get(area)
+        static = area_record.crime.get("recent_incidents", []) if area_record is not None else []
+        if ingested:
+            seen = {incident["fir_number"] for incident in ingested}
+            return (ingested + [incident for incident in static if incident["fir_number"] not in seen])[:RECENT_INCIDENTS_PER_AREA]
+        if static:
+            return static
+        return [{"fir_number": "No recent incidents", "type": "", "what": "", "when": "", "who": "", "officer": "", "status": ""}]
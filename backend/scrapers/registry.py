@@ -0,0 +1,110 @@
+import json
+import os
+import sys
+from array import array
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+DEFAULT_REGISTRY_PATH = os.path.join(DATA_DIR, "bangalore.json")
+
+
+@dataclass(frozen=True, slots=True)
+class Station:
+    name: str
+    uid: int
+    coordinates: List[float]
+    waqi_path: Optional[str]
+
+
+@dataclass(frozen=True, slots=True)
+class Area:
+    """One area (ward) and the static per-layer attributes the collectors start from"""
+    index: int
+    name: str
+    coordinates: List[float]
+    air_quality_station: Optional[str]
+    infrastructure: Dict
+    transport: Dict
+    water_quality: Dict
+    crime: Dict
+
+
+class AreaRegistry:
+    """Interned, indexed table of a city's areas and monitoring stations"""
+
+    def __init__(self, city: str, areas: Tuple[Area, ...], stations: Tuple[Station, ...],
+                 slug: Optional[str] = None, display_name: Optional[str] = None, map_view: Optional[Dict] = None):
+        self.city = city
+        self.slug = slug or city.lower().replace(" ", "-")
+        self.display_name = display_name or city
+        # Bounds, center and zoom levels for the frontend map
+        self.map_view = map_view or {}
+        self.areas = areas
+        self.stations = stations
+
+        self.area_index: Dict[str, Area] = {area.name: area for area in areas}
+        self.station_index: Dict[str, Station] = {station.name: station for station in stations}
+
+        # Flat [lat, lng, lat, lng, ...] in area order
+        self.coords = array("d")
+        for area in areas:
+            self.coords.extend(area.coordinates)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "AreaRegistry":
+        stations = tuple(
+            Station(
+                name=sys.intern(station["name"]),
+                uid=station["uid"],
+                coordinates=station["coordinates"],
+                waqi_path=station.get("waqi_path")
+            )
+            for station in data.get("stations", [])
+        )
+        areas = tuple(
+            Area(
+                index=i,
+                name=sys.intern(area["name"]),
+                coordinates=area["coordinates"],
+                air_quality_station=area.get("air_quality_station"),
+                infrastructure=area.get("infrastructure", {}),
+                transport=area.get("transport", {}),
+                water_quality=area.get("water_quality", {}),
+                crime=area.get("crime", {})
+            )
+            for i, area in enumerate(data.get("areas", []))
+        )
+
+        registry = cls(
+            data.get("city", ""), areas, stations,
+            slug=data.get("slug"), display_name=data.get("display_name"), map_view=data.get("map_view")
+        )
+
+        unknown = [a.name for a in areas if a.air_quality_station and a.air_quality_station not in registry.station_index]
+        if unknown:
+            raise ValueError(f"Areas mapped to unknown air quality stations: {', '.join(unknown)}")
+
+        return registry
+
+    def get(self, name: str) -> Optional[Area]:
+        return self.area_index.get(name)
+
+    def __len__(self) -> int:
+        return len(self.areas)
+
+
+def load_registry(path: Optional[str] = None) -> AreaRegistry:
+    """Load the area/station registry (AREA_REGISTRY_PATH overrides the bundled Bangalore file)"""
+    path = path or os.getenv("AREA_REGISTRY_PATH", DEFAULT_REGISTRY_PATH)
+    with open(path, encoding="utf-8") as f:
+        return AreaRegistry.from_dict(json.load(f))
+
+
+def available_cities(data_dir: str = DATA_DIR) -> Dict[str, str]:
+    """City slug -> registry file for every registry in the data directory"""
+    return {
+        os.path.splitext(name)[0]: os.path.join(data_dir, name)
+        for name in sorted(os.listdir(data_dir))
+        if name.endswith(".json")
+    }
@@ -0,0 +1,23 @@
+import os
+from typing import Optional
+from urllib.parse import urlsplit
+
+# Upstream hosts can be pointed at a local stand-in (see benchmarks/fake_upstream.py)
+WAQI_BASE_URL = os.getenv("WAQI_BASE_URL", "https://api.waqi.info").rstrip("/")
+WAQI_TOKEN = os.getenv("WAQI_TOKEN", "demo")
+
+# When set, government portal checks go to {PORTAL_BASE_URL}/portal/{host}{path}
+PORTAL_BASE_URL: Optional[str] = os.getenv("PORTAL_BASE_URL")
+
+
+def waqi_feed_url(uid: int) -> str:
+    return f"{WAQI_BASE_URL}/feed/@{uid}/?token={WAQI_TOKEN}"
+
+
+def portal_url(url: str) -> str:
+    """Map a public portal URL to the configured stand-in, if any"""
+    if not PORTAL_BASE_URL:
+        return url
+
+    parts = urlsplit(url)
+    return f"{PORTAL_BASE_URL.rstrip('/')}/portal/{parts.netloc}{parts.path or '/'}"
@@ -0,0 +1,22 @@
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+
+def is_admin(x_admin_token: Optional[str]) -> bool:
+    """Whether the request carries the admin token (never, when ADMIN_TOKEN is unset)"""
+    expected = os.getenv("ADMIN_TOKEN")
+    return bool(expected and x_admin_token and hmac.compare_digest(x_admin_token, expected))
+
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Dependency guarding admin/debug endpoints; they are disabled unless ADMIN_TOKEN is set"""
+    expected = os.getenv("ADMIN_TOKEN")
+
+    if not expected:
+        raise HTTPException(status_code=404, detail="Debug endpoints are disabled")
+
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=403, detail="Admin token required")
@@ -0,0 +1,472 @@
+import asyncio
+import contextlib
+import hashlib
+import hmac
+import ipaddress
+import math
+import secrets
+import socket
+import time
+import uuid
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from models.snapshot import Snapshot
+from scrapers.registry import AreaRegistry
+
+from .tracing import tracer
+
+if TYPE_CHECKING:
+    import httpx
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def distance_km(a: Sequence[float], b: Sequence[float]) -> float:
+    """Great-circle distance between two [lat, lng] points"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(h))
+
+
+def point_in_polygon(point: Sequence[float], polygon: Sequence[Sequence[float]]) -> bool:
+    """Ray casting over [lat, lng] vertices (city-sized polygons, so lat/lng are treated as planar)"""
+    lat, lng = point
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lng_i = polygon[i]
+        lat_j, lng_j = polygon[j]
+        if (lng_i > lng) != (lng_j > lng) and lat < (lat_j - lat_i) * (lng - lng_i) / (lng_j - lng_i) + lat_i:
+            inside = not inside
+        j = i
+    return inside
+
+
+class Subscription:
+    """A geofence (point and radius, or polygon) with a threshold rule on one layer field"""
+
+    def __init__(self, city: str, layer: str, field: str, direction: str, threshold: float, webhook_url: str,
+                 center: Optional[List[float]] = None, radius_km: Optional[float] = None,
+                 polygon: Optional[List[List[float]]] = None, client: Optional[str] = None):
+        self.subscription_id = uuid.uuid4().hex[:12]
+        self.city = city
+        self.layer = layer
+        self.field = field
+        # "above" fires when the value rises past the threshold, "below" when it drops under it
+        self.direction = direction
+        self.threshold = threshold
+        self.webhook_url = webhook_url
+        self.center = center
+        self.radius_km = radius_km
+        self.polygon = polygon
+        # Who subscribed (the client address), for the per-client cap
+        self.client = client
+        self.created_at = datetime.now()
+        self.areas: Tuple[str, ...] = ()
+        self.triggered = 0
+        # Digest of the secret that reads or deletes this subscription; the secret itself is only returned once
+        self._secret_digest: Optional[bytes] = None
+
+    def issue_secret(self) -> str:
+        secret = secrets.token_urlsafe(24)
+        self._secret_digest = hashlib.sha256(secret.encode()).digest()
+        return secret
+
+    def verify_secret(self, secret: Optional[str]) -> bool:
+        if not secret or self._secret_digest is None:
+            return False
+        return hmac.compare_digest(hashlib.sha256(secret.encode()).digest(), self._secret_digest)
+
+    def covers(self, coordinates: Sequence[float]) -> bool:
+        if self.polygon:
+            return point_in_polygon(coordinates, self.polygon)
+        return distance_km(self.center, coordinates) <= self.radius_km
+
+    def matches(self, value: float) -> bool:
+        return value > self.threshold if self.direction == "above" else value < self.threshold
+
+    def to_dict(self) -> Dict:
+        return {
+            "subscription_id": self.subscription_id,
+            "city": self.city,
+            "layer": self.layer,
+            "field": self.field,
+            "direction": self.direction,
+            "threshold": self.threshold,
+            "webhook_url": self.webhook_url,
+            "geofence": {"polygon": self.polygon} if self.polygon else {"center": self.center, "radius_km": self.radius_km},
+            "areas": list(self.areas),
+            "triggered": self.triggered,
+            "created_at": self.created_at.isoformat()
+        }
+
+
+class ThresholdRules:
+    """Subscriptions on one (layer, area, field), kept sorted by threshold per direction"""
+
+    __slots__ = ("above", "above_ids", "below", "below_ids")
+
+    def __init__(self):
+        self.above: List[float] = []
+        self.above_ids: List[str] = []
+        self.below: List[float] = []
+        self.below_ids: List[str] = []
+
+    def _lists(self, direction: str) -> Tuple[List[float], List[str]]:
+        return (self.above, self.above_ids) if direction == "above" else (self.below, self.below_ids)
+
+    def add(self, subscription: Subscription):
+        thresholds, ids = self._lists(subscription.direction)
+        i = bisect_right(thresholds, subscription.threshold)
+        thresholds.insert(i, subscription.threshold)
+        ids.insert(i, subscription.subscription_id)
+
+    def remove(self, subscription: Subscription):
+        thresholds, ids = self._lists(subscription.direction)
+        i = bisect_left(thresholds, subscription.threshold)
+        while ids[i] != subscription.subscription_id:
+            i += 1
+        del thresholds[i], ids[i]
+
+    def crossed(self, old: Optional[float], new: float) -> List[str]:
+        """Subscriptions whose condition holds for `new` but did not for `old` (None: no previous value)"""
+        # above: old <= t < new
+        start = bisect_left(self.above, old) if old is not None else 0
+        end = bisect_left(self.above, new)
+        ids = self.above_ids[start:end] if start < end else []
+
+        # below: new < t <= old
+        start = bisect_right(self.below, new)
+        end = bisect_right(self.below, old) if old is not None else len(self.below)
+        if start < end:
+            ids.extend(self.below_ids[start:end])
+        return ids
+
+    def __len__(self) -> int:
+        return len(self.above) + len(self.below)
+
+
+def _numeric(value) -> Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+class AlertIndex:
+    """Geofenced threshold subscriptions for one city, indexed by area and threshold
+
+    Geofences are resolved to the registry's areas once, at subscription
+    time. Matching a new snapshot then only visits the areas that changed,
+    and a bisect per watched field finds the thresholds crossed.
+    """
+
+    def __init__(self, registry: AreaRegistry, max_subscriptions: int = 10000):
+        self.registry = registry
+        self.max_subscriptions = max_subscriptions
+        self.subscriptions: Dict[str, Subscription] = {}
+
+        self._rules: Dict[Tuple[str, str, str], ThresholdRules] = {}
+        # Watched fields per (layer, area), so unwatched changes are skipped with one lookup
+        self._fields: Dict[Tuple[str, str], Set[str]] = {}
+        # Last value seen for each watched (layer, area, field)
+        self._values: Dict[Tuple[str, str, str], float] = {}
+
+    def add(self, subscription: Subscription, snapshot: Snapshot) -> List[Dict]:
+        """Index a subscription; returns alerts for areas already past its threshold"""
+        if len(self.subscriptions) >= self.max_subscriptions:
+            raise ValueError(f"Subscription limit ({self.max_subscriptions}) reached")
+
+        subscription.areas = tuple(area.name for area in self.registry.areas if subscription.covers(area.coordinates))
+        self.subscriptions[subscription.subscription_id] = subscription
+
+        layer = snapshot.layer(subscription.layer)
+        alerts = []
+        for area in subscription.areas:
+            key = (subscription.layer, area, subscription.field)
+            if key not in self._rules:
+                self._rules[key] = ThresholdRules()
+                self._fields.setdefault((subscription.layer, area), set()).add(subscription.field)
+                # Seed the value so the first refresh only reports real crossings
+                if layer is not None and area in layer.index:
+                    value = _numeric(layer.area_dict(layer.index[area]).get(subscription.field))
+                    if value is not None:
+                        self._values[key] = value
+            self._rules[key].add(subscription)
+
+            value = self._values.get(key)
+            if value is not None and subscription.matches(value):
+                alerts.append(self._alert(subscription, area, value, None))
+        return alerts
+
+    def remove(self, subscription_id: str) -> Optional[Subscription]:
+        subscription = self.subscriptions.pop(subscription_id, None)
+        if subscription is None:
+            return None
+
+        for area in subscription.areas:
+            key = (subscription.layer, area, subscription.field)
+            rules = self._rules[key]
+            rules.remove(subscription)
+            if not rules:
+                del self._rules[key]
+                self._values.pop(key, None)
+                fields = self._fields[(subscription.layer, area)]
+                fields.discard(subscription.field)
+                if not fields:
+                    del self._fields[(subscription.layer, area)]
+        return subscription
+
+    def count_for(self, client: str) -> int:
+        return sum(1 for subscription in self.subscriptions.values() if subscription.client == client)
+
+    def match(self, changes: List[Dict]) -> List[Dict]:
+        """Alerts for every threshold crossed by a snapshot's per-area changes (see changes.diff_snapshots)"""
+        alerts = []
+        with tracer.span("alerts.match", changes=len(changes), subscriptions=len(self.subscriptions)):
+            for change in changes:
+                if change["op"] not in ("upsert", "remove"):
+                    continue
+                fields = self._fields.get((change["layer"], change["area"]))
+                if not fields:
+                    continue
+
+                for field in fields:
+                    key = (change["layer"], change["area"], field)
+                    if change["op"] == "remove":
+                        self._values.pop(key, None)
+                        continue
+
+                    value = _numeric(change["data"].get(field))
+                    if value is None:
+                        continue
+                    old = self._values.get(key)
+                    self._values[key] = value
+                    if old == value:
+                        continue
+
+                    for subscription_id in self._rules[key].crossed(old, value):
+                        alerts.append(self._alert(self.subscriptions[subscription_id], change["area"], value, old))
+        return alerts
+
+    def _alert(self, subscription: Subscription, area: str, value: float, previous: Optional[float]) -> Dict:
+        subscription.triggered += 1
+        return {
+            "subscription_id": subscription.subscription_id,
+            "city": subscription.city,
+            "layer": subscription.layer,
+            "area": area,
+            "coordinates": self.registry.area_index[area].coordinates,
+            "field": subscription.field,
+            "direction": subscription.direction,
+            "threshold": subscription.threshold,
+            "value": value,
+            "previous": previous,
+            "triggered_at": datetime.now().isoformat()
+        }
+
+
+def parse_webhook_url(url: str) -> "httpx.URL":
+    """The webhook URL, parsed the way deliveries will send it; ValueError if it could never be delivered"""
+    import httpx
+
+    try:
+        parsed = httpx.URL(url)
+    except httpx.InvalidURL as e:
+        raise ValueError(f"webhook_url is not a valid URL: {e}")
+    if parsed.scheme not in ("http", "https") or not parsed.host:
+        raise ValueError("webhook_url must be an http(s) URL with a host")
+    return parsed
+
+
+class WebhookPolicy:
+    """Which webhook targets subscriptions may use
+
+    Hosts in `allowed_hosts` are trusted as configured, internal receivers
+    included. Any other host must resolve only to public addresses, checked
+    when subscribing and again before every delivery, so the server cannot be
+    pointed at the cache, cloud metadata or other internal services. The
+    delivery then connects to the address that was checked, so a second DNS
+    answer (rebinding) cannot redirect it.
+    """
+
+    def __init__(self, allowed_hosts: Iterable[str] = (), max_per_client: int = 20):
+        self.allowed_hosts = {host.strip().lower() for host in allowed_hosts if host.strip()}
+        self.max_per_client = max_per_client
+
+    def allowed(self, url: "httpx.URL") -> bool:
+        return url.host.lower() in self.allowed_hosts
+
+    async def check(self, url: str) -> Optional[str]:
+        """The vetted address to connect to (None for allow-listed and IP-literal hosts)
+
+        ValueError unless the URL's host is allow-listed or resolves only to public addresses.
+        """
+        parsed = parse_webhook_url(url)
+        if self.allowed(parsed):
+            return None
+        try:
+            addresses = [ipaddress.ip_address(parsed.host)]
+            literal = True
+        except ValueError:
+            try:
+                infos = await asyncio.get_running_loop().getaddrinfo(parsed.host, parsed.port, type=socket.SOCK_STREAM)
+            except OSError as e:
+                raise ValueError(f"webhook host {parsed.host} does not resolve: {e}")
+            # Drop any IPv6 scope id (fe80::1%eth0) before parsing
+            addresses = [ipaddress.ip_address(info[4][0].split("%")[0]) for info in infos]
+            literal = False
+        for address in addresses:
+            if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped is not None:
+                address = address.ipv4_mapped
+            if not address.is_global:
+                raise ValueError(f"webhook host {parsed.host} resolves to a non-public address ({address})")
+        return None if literal else str(addresses[0])
+
+
+async def post_pinned(client: "httpx.AsyncClient", url: str, payload: Dict, address: Optional[str]) -> "httpx.Response":
+    """POST to `url`, connecting to `address` when given
+
+    The request goes to the address itself, with the URL's host in the Host
+    header and as the TLS server name, so certificates are still verified
+    against the host name.
+    """
+    if address is None:
+        return await client.post(url, json=payload)
+
+    parsed = parse_webhook_url(url)
+    return await client.post(
+        parsed.copy_with(host=address), json=payload,
+        headers={"Host": parsed.netloc.decode("ascii")}, extensions={"sni_hostname": parsed.host}
+    )
+
+
+class Delivery:
+    """One webhook POST, retried with exponential backoff"""
+
+    __slots__ = ("delivery_id", "url", "payload", "status", "attempts", "next_attempt", "last_error", "created_at")
+
+    def __init__(self, url: str, payload: Dict):
+        self.delivery_id = uuid.uuid4().hex[:12]
+        self.url = url
+        self.payload = payload
+        self.status = "pending"
+        self.attempts = 0
+        self.next_attempt = time.monotonic()
+        self.last_error: Optional[str] = None
+        self.created_at = datetime.now()
+
+    def to_dict(self) -> Dict:
+        return {
+            "delivery_id": self.delivery_id,
+            "url": self.url,
+            "status": self.status,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "created_at": self.created_at.isoformat(),
+            "payload": self.payload
+        }
+
+
+class WebhookOutbox:
+    """Bounded outbox of alert deliveries, drained by one background task"""
+
+    def __init__(self, max_deliveries: int = 5000, max_attempts: int = 5, backoff_seconds: float = 2,
+                 timeout: float = 10, policy: Optional[WebhookPolicy] = None):
+        self.max_deliveries = max_deliveries
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.timeout = timeout
+        # Re-checked before each delivery, since a host's DNS can change after subscribing
+        self.policy = policy
+
+        self._deliveries: "OrderedDict[str, Delivery]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def enqueue(self, url: str, payload: Dict) -> Delivery:
+        delivery = Delivery(url, payload)
+        self._deliveries[delivery.delivery_id] = delivery
+        # Past the limit, finished deliveries go first, then the oldest pending ones
+        while len(self._deliveries) > self.max_deliveries:
+            finished = next((key for key, d in self._deliveries.items() if d.status != "pending"), None)
+            del self._deliveries[finished if finished is not None else next(iter(self._deliveries))]
+        self._wakeup.set()
+        return delivery
+
+    def pending(self) -> List[Delivery]:
+        return [d for d in self._deliveries.values() if d.status == "pending"]
+
+    async def flush(self, client: Optional["httpx.AsyncClient"] = None):
+        """Attempt every pending delivery that is due"""
+        now = time.monotonic()
+        due = [d for d in self.pending() if d.next_attempt <= now]
+        if not due:
+            return
+
+        import httpx
+
+        async with httpx.AsyncClient(timeout=self.timeout) if client is None else contextlib.nullcontext(client) as client:
+            await asyncio.gather(*(self._deliver(client, delivery) for delivery in due))
+
+    async def _deliver(self, client: "httpx.AsyncClient", delivery: Delivery):
+        delivery.attempts += 1
+        try:
+            address = await self.policy.check(delivery.url) if self.policy is not None else None
+            response = await post_pinned(client, delivery.url, delivery.payload, address)
+            if response.status_code < 300:
+                delivery.status = "delivered"
+                return
+            delivery.last_error = f"HTTP {response.status_code}"
+        except Exception as e:
+            # Anything the client raises (invalid URL, TLS, DNS) is a failed attempt, not a dead outbox
+            delivery.last_error = f"{type(e).__name__}: {e}"
+
+        if delivery.attempts >= self.max_attempts:
+            delivery.status = "failed"
+            print(f"❌ Webhook delivery {delivery.delivery_id} to {delivery.url} failed: {delivery.last_error}")
+        else:
+            delivery.next_attempt = time.monotonic() + self.backoff_seconds * 2 ** (delivery.attempts - 1)
+
+    async def run(self):
+        # httpx and the client's TLS setup are deferred until there is something to deliver
+        await self._wakeup.wait()
+
+        import httpx
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            while True:
+                try:
+                    await self.flush(client)
+
+                    pending = self.pending()
+                    timeout = max(0.0, min(d.next_attempt for d in pending) - time.monotonic()) if pending else None
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                except Exception as e:
+                    # The task serves every city for the life of the process; never let it exit
+                    print(f"❌ Webhook outbox error: {type(e).__name__}: {e}")
+                    await asyncio.sleep(self.backoff_seconds)
+
+    def start(self):
+        # Bind the wakeup event to the serving loop
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def stats(self) -> Dict:
+        counts: Dict[str, int] = {}
+        for delivery in self._deliveries.values():
+            counts[delivery.status] = counts.get(delivery.status, 0) + 1
+        return {"deliveries": len(self._deliveries), "max_deliveries": self.max_deliveries, **counts}
+
+    def recent(self, limit: int = 50) -> List[Dict]:
+        return [d.to_dict() for d in list(self._deliveries.values())[-limit:]]
+
@@ -0,0 +1,454 @@
+"""Byte caches shared by snapshots, rendered bodies and upstream responses.
+
+Backends share one async interface (get/set/delete with per-entry TTLs):
+
+- MemoryCache: in-process LRU bounded by size
+- DiskCache: one file per key in a directory, survives restarts
+- RedisCache: any server speaking the Redis protocol (RESP), shared by replicas
+
+TieredCache puts an in-process L1 in front of a shared L2. Keys are built
+with cache_key(), which prefixes a layout version, so a release that changes
+what is stored never reads entries written by an older one.
+
+CACHE_BACKEND picks the L2 (memory: none, disk or redis); see load_cache().
+A cache that fails is treated as a miss; serving never depends on it.
+"""
+import asyncio
+import hashlib
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from . import metrics
+
+# Bump when the layout of any cached value changes
+KEY_PREFIX = "civic:v1"
+
+
+def cache_key(*parts) -> str:
+    return ":".join((KEY_PREFIX,) + tuple(str(part) for part in parts))
+
+
+class CacheBackend(ABC):
+    """Interface of every cache backend; values are bytes, ttl is in seconds (None: no expiry)"""
+
+    name = "base"
+    # Whether other processes see what this backend stores
+    shared = False
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        pass
+
+    @abstractmethod
+    async def delete(self, key: str):
+        pass
+
+    async def shared_get(self, key: str) -> Optional[bytes]:
+        """Read what other processes see, for coordination keys; the same as get() unless tiered"""
+        return await self.get(key)
+
+    async def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        """Store `value` only if `key` is absent; True when this call stored it
+
+        Shared backends make the check and the write one atomic step, so of
+        several processes adding the same key exactly one wins.
+        """
+        if await self.get(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def close(self):
+        pass
+
+    def _count(self, value: Optional[bytes]) -> Optional[bytes]:
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        metrics.CACHE_REQUESTS.labels(self.name, "hit" if value is not None else "miss").inc()
+        return value
+
+    def stats(self) -> Dict:
+        return {"backend": self.name, "hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU, bounded by the total size of its values"""
+
+    name = "memory"
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, clock=time.monotonic):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.size = 0
+        self._entries: "OrderedDict[str, Tuple[Optional[float], bytes]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is not None and entry[0] <= self.clock():
+            self._remove(key)
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return self._count(entry[1] if entry is not None else None)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        if len(value) > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = (self.clock() + ttl if ttl is not None else None, value)
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    async def delete(self, key: str):
+        self._remove(key)
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def stats(self) -> Dict:
+        return {**super().stats(), "entries": len(self._entries), "bytes": self.size, "max_bytes": self.max_bytes}
+
+
+class DiskCache(CacheBackend):
+    """One file per key (8-byte expiry header, then the value); file I/O runs on worker threads"""
+
+    name = "disk"
+    shared = True
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024, prune_every: int = 64):
+        super().__init__()
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # Expired entries and the size bound are enforced every `prune_every` writes
+        self.prune_every = prune_every
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest())
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                blob = f.read()
+        except FileNotFoundError:
+            return None
+        expires_ms = int.from_bytes(blob[:8], "big")
+        if expires_ms and expires_ms <= time.time() * 1000:
+            return None
+        return blob[8:]
+
+    def _write(self, key: str, value: bytes, ttl: Optional[float], exclusive: bool = False) -> bool:
+        expires_ms = int((time.time() + ttl) * 1000) if ttl is not None else 0
+        path = self._path(key)
+        # Readers (other processes included) see the old file or the new one, never a partial write
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(expires_ms.to_bytes(8, "big"))
+            f.write(value)
+        if not exclusive:
+            os.replace(tmp_path, path)
+            return True
+        try:
+            # link() fails if the key exists, which makes it the atomic check-and-write
+            if self._read(key) is None:
+                self._unlink(path)
+            os.link(tmp_path, path)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.unlink(tmp_path)
+
+    @staticmethod
+    def _unlink(path: str):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def prune(self):
+        """Drop expired entries, then the least recently written ones beyond max_bytes"""
+        now_ms = time.time() * 1000
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(".tmp-"):
+                continue
+            try:
+                with open(entry.path, "rb") as f:
+                    expires_ms = int.from_bytes(f.read(8), "big")
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if expires_ms and expires_ms <= now_ms:
+                os.unlink(entry.path)
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            value = await asyncio.to_thread(self._read, key)
+        except OSError as e:
+            self.errors += 1
+            print(f"⚠️ Disk cache read failed: {e}")
+            value = None
+        return self._count(value)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self._writes += 1
+        prune = self._writes % self.prune_every == 0
+        try:
+            await asyncio.to_thread(self._write, key, value, ttl)
+            if prune:
+                await asyncio.to_thread(self.prune)
+        except OSError as e:
+            self.errors += 1
+            print(f"⚠️ Disk cache write failed: {e}")
+
+    async def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        try:
+            return await asyncio.to_thread(self._write, key, value, ttl, True)
+        except OSError as e:
+            self.errors += 1
+            print(f"⚠️ Disk cache write failed: {e}")
+            return False
+
+    async def delete(self, key: str):
+        try:
+            await asyncio.to_thread(os.unlink, self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class RedisError(Exception):
+    """Error reply from the server"""
+
+
+class RedisCache(CacheBackend):
+    """Minimal asyncio client for the Redis protocol (RESP2): GET, SET with PX/NX, DEL
+
+    Connections are pooled per event loop. After a connection or protocol
+    failure the backend is skipped for `retry_after` seconds, so an
+    unreachable server costs one timeout, not one per request.
+    """
+
+    name = "redis"
+    shared = True
+
+    def __init__(self, url: str = "redis://127.0.0.1:6379/0", timeout: float = 0.5, max_idle: int = 8,
+                 retry_after: float = 5):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        # A username selects an ACL user (Redis 6+); without one AUTH is for the default user
+        self.username = parsed.username or None
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.retry_after = retry_after
+
+        self._idle: List[Tuple[asyncio.AbstractEventLoop, asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._down_until = 0.0
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        return b"".join(parts)
+
+    @classmethod
+    async def _read_reply(cls, reader: asyncio.StreamReader):
+        line = await reader.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("connection closed by server")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload
+        if kind == b"-":
+            raise RedisError(payload.decode(errors="replace"))
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length < 0:
+                return None
+            data = await reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            return None if length < 0 else [await cls._read_reply(reader) for _ in range(length)]
+        raise ConnectionError(f"unexpected reply type {kind!r}")
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            credentials = (self.username, self.password) if self.username else (self.password,)
+            writer.write(self._encode("AUTH", *credentials))
+            await self._read_reply(reader)
+        if self.db:
+            writer.write(self._encode("SELECT", self.db))
+            await self._read_reply(reader)
+        return reader, writer
+
+    async def _call(self, *args):
+        loop = asyncio.get_running_loop()
+        # Connections belong to the loop that opened them
+        while self._idle:
+            conn_loop, reader, writer = self._idle.pop()
+            if conn_loop is loop:
+                break
+            writer.close()
+        else:
+            reader, writer = await self._connect()
+
+        try:
+            writer.write(self._encode(*args))
+            reply = await self._read_reply(reader)
+        except BaseException:
+            writer.close()
+            raise
+
+        if len(self._idle) < self.max_idle:
+            self._idle.append((loop, reader, writer))
+        else:
+            writer.close()
+        return reply
+
+    async def execute(self, *args):
+        """Send one command; None when the server is unavailable (the failure is counted and logged)"""
+        if time.monotonic() < self._down_until:
+            return None
+        try:
+            return await asyncio.wait_for(self._call(*args), self.timeout)
+        except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError, RedisError) as e:
+            self.errors += 1
+            self._down_until = time.monotonic() + self.retry_after
+            print(f"⚠️ Redis cache {self.host}:{self.port} unavailable for {self.retry_after}s: {type(e).__name__}: {e}")
+            return None
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._count(await self.execute("GET", key))
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        if ttl is not None:
+            await self.execute("SET", key, value, "PX", max(1, int(ttl * 1000)))
+        else:
+            await self.execute("SET", key, value)
+
+    async def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        expiry = ("PX", max(1, int(ttl * 1000))) if ttl is not None else ()
+        reply = await self.execute("SET", key, value, *expiry, "NX")
+        # While the server is unreachable there is nobody to lose to
+        return reply is not None or time.monotonic() < self._down_until
+
+    async def delete(self, key: str):
+        await self.execute("DEL", key)
+
+    async def close(self):
+        while self._idle:
+            _, _, writer = self._idle.pop()
+            writer.close()
+
+    def stats(self) -> Dict:
+        return {**super().stats(), "server": f"{self.host}:{self.port}/{self.db}", "idle_connections": len(self._idle)}
+
+
+class TieredCache(CacheBackend):
+    """In-process L1 in front of a shared L2; L2 hits are copied into L1 for at most `promote_ttl` seconds"""
+
+    name = "tiered"
+
+    def __init__(self, l1: CacheBackend, l2: CacheBackend, promote_ttl: float = 60):
+        super().__init__()
+        self.l1 = l1
+        self.l2 = l2
+        self.shared = l2.shared
+        # L2 does not report remaining TTLs, so promoted copies are kept briefly
+        self.promote_ttl = promote_ttl
+
+    async def get(self, key: str) -> Optional[bytes]:
+        value = await self.l1.get(key)
+        if value is None:
+            value = await self.l2.get(key)
+            if value is not None:
+                await self.l1.set(key, value, self.promote_ttl)
+        return value
+
+    async def shared_get(self, key: str) -> Optional[bytes]:
+        # L1 may still hold what this process wrote or promoted before another replica replaced it
+        return await self.l2.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        await self.l1.set(key, value, ttl)
+        await self.l2.set(key, value, ttl)
+
+    async def add(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        # Decided by the shared tier; L1 may not have seen what other processes stored
+        if not await self.l2.add(key, value, ttl):
+            return False
+        await self.l1.set(key, value, ttl)
+        return True
+
+    async def delete(self, key: str):
+        await self.l1.delete(key)
+        await self.l2.delete(key)
+
+    async def close(self):
+        await self.l1.close()
+        await self.l2.close()
+
+    def stats(self) -> Dict:
+        return {"backend": self.name, "l1": self.l1.stats(), "l2": self.l2.stats()}
+
+
+def load_cache(backend: Optional[str] = None) -> CacheBackend:
+    """Cache configured by CACHE_BACKEND
+
+    memory (default) is a MemoryCache of CACHE_MEMORY_MB; disk and redis put
+    that in front of a DiskCache in CACHE_DIR or a RedisCache at CACHE_URL.
+    """
+    backend = (backend or os.getenv("CACHE_BACKEND", "memory")).lower()
+    memory = MemoryCache(max_bytes=int(float(os.getenv("CACHE_MEMORY_MB", "64")) * 1024 * 1024))
+
+    if backend == "memory":
+        return memory
+    if backend == "disk":
+        directory = os.getenv("CACHE_DIR", os.path.join(tempfile.gettempdir(), "civic-pulse-cache"))
+        return TieredCache(memory, DiskCache(directory, max_bytes=int(float(os.getenv("CACHE_DISK_MB", "512")) * 1024 * 1024)))
+    if backend == "redis":
+        return TieredCache(memory, RedisCache(os.getenv("CACHE_URL", "redis://127.0.0.1:6379/0")))
+    raise ValueError(f"Unknown cache backend '{backend}'; available: memory, disk, redis")
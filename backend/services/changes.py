@@ -0,0 +1,112 @@
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from models.snapshot import Snapshot
+
+
+def diff_snapshots(old: Snapshot, new: Snapshot) -> List[Dict]:
+    """Per-area changes that turn `old`'s document into `new`'s
+
+    Ops: upsert/remove an area of a layer, replace a layer's metadata,
+    remove a whole layer, and set/unset a top-level key.
+    """
+    changes = []
+
+    for name, layer in new.layers.items():
+        old_layer = old.layers.get(name)
+
+        if old_layer is None or old_layer.meta != layer.meta:
+            changes.append({"op": "meta", "layer": name, "data": layer.meta})
+
+        for i, area in enumerate(layer.area_names):
+            if old_layer is not None:
+                previous = old_layer.get(area)
+                # Records are frozen dataclasses, so equality is a field-by-field compare
+                if previous is not None and previous == (layer.records[i], layer.coordinates(i)):
+                    continue
+            changes.append({"op": "upsert", "layer": name, "area": area, "data": layer.area_dict(i)})
+
+        if old_layer is not None:
+            for area in old_layer.area_names:
+                if area not in layer.index:
+                    changes.append({"op": "remove", "layer": name, "area": area})
+
+    for name in old.layers:
+        if name not in new.layers:
+            changes.append({"op": "remove_layer", "layer": name})
+
+    new_keys = {**new.extras, "data_sources": new.data_sources}
+    old_keys = {**old.extras, "data_sources": old.data_sources}
+    for key, value in new_keys.items():
+        if old_keys.get(key) != value or key not in old_keys:
+            changes.append({"op": "set", "key": key, "data": value})
+    for key in old_keys:
+        if key not in new_keys:
+            changes.append({"op": "unset", "key": key})
+
+    return changes
+
+
+def _change_key(change: Dict) -> Tuple:
+    # Later changes to the same target replace earlier ones
+    if "key" in change:
+        return ("key", change["key"])
+    if change["op"] in ("meta", "remove_layer"):
+        return ("layer", change["layer"], change["op"] == "meta")
+    return ("area", change["layer"], change["area"])
+
+
+class ChangeLog:
+    """Bounded ring buffer of the change sets between consecutive snapshot versions"""
+
+    def __init__(self, max_versions: int = 96):
+        # (base version, version, changes from base to version)
+        self._entries: "deque[Tuple[int, int, List[Dict]]]" = deque(maxlen=max_versions)
+
+    def record(self, version: int, changes: List[Dict], base: Optional[int] = None):
+        """Record the changes from `base` (default: the previous version) to `version`
+
+        Versions adopted from another process can skip numbers; a change set
+        that does not start at the last recorded version restarts the log, so
+        clients holding a skipped version get a full snapshot.
+        """
+        base = version - 1 if base is None else base
+        if self._entries and self._entries[-1][1] != base:
+            self._entries.clear()
+        self._entries.append((base, version, changes))
+
+    @property
+    def oldest(self) -> Optional[int]:
+        """Oldest version a client can still sync from"""
+        if not self._entries:
+            return None
+        return self._entries[0][0]
+
+    def since(self, version: int, current: int) -> Optional[List[Dict]]:
+        """Collapsed changes from `version` to `current`, or None when `version` is out of range"""
+        if version == current:
+            return []
+
+        oldest = self.oldest
+        if oldest is None or not oldest <= version < current:
+            return None
+        if version != oldest and not any(entry_version == version for _, entry_version, _ in self._entries):
+            return None
+
+        merged = {}
+        for _, entry_version, changes in self._entries:
+            if entry_version <= version:
+                continue
+            for change in changes:
+                key = _change_key(change)
+                if key[0] == "layer" and not key[2]:
+                    # A removed layer drops any earlier area changes for it
+                    merged = {k: v for k, v in merged.items() if k[:2] != ("area", change["layer"])}
+                    merged.pop(("layer", change["layer"], True), None)
+                merged.pop(key, None)
+                merged[key] = change
+
+        return list(merged.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,336 @@
+import asyncio
+import importlib
+import os
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import orjson
+
+from models.snapshot import PublishedSnapshot, Snapshot
+from scrapers.real_bangalore_apis import RealBangaloreAPIs
+from scrapers.registry import DATA_DIR, AreaRegistry, available_cities, load_registry
+
+from . import metrics
+from .alerts import AlertIndex, WebhookOutbox
+from .cache import CacheBackend, MemoryCache, cache_key, load_cache
+from .changes import ChangeLog, diff_snapshots
+from .compression import PrecompressedBody
+from .incidents import IncidentIngestor, IncidentStore, default_incident_db
+from .offload import OffloadRejected, RenderPool
+from .refresh import RefreshService
+from .render_cache import RenderCache
+from .responses import dumps
+from .tracing import tracer
+
+# Loaded on first use, so the server is up before them; the collection loop loads them on a worker thread
+DEFERRED_IMPORTS = ("httpx", "numpy", "analytics.aqi", "analytics.heatmap")
+
+
+def preload_modules():
+    for name in DEFERRED_IMPORTS:
+        importlib.import_module(name)
+
+
+class CityRuntime:
+    """Snapshot, refresh scheduler and collector for one city"""
+
+    def __init__(self, registry: AreaRegistry, refresh_interval: float = 900, debounce_seconds: float = 60,
+                 changelog_versions: int = 96, export_cache_entries: int = 256, max_subscriptions: int = 10000,
+                 incident_batch_size: int = 5000, cache: Optional[CacheBackend] = None,
+                 upstream_cache_seconds: float = 300, snapshot_cache_seconds: Optional[float] = None):
+        self.registry = registry
+        self.slug = registry.slug
+        self.display_name = registry.display_name
+
+        # Collector for this city's registry
+        self.apis = RealBangaloreAPIs(registry)
+
+        # Snapshots, rendered bodies and upstream responses, shared with other replicas when the backend is
+        self.cache = cache or MemoryCache()
+        self.apis.cache = self.cache
+        self.apis.upstream_ttl = upstream_cache_seconds
+        self.snapshot_ttl = snapshot_cache_seconds if snapshot_cache_seconds is not None else 2 * refresh_interval
+
+        # The latest data with its version and fetch time; replaced as one reference, never mutated.
+        # Versions start at boot time (ms), so versions held by clients from before a restart are never reused
+        self.published = PublishedSnapshot(Snapshot.from_dict({}), int(time.time() * 1000), None, ())
+        self.changelog = ChangeLog(changelog_versions)
+
+        # Bodies of the snapshot-backed endpoints, rendered and compressed once per published snapshot
+        self.renderers: Dict[str, Callable[["CityRuntime", PublishedSnapshot], Optional[bytes]]] = {}
+        # Filtered exports, rendered on demand and reused until the next snapshot
+        self.export_cache = RenderCache("exports", export_cache_entries)
+        # Worker threads for rendering and snapshot building, shared by every city of the process
+        self.render_pool: Optional[RenderPool] = None
+
+        # Geofenced threshold subscriptions, matched against each refresh's changes
+        self.alerts = AlertIndex(registry, max_subscriptions)
+        self.outbox: Optional[WebhookOutbox] = None
+
+        # Ingested FIRs; the crime collector reads each area's newest ones on refresh
+        self.incidents = IncidentIngestor(IncidentStore(default_incident_db(self.slug)), registry, incident_batch_size)
+        self.apis.govt_apis.incident_store = self.incidents.store
+
+        self.refresh_interval = refresh_interval
+        # All refreshes (background loop, manual refresh, empty-cache fills) share one fetch per window
+        self.refresh_service = RefreshService(self.refresh, debounce_seconds=debounce_seconds)
+        self._task: Optional[asyncio.Task] = None
+
+        metrics.set_snapshot_age_source(
+            self.slug, lambda: self.published.fetched_at.timestamp() if self.published.fetched_at else 0
+        )
+
+    async def refresh(self) -> Dict:
+        """Publish a new snapshot: another replica's when it is newer than ours, otherwise fetch all real data"""
+        # Refreshes start their own trace even when triggered from a request
+        with tracer.span("refresh_cycle", root=True, city=self.slug):
+            previous = self.published
+            latest = await self._shared_latest()
+
+            adopted = await self._adopt(latest, previous) if latest is not None else None
+            if adopted is not None:
+                version, fetched_at, blob = adopted
+                print(f"♻️ Adopted {self.registry.city} v{version} from the shared cache")
+                snapshot, changes, snapshot_bytes = await self.offload("snapshot.build", self._load_snapshot, blob, previous, bounded=False)
+                self.apis.observe_shared(snapshot)
+            else:
+                print(f"🔄 Fetching REAL {self.registry.city} data from actual APIs...")
+                start = time.perf_counter()
+                try:
+                    real_data = await self.apis.fetch_real_bangalore_data()
+                except Exception:
+                    metrics.REFRESH_TOTAL.labels(self.slug, "error").inc()
+                    raise
+                finally:
+                    metrics.REFRESH_DURATION.labels(self.slug).observe(time.perf_counter() - start)
+
+                # Building and diffing scale with the city's size, so they run off the event loop too
+                snapshot, changes, snapshot_bytes = await self.offload("snapshot.build", self._build_snapshot, real_data, previous, bounded=False)
+                # Numbered after anything already shared, so replicas that adopt it keep moving forward
+                version = max(previous.version, latest["version"] if latest is not None else 0) + 1
+                fetched_at = datetime.now()
+                if self.cache.shared:
+                    version = await self._claim(version, snapshot_bytes)
+
+            published = PublishedSnapshot(snapshot, version, fetched_at, tuple(self.apis.bangalore_stations))
+            self.changelog.record(published.version, changes, base=previous.version)
+            self.published = published
+            self.export_cache.invalidate(published.version)
+
+            if adopted is None and self.cache.shared:
+                await self._share(published)
+
+            alerts = self.alerts.match(changes)
+            self.deliver_alerts(alerts)
+
+            # Snapshot gauges are updated once per refresh, not per scrape
+            metrics.REFRESH_TOTAL.labels(self.slug, "success").inc()
+            metrics.SNAPSHOT_BYTES.labels(self.slug).set(len(snapshot_bytes))
+            for layer in snapshot.layers.values():
+                metrics.SNAPSHOT_AREAS.labels(self.slug, layer.name).set(len(layer))
+
+        air_quality = snapshot.layer("air_quality")
+        summary = {
+            "timestamp": published.last_updated,
+            "version": published.version,
+            "changes": len(changes),
+            "alerts": len(alerts),
+            "active_air_quality_stations": air_quality.meta.get("total_stations_active", 0) if air_quality else 0
+        }
+
+        # Compression at the best ratio is CPU-heavy, so it runs off the event loop
+        await self.prerender(published)
+        return summary
+
+    async def _shared_latest(self) -> Optional[Dict]:
+        """Version and fetch time of the newest snapshot any replica shared for this city"""
+        if not self.cache.shared:
+            return None
+        # Always from the shared tier: a stale pointer would number a fetch after a version another replica already took
+        pointer = await self.cache.shared_get(cache_key("snapshot", self.slug, "latest"))
+        return orjson.loads(pointer) if pointer is not None else None
+
+    async def _adopt(self, latest: Dict, previous: PublishedSnapshot) -> Optional[Tuple[int, datetime, bytes]]:
+        """(version, fetched_at, snapshot document) of a shared snapshot worth publishing instead of fetching"""
+        fetched_at = datetime.fromisoformat(latest["fetched_at"])
+        if previous.snapshot and latest["version"] <= previous.version:
+            return None
+        if (datetime.now() - fetched_at).total_seconds() >= self.refresh_interval:
+            return None
+        blob = await self.cache.get(cache_key("snapshot", self.slug, f"v{latest['version']}"))
+        if blob is None:
+            return None
+        return latest["version"], fetched_at, blob
+
+    async def _claim(self, version: int, snapshot_bytes: bytes) -> int:
+        """Store the snapshot document under the first free version from `version` on, and return that version
+
+        Replicas that both missed the shared snapshot number their fetches
+        alike; only one can add a version's key, the other moves past it.
+        """
+        while not await self.cache.add(cache_key("snapshot", self.slug, f"v{version}"), snapshot_bytes, self.snapshot_ttl):
+            version += 1
+        return version
+
+    async def _share(self, published: PublishedSnapshot):
+        """Point `latest` at the claimed snapshot document"""
+        await self.cache.set(cache_key("snapshot", self.slug, "latest"), orjson.dumps({
+            "version": published.version,
+            "fetched_at": published.last_updated
+        }), self.snapshot_ttl)
+
+    def deliver_alerts(self, alerts: List[Dict]):
+        """Queue a webhook delivery per alert"""
+        if self.outbox is None:
+            return
+        for alert in alerts:
+            subscription = self.alerts.subscriptions[alert["subscription_id"]]
+            self.outbox.enqueue(subscription.webhook_url, {**alert, "snapshot_version": self.published.version})
+
+    @staticmethod
+    def _build_snapshot(real_data: Dict, previous: PublishedSnapshot):
+        with tracer.span("snapshot.build"):
+            snapshot = Snapshot.from_dict(real_data)
+        with tracer.span("snapshot.diff"):
+            changes = diff_snapshots(previous.snapshot, snapshot)
+        return snapshot, changes, dumps(snapshot.to_dict())
+
+    @staticmethod
+    def _load_snapshot(blob: bytes, previous: PublishedSnapshot):
+        with tracer.span("snapshot.load", size=len(blob)):
+            real_data = orjson.loads(blob)
+        snapshot, changes, _ = CityRuntime._build_snapshot(real_data, previous)
+        return snapshot, changes, blob
+
+    async def offload(self, task: str, fn: Callable, *args, bounded: bool = True):
+        """Run CPU-heavy work on the shared render pool (a plain thread when none is attached)"""
+        if self.render_pool is None:
+            return await asyncio.to_thread(fn, *args)
+        return await self.render_pool.run(task, fn, *args, bounded=bounded)
+
+    async def prerender(self, published: PublishedSnapshot):
+        """Render every registered endpoint body, with its compressed variants, for one published snapshot"""
+        with tracer.span("snapshot.prerender", city=self.slug):
+            try:
+                for name in self.renderers:
+                    await self.rendered(published, name)
+            except OffloadRejected:
+                # Requests render what they need on demand
+                print(f"⚠️ Render pool busy, skipped prerendering {self.slug} v{published.version}")
+
+    async def rendered(self, published: PublishedSnapshot, name: str) -> Optional[PrecompressedBody]:
+        """A registered renderer's body for `published` (None when it has nothing to render)
+
+        Built once per snapshot: from this process's views, then the shared
+        cache (another replica may have rendered it), then off the loop.
+        """
+        if name in published.views:
+            return published.views[name]
+
+        if not self.cache.shared:
+            return await self.offload(name, published.view, name, lambda p: self._render(p, name))
+
+        key = self._render_key(published, name)
+        blob = await self.cache.get(key)
+        if blob is not None:
+            return published.view(name, lambda p: PrecompressedBody.from_bytes(blob) if blob else None)
+
+        body = await self.offload(name, published.view, name, lambda p: self._render(p, name))
+        # An empty blob records that the renderer had nothing to render
+        await self.cache.set(key, body.to_bytes() if body is not None else b"", self.snapshot_ttl)
+        return body
+
+    def _render_key(self, published: PublishedSnapshot, name: str) -> str:
+        # Replicas serving the same shared snapshot agree on version and fetch time
+        fetched_ms = int(published.fetched_at.timestamp() * 1000) if published.fetched_at else 0
+        return cache_key("render", self.slug, f"v{published.version}", fetched_ms, name)
+
+    def _render(self, published: PublishedSnapshot, name: str) -> Optional[PrecompressedBody]:
+        body = self.renderers[name](self, published)
+        return PrecompressedBody(body) if body is not None else None
+
+    async def ensure_published(self) -> PublishedSnapshot:
+        """Return the published snapshot, populating it on first use (merged with any refresh already running)"""
+        published = self.published
+        if published.snapshot:
+            metrics.CACHE_REQUESTS.labels("snapshot", "hit").inc()
+            return published
+
+        metrics.CACHE_REQUESTS.labels("snapshot", "miss").inc()
+        await self.refresh_service.run()
+        return self.published
+
+    @property
+    def ready(self) -> bool:
+        """Whether a snapshot has been published; until then requests wait for the first refresh"""
+        return bool(self.published.snapshot)
+
+    async def run_collection_loop(self):
+        # Imports take hundreds of ms; on the loop they would stall every request in the meantime
+        await asyncio.to_thread(preload_modules)
+
+        while True:
+            job = await self.refresh_service.run()
+
+            if job.status == "completed":
+                print(f"✅ Updated REAL {self.registry.city} data - Air quality from {job.result['active_air_quality_stations']} stations")
+            else:
+                print(f"❌ Background collection error ({self.slug}): {job.error}")
+
+            # Wait before next fetch (15 minutes by default)
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        self.incidents.start()
+        self._task = asyncio.create_task(self.run_collection_loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        self.incidents.stop()
+
+
+def load_city_runtimes(cities: Optional[List[str]] = None, data_dir: Optional[str] = None,
+                       cache: Optional[CacheBackend] = None) -> Dict[str, CityRuntime]:
+    """Build a runtime for each city this process serves
+
+    CITIES (comma-separated slugs) assigns a subset of the registries in
+    REGISTRY_DIR to this process, so cities can be split across workers or
+    nodes with a path-based proxy in front; by default every registry is served.
+    AREA_REGISTRY_PATH without CITIES serves just that one registry file.
+    Every runtime shares `cache` (by default the one CACHE_BACKEND configures).
+    """
+    settings = {
+        "refresh_interval": float(os.getenv("REFRESH_INTERVAL_SECONDS", "900")),
+        "debounce_seconds": float(os.getenv("REFRESH_DEBOUNCE_SECONDS", "60")),
+        "changelog_versions": int(os.getenv("CHANGELOG_MAX_VERSIONS", "96")),
+        "export_cache_entries": int(os.getenv("EXPORT_CACHE_ENTRIES", "256")),
+        "max_subscriptions": int(os.getenv("ALERT_MAX_SUBSCRIPTIONS", "10000")),
+        "incident_batch_size": int(os.getenv("INCIDENT_BATCH_SIZE", "5000")),
+        "upstream_cache_seconds": float(os.getenv("UPSTREAM_CACHE_SECONDS", "300")),
+        "cache": cache or load_cache()
+    }
+    if os.getenv("SNAPSHOT_CACHE_SECONDS"):
+        settings["snapshot_cache_seconds"] = float(os.getenv("SNAPSHOT_CACHE_SECONDS"))
+
+    if cities is None and data_dir is None and os.getenv("AREA_REGISTRY_PATH") and not os.getenv("CITIES"):
+        runtime = CityRuntime(load_registry(), **settings)
+        return {runtime.slug: runtime}
+
+    data_dir = data_dir or os.getenv("REGISTRY_DIR", DATA_DIR)
+    registries = available_cities(data_dir)
+
+    if cities is None:
+        configured = os.getenv("CITIES", "")
+        cities = [city.strip() for city in configured.split(",") if city.strip()] or list(registries)
+
+    unknown = [city for city in cities if city not in registries]
+    if unknown:
+        raise ValueError(f"No registry file for cities: {', '.join(unknown)}")
+
+    runtimes = {}
+    for city in cities:
+        runtime = CityRuntime(load_registry(registries[city]), **settings)
+        runtimes[runtime.slug] = runtime
+    return runtimes
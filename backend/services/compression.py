@@ -0,0 +1,222 @@
+import gzip
+import zlib
+from typing import Awaitable, Callable, Dict, Optional
+
+import brotli
+from fastapi import Request
+from fastapi.responses import Response
+
+from .tracing import tracer
+
+# Preference order when the client accepts several encodings equally
+ENCODINGS = ("br", "gzip")
+
+# Per-request compression trades ratio for latency; precompressed bodies are built once, so use the best ratio
+DYNAMIC_LEVELS = {"br": 4, "gzip": 6}
+PRECOMPRESSED_LEVELS = {"br": 11, "gzip": 9}
+
+MINIMUM_SIZE = 500
+# Larger bodies are compressed on a worker thread (zlib and brotli release the GIL while they work)
+OFFLOAD_SIZE = 64 * 1024
+
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/geo+json", "application/javascript", "image/svg+xml")
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header (q-values respected), or None for identity"""
+    if not accept_encoding:
+        return None
+
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, *params = part.split(";")
+        name = name.strip().lower()
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+
+    best = None
+    best_q = 0.0
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    with tracer.span("response.compress", encoding=encoding, size=len(body)):
+        if encoding == "br":
+            return brotli.compress(body, quality=DYNAMIC_LEVELS["br"] if level is None else level)
+        return gzip.compress(body, compresslevel=DYNAMIC_LEVELS["gzip"] if level is None else level, mtime=0)
+
+
+class PrecompressedBody:
+    """A rendered response body with its gzip and brotli encodings, built once and served as-is"""
+
+    __slots__ = ("body", "variants")
+
+    def __init__(self, body: bytes, precompress: bool = True):
+        self.body = body
+        self.variants: Dict[str, bytes] = {}
+        if precompress and len(body) >= MINIMUM_SIZE:
+            for encoding in ENCODINGS:
+                self.variants[encoding] = compress(body, encoding, PRECOMPRESSED_LEVELS[encoding])
+
+    def encoded(self, encoding: Optional[str]):
+        """(body, content-encoding) for the negotiated encoding; identity when there is no variant"""
+        if encoding is not None and encoding in self.variants:
+            return self.variants[encoding], encoding
+        return self.body, None
+
+    def to_bytes(self) -> bytes:
+        """Body and variants as one blob for a byte cache: a length-prefixed header of sizes, then the payloads"""
+        parts = [("identity", self.body)] + list(self.variants.items())
+        header = ",".join(f"{name}={len(payload)}" for name, payload in parts).encode()
+        return len(header).to_bytes(4, "big") + header + b"".join(payload for _, payload in parts)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "PrecompressedBody":
+        header_end = 4 + int.from_bytes(blob[:4], "big")
+        body = cls.__new__(cls)
+        body.variants = {}
+        offset = header_end
+        for part in blob[4:header_end].decode().split(","):
+            name, _, size = part.partition("=")
+            payload = blob[offset:offset + int(size)]
+            offset += int(size)
+            if name == "identity":
+                body.body = payload
+            else:
+                body.variants[name] = payload
+        return body
+
+
+def precompressed_response(request: Request, body: PrecompressedBody, media_type: str,
+                           headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serve the stored variant matching the request's Accept-Encoding, without compressing anything"""
+    content, encoding = body.encoded(negotiate(request.headers.get("accept-encoding")))
+
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content, media_type=media_type, headers=headers)
+
+
+def _is_compressible(headers: Dict[bytes, bytes]) -> bool:
+    # Byte ranges refer to the identity body, so ranged files (export downloads) are sent as-is
+    if b"content-encoding" in headers or b"accept-ranges" in headers or b"content-range" in headers:
+        return False
+    content_type = headers.get(b"content-type", b"").decode("latin-1")
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=DYNAMIC_LEVELS["br"])
+            self._zlib = None
+        else:
+            self._brotli = None
+            # wbits=31 writes a gzip header and trailer
+            self._zlib = zlib.compressobj(DYNAMIC_LEVELS["gzip"], zlib.DEFLATED, 31)
+
+    def process(self, chunk: bytes) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(chunk) + self._brotli.flush()
+        return self._zlib.compress(chunk) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """ASGI middleware negotiating gzip/brotli for compressible responses
+
+    Responses that already carry a Content-Encoding (precompressed snapshot
+    variants) are passed through untouched. Whole bodies of at least
+    `offload_size` bytes are compressed through `offload(task, fn, *args)`
+    (e.g. a RenderPool's run) instead of on the event loop.
+    """
+
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE, offload_size: int = OFFLOAD_SIZE,
+                 offload: Optional[Callable[..., Awaitable[bytes]]] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.offload = offload
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = dict(scope["headers"])
+        encoding = negotiate(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_StreamCompressor] = None
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor
+
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                # First body chunk: decide whether to compress this response
+                headers = dict(start_message["headers"])
+                start, start_message = start_message, None
+
+                if not _is_compressible(headers) or (not more_body and len(body) < self.minimum_size):
+                    await send(start)
+                    await send(message)
+                    return
+
+                raw_headers = [(k, v) for k, v in start["headers"] if k not in (b"content-length", b"vary")]
+                vary = headers.get(b"vary")
+                raw_headers.append((b"vary", vary + b", Accept-Encoding" if vary else b"Accept-Encoding"))
+                raw_headers.append((b"content-encoding", encoding.encode()))
+
+                if not more_body:
+                    if self.offload is not None and len(body) >= self.offload_size:
+                        body = await self.offload("compress", compress, body, encoding)
+                    else:
+                        body = compress(body, encoding)
+                    raw_headers.append((b"content-length", str(len(body)).encode()))
+                    await send({**start, "headers": raw_headers})
+                    await send({"type": "http.response.body", "body": body})
+                    return
+
+                compressor = _StreamCompressor(encoding)
+                await send({**start, "headers": raw_headers})
+
+            if compressor is None:
+                await send(message)
+                return
+
+            data = compressor.process(body) if body else b""
+            if not more_body:
+                data += compressor.finish()
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
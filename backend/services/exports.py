@@ -0,0 +1,251 @@
+import asyncio
+import csv
+import hashlib
+import os
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import orjson
+
+# Field holding each row's date, per layer; rows are filtered on its YYYY-MM-DD prefix
+TIMESTAMP_FIELDS = {
+    "air_quality": "last_update",
+    "crime_stats": "when",
+    "water_quality": "last_reading",
+    "transport": "last_updated"
+}
+
+
+def _flatten(prefix: str, value, row: Dict):
+    if isinstance(value, dict):
+        for key, nested in value.items():
+            _flatten(f"{prefix}.{key}" if prefix else key, nested, row)
+    else:
+        row[prefix] = value
+
+
+def layer_rows(layer: str, layer_data: Dict, last_updated: str) -> List[Dict]:
+    """Flat rows for one layer: one per incident for crime_stats, one per area otherwise"""
+    rows = []
+    for area, area_data in layer_data.get("areas", {}).items():
+        lat, lng = area_data.get("coordinates") or (None, None)
+
+        if layer == "crime_stats":
+            for incident in area_data.get("recent_incidents", []):
+                rows.append({"area": area, **incident, "police_station": area_data.get("police_station", ""),
+                             "lat": lat, "lng": lng})
+            continue
+
+        row = {"area": area}
+        _flatten("", {k: v for k, v in area_data.items() if k != "coordinates"}, row)
+        row["lat"], row["lng"] = lat, lng
+        row.setdefault(TIMESTAMP_FIELDS.get(layer, "last_updated"), last_updated)
+        rows.append(row)
+    return rows
+
+
+def run_export(layer: str, layer_data: Dict, last_updated: str, start: Optional[str], end: Optional[str],
+               fmt: str, path: str) -> Dict:
+    """Render one export to `path`; runs in a worker process, so it only takes plain data
+
+    Rows come from the current snapshot only, so `start`/`end` are clamped to
+    the days its rows carry (returned as coverage_start/coverage_end).
+    """
+    rows = layer_rows(layer, layer_data, last_updated)
+
+    # There is no history store: the range can only select from the snapshot's rows, so report the days they span
+    field = TIMESTAMP_FIELDS.get(layer, "last_updated")
+    days = sorted({str(row[field])[:10] for row in rows if row.get(field)})
+    coverage_start, coverage_end = (days[0], days[-1]) if days else (None, None)
+
+    if start or end:
+        rows = [
+            row for row in rows
+            if row.get(field) and (not start or str(row[field])[:10] >= start) and (not end or str(row[field])[:10] <= end)
+        ]
+
+    # Write to a temporary name and rename, so a half-written file is never served
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if fmt == "csv":
+        fieldnames = list(dict.fromkeys(key for row in rows for key in row)) or ["area"]
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps({"layer": layer, "start": start, "end": end, "coverage_start": coverage_start,
+                                  "coverage_end": coverage_end, "rows": rows}))
+    os.replace(tmp_path, path)
+
+    return {"rows": len(rows), "bytes": os.path.getsize(path), "coverage_start": coverage_start, "coverage_end": coverage_end}
+
+
+class ArtifactStore:
+    """Export files on local disk, named by the hash of the parameters that produced them"""
+
+    def __init__(self, directory: str, max_artifacts: int = 200):
+        self.directory = directory
+        self.max_artifacts = max_artifacts
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key: str, fmt: str) -> str:
+        return os.path.join(self.directory, f"{key}.{fmt}")
+
+    def exists(self, key: str, fmt: str) -> bool:
+        return os.path.exists(self.path(key, fmt))
+
+    def prune(self):
+        """Delete the oldest artifacts beyond max_artifacts"""
+        paths = [
+            os.path.join(self.directory, name) for name in os.listdir(self.directory)
+            if not name.endswith(".tmp")
+        ]
+        if len(paths) <= self.max_artifacts:
+            return
+        paths.sort(key=os.path.getmtime)
+        for path in paths[:len(paths) - self.max_artifacts]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class ExportJob:
+    """One export; identical requests share the job and its artifact"""
+
+    def __init__(self, key: str, city: str, version: int, layer: str, start: Optional[date], end: Optional[date], fmt: str):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.city = city
+        self.version = version
+        self.layer = layer
+        self.start = start
+        self.end = end
+        self.format = fmt
+        self.status = "pending"
+        self.requested_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.requests_merged = 1
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.path: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "city": self.city,
+            "snapshot_version": self.version,
+            "layer": self.layer,
+            "start": self.start.isoformat() if self.start else None,
+            "end": self.end.isoformat() if self.end else None,
+            "format": self.format,
+            "requested_at": self.requested_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "requests_merged": self.requests_merged,
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class ExportService:
+    """Runs exports in a process pool and dedupes identical requests onto one artifact"""
+
+    def __init__(self, store: ArtifactStore, max_workers: int = 2, max_jobs: int = 500):
+        self.store = store
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+
+        self._jobs: "OrderedDict[str, ExportJob]" = OrderedDict()
+        self._by_key: Dict[str, ExportJob] = {}
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @staticmethod
+    def job_key(city: str, version: int, layer: str, start: Optional[date], end: Optional[date], fmt: str) -> str:
+        raw = f"{city}|{version}|{layer}|{start or ''}|{end or ''}|{fmt}"
+        return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+    def submit(self, city: str, version: int, layer: str, load_layer: Callable[[], Awaitable[Dict]], last_updated: str,
+               start: Optional[date], end: Optional[date], fmt: str) -> ExportJob:
+        """Return the job for these parameters, starting an export only if no usable one exists
+
+        `load_layer` renders the layer's document; it is only awaited by a new
+        job, so requests that join an existing job or artifact never pay for it.
+        """
+        key = self.job_key(city, version, layer, start, end, fmt)
+
+        existing = self._by_key.get(key)
+        if existing is not None and existing.status != "failed" and (
+            existing.status != "completed" or self.store.exists(key, fmt)
+        ):
+            existing.requests_merged += 1
+            return existing
+
+        job = ExportJob(key, city, version, layer, start, end, fmt)
+        self._jobs[job.job_id] = job
+        self._by_key[key] = job
+        while len(self._jobs) > self.max_jobs:
+            _, evicted = self._jobs.popitem(last=False)
+            if self._by_key.get(evicted.key) is evicted:
+                del self._by_key[evicted.key]
+
+        if self.store.exists(key, fmt):
+            # Artifact left by an earlier job with the same parameters
+            job.path = self.store.path(key, fmt)
+            job.status = "completed"
+            job.finished_at = datetime.now()
+            job.result = {"bytes": os.path.getsize(job.path), "cached": True}
+            return job
+
+        job.task = asyncio.create_task(self._run(job, load_layer, last_updated))
+        return job
+
+    def get(self, job_id: str) -> Optional[ExportJob]:
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: ExportJob, load_layer: Callable[[], Awaitable[Dict]], last_updated: str):
+        job.status = "running"
+        path = self.store.path(job.key, job.format)
+        start = time.perf_counter()
+
+        try:
+            layer_data = await load_layer()
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+
+            loop = asyncio.get_running_loop()
+            job.result = await loop.run_in_executor(
+                self._pool, run_export, job.layer, layer_data, last_updated,
+                job.start.isoformat() if job.start else None, job.end.isoformat() if job.end else None,
+                job.format, path
+            )
+            job.result["seconds"] = round(time.perf_counter() - start, 3)
+            job.path = path
+            job.status = "completed"
+            self.store.prune()
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = "cancelled"
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"❌ Export {job.job_id} failed: {e}")
+        finally:
+            job.finished_at = datetime.now()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+def default_export_dir() -> str:
+    return os.getenv("EXPORT_DIR", os.path.join(tempfile.gettempdir(), "civic-pulse-exports"))
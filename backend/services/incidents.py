@@ -0,0 +1,491 @@
+"""Crime incident ingestion: NDJSON batches in, FIR-deduplicated rows out to SQLite.
+
+Records are validated, normalized and checked against an in-memory hash
+index of FIR numbers as they arrive; only new or changed FIRs are queued.
+A single writer task commits the queue in batched transactions on a worker
+thread, so ingestion never holds the event loop for a disk write.
+
+    python -m services.incidents bangalore incidents.ndjson [more.ndjson ...]
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import orjson
+
+from scrapers.registry import AreaRegistry
+
+from . import metrics
+from .tracing import tracer
+
+if TYPE_CHECKING:
+    from analytics.heatmap import HourlyHeatmap
+
+IST = timezone(timedelta(hours=5, minutes=30))
+
+# Incident timestamps as shown everywhere else ("2025-09-19 14:30")
+WHEN_FORMAT = "%Y-%m-%d %H:%M"
+WHEN_FORMATS = (
+    "%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%d/%m/%Y %H:%M", "%d-%m-%Y %H:%M",
+    "%d/%m/%Y %I:%M %p", "%d-%m-%Y %I:%M %p", "%d %b %Y %H:%M", "%d %b %Y %I:%M %p",
+    "%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"
+)
+
+_CANONICAL_WHEN = re.compile(r"(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2})")
+
+FIELDS = ("fir_number", "area", "type", "what", "when", "who", "officer", "status")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    fir_number TEXT PRIMARY KEY,
+    area TEXT NOT NULL,
+    type TEXT NOT NULL,
+    what TEXT NOT NULL,
+    occurred_at TEXT NOT NULL,
+    who TEXT NOT NULL,
+    officer TEXT NOT NULL,
+    status TEXT NOT NULL,
+    digest BLOB NOT NULL,
+    ingested_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS incidents_area_time ON incidents (area, occurred_at DESC);
+"""
+
+_UPSERT = """
+INSERT INTO incidents (fir_number, area, type, what, occurred_at, who, officer, status, digest, ingested_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (fir_number) DO UPDATE SET
+    area = excluded.area, type = excluded.type, what = excluded.what, occurred_at = excluded.occurred_at,
+    who = excluded.who, officer = excluded.officer, status = excluded.status,
+    digest = excluded.digest, ingested_at = excluded.ingested_at
+"""
+
+
+def parse_when(when: str) -> Optional[datetime]:
+    """Datetime of a canonical `when` ("YYYY-MM-DD HH:MM"); None for anything else"""
+    match = _CANONICAL_WHEN.fullmatch(when)
+    if match is None:
+        return None
+    try:
+        return datetime(*map(int, match.groups()))
+    except ValueError:
+        return None
+
+
+def normalize_when(value, formats: Tuple[str, ...] = WHEN_FORMATS) -> Optional[str]:
+    """`when` as "YYYY-MM-DD HH:MM" local (IST) time; epoch seconds and ISO strings with offsets are converted"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        try:
+            return datetime.fromtimestamp(value, IST).strftime(WHEN_FORMAT)
+        except (OverflowError, OSError, ValueError):
+            # Out of the platform's time_t or datetime range, or NaN
+            return None
+    if not isinstance(value, str) or not value.strip():
+        return None
+
+    value = " ".join(value.split())
+
+    # Fast path: already canonical (strptime costs ~10µs a call)
+    if _CANONICAL_WHEN.fullmatch(value):
+        return value if parse_when(value) is not None else None
+
+    for fmt in formats:
+        try:
+            return datetime.strptime(value, fmt).strftime(WHEN_FORMAT)
+        except ValueError:
+            continue
+
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        try:
+            parsed = parsed.astimezone(IST)
+        except OverflowError:
+            # e.g. 0001-01-01T00:00:00+14:00, before datetime.min in IST
+            return None
+    return parsed.strftime(WHEN_FORMAT)
+
+
+class IncidentStore:
+    """SQLite table of incidents keyed by FIR number (WAL mode, so reads never wait on writes)
+
+    Writes share one connection under a lock; each reading thread gets its
+    own connection, since a sqlite3 connection must not run statements from
+    two threads at once.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._writer: Optional[sqlite3.Connection] = None
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def _writer_connection(self) -> sqlite3.Connection:
+        with self._lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            return self._writer
+
+    def _reader(self) -> sqlite3.Connection:
+        """The calling thread's read connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._lock:
+                self._readers.append(conn)
+        return conn
+
+    def write_batch(self, rows: List[Tuple]):
+        """Upsert rows (in FIELDS order plus digest) in one transaction"""
+        writer = self._writer_connection()
+        ingested_at = datetime.now().isoformat()
+        with self._lock:
+            writer.execute("BEGIN")
+            try:
+                writer.executemany(_UPSERT, (row + (ingested_at,) for row in rows))
+            except BaseException:
+                writer.execute("ROLLBACK")
+                raise
+            writer.execute("COMMIT")
+
+    def digests(self) -> Dict[str, bytes]:
+        reader = self._reader()
+        return dict(reader.execute("SELECT fir_number, digest FROM incidents"))
+
+    def occurrences(self) -> List[Tuple[str, str, str]]:
+        """(fir_number, area, occurred_at) of every stored incident"""
+        reader = self._reader()
+        return reader.execute("SELECT fir_number, area, occurred_at FROM incidents").fetchall()
+
+    def recent_by_area(self, areas: Iterable[str], limit: int) -> Dict[str, List[Dict]]:
+        """Newest `limit` incidents of each area"""
+        reader = self._reader()
+        recent = {}
+        for area in areas:
+            rows = reader.execute(
+                "SELECT fir_number, type, what, occurred_at, who, officer, status FROM incidents "
+                "WHERE area = ? ORDER BY occurred_at DESC LIMIT ?",
+                (area, limit)
+            ).fetchall()
+            if rows:
+                recent[area] = [
+                    {"fir_number": fir, "type": type_, "what": what, "when": when, "who": who, "officer": officer, "status": status}
+                    for fir, type_, what, when, who, officer, status in rows
+                ]
+        return recent
+
+    def count(self) -> int:
+        reader = self._reader()
+        return reader.execute("SELECT COUNT(*) FROM incidents").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            for conn in [self._writer] + self._readers:
+                if conn is not None:
+                    conn.close()
+            self._writer, self._readers = None, []
+            # Threads that read before reconnect on their next read
+            self._local = threading.local()
+
+
+class InvalidJSON:
+    """Stands in for an NDJSON line that does not parse, so it is counted and reported as invalid"""
+
+    __slots__ = ("error",)
+
+    def __init__(self, error: str):
+        self.error = error
+
+
+class IncidentIngestor:
+    """Validates and dedupes incident records, and batches them into the store"""
+
+    def __init__(self, store: IncidentStore, registry: AreaRegistry, batch_size: int = 5000,
+                 flush_interval: float = 0.5, max_pending: int = 50000):
+        self.store = store
+        self.registry = registry
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Past this many queued rows, ingest() waits for a flush (backpressure)
+        self.max_pending = max_pending
+
+        # Incidents name an area, or a police station that maps to one
+        self._areas = {area.name.lower(): area.name for area in registry.areas}
+        for area in registry.areas:
+            station = area.crime.get("police_station")
+            if station:
+                self._areas.setdefault(station.lower(), area.name)
+
+        # fir_number -> digest of the stored record, loaded from the store on first use
+        self._digests: Optional[Dict[str, bytes]] = None
+
+        # Committed incidents by weekday and hour of day per area, with each FIR's cell so updates move it.
+        # Built with the index, so numpy is only loaded once incidents are used
+        self.heatmap: Optional["HourlyHeatmap"] = None
+        self._cells: Dict[str, int] = {}
+        self._pending: List[Tuple] = []
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._index_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.written = 0
+
+    def normalize(self, record: Dict) -> Tuple:
+        """Row tuple in FIELDS order; raises ValueError for unusable records"""
+        if isinstance(record, InvalidJSON):
+            raise ValueError(f"invalid JSON: {record.error}")
+        if not isinstance(record, dict):
+            raise ValueError("record must be a JSON object")
+
+        fir_number = str(record.get("fir_number") or "").strip()
+        if not fir_number:
+            raise ValueError("fir_number is required")
+
+        area = self._areas.get(str(record.get("area") or record.get("police_station") or "").strip().lower())
+        if area is None:
+            raise ValueError(f"unknown area for {fir_number}")
+
+        when = normalize_when(record.get("when"))
+        if when is None:
+            raise ValueError(f"unparseable when for {fir_number}: {record.get('when')!r}")
+
+        def text(field: str) -> str:
+            return str(record.get(field) or "").strip()
+
+        return (fir_number, area, text("type"), text("what"), when, text("who"), text("officer"), text("status"))
+
+    async def _index(self) -> Dict[str, bytes]:
+        async with self._index_lock:
+            if self._digests is None:
+                self._digests = await asyncio.to_thread(self._load_index)
+        return self._digests
+
+    def _load_index(self) -> Dict[str, bytes]:
+        from analytics.heatmap import HourlyHeatmap
+
+        # Runs before anything is queued, so nothing else touches the heatmap meanwhile
+        self.heatmap = HourlyHeatmap(area.name for area in self.registry.areas)
+        digests = self.store.digests()
+        # The registry's reference incidents count too, unless the store has their FIR
+        for area in self.registry.areas:
+            for incident in area.crime.get("recent_incidents", []):
+                self._place(incident["fir_number"], area.name, incident.get("when", ""))
+        for fir_number, area, when in self.store.occurrences():
+            self._place(fir_number, area, when)
+        return digests
+
+    def _place(self, fir_number: str, area: str, when: str):
+        """Count an incident in the heatmap, moving it if the FIR was counted elsewhere before"""
+        occurred_at = parse_when(when)
+        cell = self.heatmap.cell(area, occurred_at) if occurred_at is not None else None
+        previous = self._cells.get(fir_number)
+        if cell == previous:
+            return
+        if previous is not None:
+            self.heatmap.remove(previous)
+        if cell is None:
+            self._cells.pop(fir_number, None)
+            return
+        self.heatmap.add(cell)
+        self._cells[fir_number] = cell
+
+    async def incident_heatmap(self) -> "HourlyHeatmap":
+        """The heatmap of committed incidents, seeded from the store on first use"""
+        await self._index()
+        return self.heatmap
+
+    async def ingest(self, records: Iterable[Dict], first_record: int = 1) -> Dict:
+        """Queue new and changed FIRs; returns per-outcome counts and the first few errors"""
+        digests = await self._index()
+        counts = {"accepted": 0, "updated": 0, "duplicates": 0, "invalid": 0}
+        errors = []
+
+        with tracer.span("incidents.ingest"):
+            for number, record in enumerate(records, first_record):
+                # Large chunks must not hold the loop for the read endpoints
+                if number % 1000 == 0:
+                    await asyncio.sleep(0)
+
+                try:
+                    row = self.normalize(record)
+                except ValueError as e:
+                    counts["invalid"] += 1
+                    if len(errors) < 20:
+                        errors.append({"record": number, "error": str(e)})
+                    continue
+
+                digest = hashlib.blake2b(orjson.dumps(row), digest_size=16).digest()
+                previous = digests.get(row[0])
+                if previous == digest:
+                    counts["duplicates"] += 1
+                    continue
+
+                counts["updated" if previous is not None else "accepted"] += 1
+                digests[row[0]] = digest
+                self._pending.append(row + (digest,))
+
+        for outcome, count in counts.items():
+            if count:
+                metrics.INCIDENTS_INGESTED.labels(self.registry.slug, outcome).inc(count)
+
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        if len(self._pending) > self.max_pending:
+            await self.flush()
+        return {**counts, "errors": errors}
+
+    async def flush(self):
+        """Commit everything queued, batch_size rows per transaction, in arrival order"""
+        async with self._flush_lock:
+            while self._pending:
+                batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+                try:
+                    with tracer.span("incidents.write", rows=len(batch)):
+                        await asyncio.to_thread(self.store.write_batch, batch)
+                except Exception as e:
+                    # Forget the batch's digests so a resend is not mistaken for a duplicate
+                    for row in batch:
+                        if self._digests.get(row[0]) == row[-1]:
+                            del self._digests[row[0]]
+                    metrics.INCIDENTS_INGESTED.labels(self.registry.slug, "write_error").inc(len(batch))
+                    print(f"❌ Incident batch write failed ({len(batch)} rows): {e}")
+                    continue
+                self.written += len(batch)
+                for row in batch:
+                    self._place(row[0], row[1], row[4])
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self):
+        # Bind the wakeup event to the serving loop
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self.run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        # Shutdown: write what is still queued before the process exits
+        if self._pending:
+            self.store.write_batch(self._pending)
+            self._pending = []
+
+    def stats(self) -> Dict:
+        return {
+            "indexed_firs": len(self._digests) if self._digests is not None else None,
+            "pending": len(self._pending),
+            "written": self.written
+        }
+
+
+def parse_ndjson(lines: Iterable[bytes]) -> Iterator[Union[Dict, InvalidJSON]]:
+    """Records from NDJSON lines; blank lines are skipped, bad JSON yields InvalidJSON (counted as invalid)"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield orjson.loads(line)
+        except orjson.JSONDecodeError as e:
+            yield InvalidJSON(str(e))
+
+
+def default_incident_db(slug: str) -> str:
+    directory = os.getenv("INCIDENT_DB_DIR", os.path.join(tempfile.gettempdir(), "civic-pulse-incidents"))
+    return os.path.join(directory, f"{slug}.sqlite3")
+
+
+async def ndjson_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """Split a streamed body into lines without holding all of it"""
+    buffer = b""
+    async for data in chunks:
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+    if buffer:
+        yield buffer
+
+
+async def ingest_ndjson(ingestor: IncidentIngestor, lines: AsyncIterable[bytes], max_errors: int = 20) -> Dict:
+    """Ingest NDJSON lines in batch_size chunks; returns the summed counts and the first errors"""
+    totals = {"accepted": 0, "updated": 0, "duplicates": 0, "invalid": 0}
+    errors: List[Dict] = []
+    chunk: List[Union[Dict, InvalidJSON]] = []
+    first_record = 1
+
+    async def ingest_chunk():
+        result = await ingestor.ingest(chunk, first_record)
+        for key in totals:
+            totals[key] += result[key]
+        errors.extend(result["errors"][:max_errors - len(errors)])
+
+    async for line in lines:
+        chunk.extend(parse_ndjson((line,)))
+        if len(chunk) >= ingestor.batch_size:
+            await ingest_chunk()
+            first_record += len(chunk)
+            chunk = []
+    if chunk:
+        await ingest_chunk()
+
+    return {**totals, "errors": errors}
+
+
+async def _file_lines(path: str) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        for line in f:
+            yield line
+
+
+async def ingest_files(ingestor: IncidentIngestor, paths: List[str]) -> List[Tuple[str, Dict]]:
+    results = []
+    for path in paths:
+        result = await ingest_ndjson(ingestor, _file_lines(path))
+        for error in result.pop("errors"):
+            print(f"⚠️ {path} record {error['record']}: {error['error']}")
+        results.append((path, result))
+    await ingestor.flush()
+    return results
+
+
+def main():
+    from scrapers.registry import DATA_DIR, available_cities, load_registry
+
+    parser = argparse.ArgumentParser(description="Ingest NDJSON incident files into a city's incident store")
+    parser.add_argument("city")
+    parser.add_argument("paths", nargs="+")
+    args = parser.parse_args()
+
+    registry = load_registry(available_cities(os.getenv("REGISTRY_DIR", DATA_DIR))[args.city])
+    ingestor = IncidentIngestor(IncidentStore(default_incident_db(registry.slug)), registry)
+    for path, totals in asyncio.run(ingest_files(ingestor, args.paths)):
+        print(f"✅ Ingested {path}: {totals}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from .tracing import tracer
+
+# Upstream APIs (WAQI stations, government portals)
+UPSTREAM_LATENCY = Histogram(
+    "civic_upstream_request_seconds",
+    "Latency of requests to upstream data sources",
+    ["upstream"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+UPSTREAM_ERRORS = Counter(
+    "civic_upstream_errors_total",
+    "Failed or unusable upstream responses",
+    ["upstream", "reason"]
+)
+
+# Refresh cycles and the cached snapshot
+REFRESH_DURATION = Histogram(
+    "civic_refresh_cycle_seconds",
+    "Duration of a full data refresh cycle",
+    ["city"],
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+)
+REFRESH_TOTAL = Counter(
+    "civic_refresh_cycles_total",
+    "Completed refresh cycles by outcome",
+    ["city", "outcome"]
+)
+CACHE_REQUESTS = Counter(
+    "civic_cache_requests_total",
+    "Cache lookups by result",
+    ["cache", "result"]
+)
+SNAPSHOT_AGE = Gauge(
+    "civic_snapshot_age_seconds",
+    "Seconds since the cached snapshot was fetched",
+    ["city"]
+)
+SNAPSHOT_BYTES = Gauge(
+    "civic_snapshot_bytes",
+    "Serialized size of the cached snapshot",
+    ["city"]
+)
+SNAPSHOT_AREAS = Gauge(
+    "civic_snapshot_areas",
+    "Areas per layer in the cached snapshot",
+    ["city", "layer"]
+)
+
+# Incident ingestion
+INCIDENTS_INGESTED = Counter(
+    "civic_incidents_ingested_total",
+    "Ingested incident records by outcome (accepted, updated, duplicates, invalid, write_error)",
+    ["city", "outcome"]
+)
+
+# CPU-heavy rendering offloaded from the event loop
+OFFLOAD_SECONDS = Histogram(
+    "civic_offload_seconds",
+    "Time offloaded tasks spent waiting for a worker (phase=wait) and running (phase=run)",
+    ["task", "phase"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+OFFLOAD_PENDING = Gauge(
+    "civic_offload_pending",
+    "Offloaded tasks queued or running",
+    ["pool"]
+)
+OFFLOAD_REJECTED = Counter(
+    "civic_offload_rejected_total",
+    "Offloaded tasks turned away because the pool's queue was full",
+    ["task"]
+)
+
+# API endpoints
+HTTP_LATENCY = Histogram(
+    "civic_http_request_seconds",
+    "Request latency per endpoint",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+HTTP_RESPONSE_BYTES = Counter(
+    "civic_http_response_bytes_total",
+    "Response payload bytes per endpoint",
+    ["method", "route"]
+)
+
+
+@contextmanager
+def track_upstream(upstream: str, **attributes):
+    """Time an upstream call in a span and count it as an error if it raises"""
+    start = time.perf_counter()
+    try:
+        with tracer.span(f"upstream.{upstream}", **attributes):
+            yield
+    except Exception as e:
+        UPSTREAM_ERRORS.labels(upstream, type(e).__name__).inc()
+        raise
+    finally:
+        UPSTREAM_LATENCY.labels(upstream).observe(time.perf_counter() - start)
+
+
+def set_snapshot_age_source(city: str, fetched_at: Callable[[], float]):
+    """Compute a city's snapshot age at scrape time from a callable returning the fetch epoch (or 0)"""
+    SNAPSHOT_AGE.labels(city).set_function(lambda: time.time() - fetched_at() if fetched_at() else float("nan"))
+
+
+def render_metrics():
+    """Return the Prometheus exposition body and content type"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-endpoint latency and payload size"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+        sent = 0
+
+        async def send_wrapper(message):
+            nonlocal status, sent
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Label by route template so path parameters don't explode cardinality
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+
+            HTTP_LATENCY.labels(method, path, str(status)).observe(time.perf_counter() - start)
+            HTTP_RESPONSE_BYTES.labels(method, path).inc(sent)
@@ -0,0 +1,88 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, TypeVar
+
+from . import metrics
+from .tracing import tracer
+
+T = TypeVar("T")
+
+
+class OffloadRejected(Exception):
+    """The render pool's queue is full; the request should be retried shortly"""
+
+
+class RenderPool:
+    """Bounded thread pool for CPU-heavy rendering, so it never runs on the event loop
+
+    Renderers read the published snapshot in place, which a process pool would
+    have to pickle per task; threads share it. At most `max_workers` tasks run
+    and `max_queue` wait; beyond that `run` raises OffloadRejected instead of
+    letting latency grow without bound.
+    """
+
+    def __init__(self, name: str = "render", max_workers: int = 4, max_queue: int = 64):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix=f"{name}-pool")
+        self._lock = threading.Lock()
+
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, task: str, fn: Callable[..., T], *args, bounded: bool = True) -> T:
+        """Run fn(*args) on a worker thread in the caller's trace context
+
+        Background work that must not be dropped (refresh cycles) passes
+        bounded=False and is queued even when the pool is full.
+        """
+        if bounded and self.pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            metrics.OFFLOAD_REJECTED.labels(task).inc()
+            raise OffloadRejected(f"{self.name} pool is busy ({self.pending} tasks pending)")
+
+        queued = time.perf_counter()
+
+        def call():
+            started = time.perf_counter()
+            metrics.OFFLOAD_SECONDS.labels(task, "wait").observe(started - queued)
+            try:
+                with tracer.span(f"offload.{task}"):
+                    return fn(*args)
+            finally:
+                metrics.OFFLOAD_SECONDS.labels(task, "run").observe(time.perf_counter() - started)
+
+        with self._lock:
+            self.pending += 1
+            metrics.OFFLOAD_PENDING.labels(self.name).set(self.pending)
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, call)
+        # Released when the work itself ends, not when the caller stops waiting: a cancelled request
+        # (client disconnect) leaves its render running, and that render still counts against the bound
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future):
+        # Runs on the worker thread that finished the task (or the caller's, if it never started)
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+            metrics.OFFLOAD_PENDING.labels(self.name).set(self.pending)
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected
+        }
+
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
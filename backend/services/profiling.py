@@ -0,0 +1,155 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from typing import Dict, List, Optional
+
+from prometheus_client import Histogram
+
+EVENT_LOOP_LAG = Histogram(
+    "civic_event_loop_lag_seconds",
+    "Delay between when the loop monitor should have woken and when it did",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})".replace(";", ":")
+
+
+def collapse_stack(frame, thread_name: str) -> str:
+    """Format a frame chain as a root-first, semicolon-separated flamegraph stack"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name.replace(";", ":"))
+    return ";".join(reversed(labels))
+
+
+def sample_stacks(seconds: float, interval: float = 0.005) -> Dict:
+    """Sample every thread's stack for a while; run this in its own thread"""
+    own_thread = threading.get_ident()
+    stacks = Counter()
+    samples = 0
+    deadline = time.monotonic() + seconds
+
+    while time.monotonic() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id != own_thread:
+                stacks[collapse_stack(frame, names.get(thread_id, f"thread-{thread_id}"))] += 1
+        samples += 1
+        time.sleep(interval)
+
+    return {
+        "samples": samples,
+        "interval_seconds": interval,
+        "collapsed": "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+    }
+
+
+def dump_tasks(limit: int = 20) -> List[Dict]:
+    """Describe every asyncio task on the running loop with its current stack"""
+    tasks = []
+    for task in asyncio.all_tasks():
+        coro = task.get_coro()
+        tasks.append({
+            "name": task.get_name(),
+            "coroutine": getattr(coro, "__qualname__", repr(coro)),
+            "done": task.done(),
+            "stack": [
+                f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})"
+                for frame in task.get_stack(limit=limit)
+            ]
+        })
+    return tasks
+
+
+class LoopLagMonitor:
+    """Measures event-loop lag and captures the loop thread's stack while it is blocked"""
+
+    def __init__(self, interval: float = 0.1, block_threshold: float = 0.25, history: int = 600):
+        self.interval = interval
+        self.block_threshold = block_threshold
+
+        self.lags = deque(maxlen=history)
+        self.blocked_stacks = Counter()
+        self.blocked_events = 0
+
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._beat())
+        threading.Thread(target=self._watchdog, name="loop-lag-watchdog", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _beat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+
+            self._last_beat = now
+            self.lags.append(lag)
+            EVENT_LOOP_LAG.observe(lag)
+
+    def _watchdog(self):
+        # Runs off the loop so it can see what the loop thread is stuck on
+        in_block = False
+        while not self._stop.wait(self.interval):
+            stalled = time.monotonic() - self._last_beat > self.interval + self.block_threshold
+            if not stalled:
+                in_block = False
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+
+            stack = collapse_stack(frame, "event-loop")
+            self.blocked_stacks[stack] += 1
+
+            if not in_block:
+                in_block = True
+                self.blocked_events += 1
+                print(f"⚠️ Event loop blocked >{self.block_threshold}s in {_frame_label(frame)}")
+
+            # Keep the table bounded if many distinct stacks block the loop
+            if len(self.blocked_stacks) > 500:
+                self.blocked_stacks = Counter(dict(self.blocked_stacks.most_common(250)))
+
+    def summary(self, top: int = 10) -> Dict:
+        lags = sorted(self.lags)
+        if lags:
+            p50 = lags[len(lags) // 2]
+            p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+        else:
+            p50 = p99 = 0.0
+
+        return {
+            "interval_seconds": self.interval,
+            "block_threshold_seconds": self.block_threshold,
+            "samples": len(lags),
+            "lag_p50_ms": round(p50 * 1000, 2),
+            "lag_p99_ms": round(p99 * 1000, 2),
+            "lag_max_ms": round(lags[-1] * 1000, 2) if lags else 0.0,
+            "blocked_events": self.blocked_events,
+            "top_blocking_stacks": [
+                {"stack": stack, "samples": count} for stack, count in self.blocked_stacks.most_common(top)
+            ]
+        }
@@ -0,0 +1,40 @@
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+
+class TokenBucketLimiter:
+    """Per-client token bucket used to cap inbound request rates"""
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 10000):
+        # Tokens refill at `rate` per second up to `burst`; a rate of 0 or less disables the limit
+        self.rate = rate
+        # A bucket that cannot hold one token would never allow a request
+        self.burst = max(1, burst)
+        self.max_clients = max_clients
+
+        # client key -> (tokens, last refill time), oldest client first
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def allow(self, client: str) -> Tuple[bool, float]:
+        """Consume a token for client; returns (allowed, seconds until next token)"""
+        if self.rate <= 0:
+            return True, 0.0
+
+        now = time.monotonic()
+        tokens, last = self._buckets.pop(client, (float(self.burst), now))
+
+        tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+
+        if tokens >= 1:
+            self._buckets[client] = (tokens - 1, now)
+            allowed, retry_after = True, 0.0
+        else:
+            self._buckets[client] = (tokens, now)
+            allowed, retry_after = False, (1 - tokens) / self.rate
+
+        # Bound memory: forget the least recently seen clients
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+
+        return allowed, retry_after
@@ -0,0 +1,100 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+
+class RefreshJob:
+    """A single upstream refresh that any number of callers can share"""
+
+    def __init__(self):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.status = "pending"
+        self.requested_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.finished_monotonic: Optional[float] = None
+        self.requests_merged = 1
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "requested_at": self.requested_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "requests_merged": self.requests_merged,
+            "result": self.result,
+            "error": self.error
+        }
+
+
+class RefreshService:
+    """Debounces refresh requests so concurrent and repeated calls share one fetch"""
+
+    def __init__(self, refresh: Callable[[], Awaitable[Dict]], debounce_seconds: float = 60, max_jobs: int = 100):
+        # `refresh` performs the upstream fetch and returns a small summary dict
+        self.refresh = refresh
+        self.debounce_seconds = debounce_seconds
+        self.max_jobs = max_jobs
+
+        self._jobs: "OrderedDict[str, RefreshJob]" = OrderedDict()
+        self._current: Optional[RefreshJob] = None
+
+    def request(self) -> RefreshJob:
+        """Return the job that will satisfy this request, starting one only if needed"""
+        current = self._current
+
+        if current is not None:
+            # Merge into the in-flight fetch, or reuse a result that is still fresh
+            if not current.done or (
+                current.status == "completed"
+                and time.monotonic() - current.finished_monotonic < self.debounce_seconds
+            ):
+                current.requests_merged += 1
+                return current
+
+        job = RefreshJob()
+        self._current = job
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+
+        job.task = asyncio.create_task(self._run(job))
+        return job
+
+    async def run(self) -> RefreshJob:
+        """Request a refresh and wait for it to finish"""
+        job = self.request()
+        await asyncio.shield(job.task)
+        return job
+
+    def get(self, job_id: str) -> Optional[RefreshJob]:
+        return self._jobs.get(job_id)
+
+    async def _run(self, job: RefreshJob):
+        job.status = "running"
+        job.started_at = datetime.now()
+
+        try:
+            job.result = await self.refresh()
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.error = "Refresh cancelled"
+            job.status = "failed"
+            raise
+        except Exception as e:
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = datetime.now()
+            job.finished_monotonic = time.monotonic()
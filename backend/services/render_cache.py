@@ -0,0 +1,65 @@
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from . import metrics
+
+
+class RenderCache:
+    """Bounded LRU of rendered bodies keyed by (snapshot version, endpoint, normalized params)"""
+
+    def __init__(self, name: str, max_entries: int = 256):
+        # `name` is the cache label on the civic_cache_requests_total counter
+        self.name = name
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, bytes]" = OrderedDict()
+        # Renders in progress, so concurrent misses for one key share a single render
+        self._rendering: Dict[Tuple, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(version: int, endpoint: str, params: Dict) -> Tuple:
+        # Unset parameters and argument order must not split the cache
+        return (version, endpoint, tuple(sorted((k, v) for k, v in params.items() if v is not None)))
+
+    async def get_or_render(self, version: int, endpoint: str, params: Dict,
+                            render: Callable[[], Awaitable[bytes]]) -> bytes:
+        """Cached body, or the result of awaiting `render` (which should offload the actual work)"""
+        key = self.key(version, endpoint, params)
+
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            metrics.CACHE_REQUESTS.labels(self.name, "hit").inc()
+            return body
+
+        self.misses += 1
+        metrics.CACHE_REQUESTS.labels(self.name, "miss").inc()
+
+        rendering = self._rendering.get(key)
+        if rendering is not None:
+            return await asyncio.shield(rendering)
+
+        rendering = self._rendering[key] = asyncio.ensure_future(render())
+        try:
+            body = await asyncio.shield(rendering)
+        finally:
+            del self._rendering[key]
+
+        self._entries[key] = body
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return body
+
+    def invalidate(self, version: Optional[int] = None):
+        """Drop entries rendered from snapshots older than `version` (all entries when None)"""
+        if version is None:
+            self._entries.clear()
+            return
+        for key in [key for key in self._entries if key[0] < version]:
+            del self._entries[key]
+
+    def stats(self) -> Dict:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,38 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+from .tracing import tracer
+
+COMPACT_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+PRETTY_OPTIONS = COMPACT_OPTIONS | orjson.OPT_INDENT_2
+
+
+def dumps(content: Any, pretty: bool = False) -> bytes:
+    """Encode straight to UTF-8 bytes with orjson"""
+    with tracer.span("response.serialize", pretty=pretty):
+        return orjson.dumps(content, option=PRETTY_OPTIONS if pretty else COMPACT_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson
+
+    Returning one of these from a handler also skips FastAPI's jsonable_encoder
+    pass, which is safe for snapshot data that is already plain JSON types.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class PrettyJSONResponse(JSONResponse):
+    """Indented variant of FastJSONResponse for humans and downloads"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content, pretty=True)
+
+
+def json_response(content: Any, pretty: bool = False, **kwargs) -> JSONResponse:
+    response_class = PrettyJSONResponse if pretty else FastJSONResponse
+    return response_class(content, **kwargs)
@@ -0,0 +1,185 @@
+import functools
+import inspect
+import os
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+
+class Span:
+    """A timed operation within a trace"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_time", "end_time",
+                 "_start", "duration_ms", "attributes", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.start_time = time.time()
+        self.end_time: Optional[float] = None
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.attributes = attributes
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": self.duration_ms,
+            "attributes": self.attributes,
+            "status": self.status,
+            "error": self.error
+        }
+
+
+class _NoopSpan:
+    """Stand-in for unsampled spans so call sites never branch"""
+
+    def set_attribute(self, key: str, value):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class NoopExporter:
+    def export(self, span: Span):
+        pass
+
+
+class InMemoryExporter:
+    """Keeps the most recent finished spans for /debug/traces"""
+
+    def __init__(self, max_spans: int = 2000):
+        self.spans = deque(maxlen=max_spans)
+
+    def export(self, span: Span):
+        self.spans.append(span)
+
+    def recent(self, limit: int = 200, name: Optional[str] = None) -> List[Dict]:
+        spans = [s for s in self.spans if name is None or s.name == name]
+        return [s.to_dict() for s in spans[-limit:]]
+
+
+class ConsoleExporter:
+    """Prints one line per finished span"""
+
+    def export(self, span: Span):
+        indent = "  " if span.parent_id else ""
+        print(f"🧭 {indent}{span.name} {span.duration_ms:.1f}ms trace={span.trace_id[:8]} {span.attributes or ''}")
+
+
+# Current span for this task; None means no active trace, NOOP_SPAN means unsampled trace
+_current_span: ContextVar = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """Minimal OpenTelemetry-style tracer with head sampling and a pluggable exporter"""
+
+    def __init__(self, exporter=None, sample_rate: float = 0.0):
+        self.exporter = exporter or NoopExporter()
+        self.sample_rate = sample_rate
+
+    @contextmanager
+    def span(self, name: str, root: bool = False, **attributes):
+        """Start a span as a child of the current one, or a new trace if there is none"""
+        parent = None if root else _current_span.get()
+
+        if parent is NOOP_SPAN or (parent is None and not self._sample()):
+            token = _current_span.set(NOOP_SPAN)
+            try:
+                yield NOOP_SPAN
+            finally:
+                _current_span.reset(token)
+            return
+
+        if parent is None:
+            span = Span(name, f"{random.getrandbits(128):032x}", None, attributes)
+        else:
+            span = Span(name, parent.trace_id, parent.span_id, attributes)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_time = time.time()
+            span.duration_ms = (time.perf_counter() - span._start) * 1000
+            self.exporter.export(span)
+
+    def _sample(self) -> bool:
+        return self.sample_rate > 0 and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+
+def _exporter_from_env():
+    kind = os.getenv("TRACE_EXPORTER", "memory").lower()
+    if kind == "console":
+        return ConsoleExporter()
+    if kind == "none":
+        return NoopExporter()
+    return InMemoryExporter(int(os.getenv("TRACE_BUFFER_SIZE", "2000")))
+
+
+# Process-wide tracer; sampling is off unless TRACE_SAMPLE_RATE is set or changed at runtime
+tracer = Tracer(_exporter_from_env(), float(os.getenv("TRACE_SAMPLE_RATE", "0")))
+
+
+def traced(name: str):
+    """Decorator wrapping a sync or async function in a span"""
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a root span per HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with tracer.span(f"{scope['method']} {scope['path']}", root=True) as span:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+            route = scope.get("route")
+            if route is not None:
+                span.set_attribute("http.route", route.path)